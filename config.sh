@@ -18,9 +18,15 @@ import json
 import sys,os
 import itertools
 import argparse
+import contextlib
+import cProfile
 
+import config.configcache
 import config.filewrite
+import config.modules
 import config.parse
+import config.sweep
+import config.timing
 import config.util
 
 # Read the config file
@@ -41,6 +47,8 @@ if __name__ == '__main__':
             help='The directory to store the resulting executables')
     path_group.add_argument('--makedir',
             help='The directory to store the resulting makefile fragment. Note that `make` must later be invoked with -I.')
+    path_group.add_argument('--shard-makefiles', action='store_true',
+            help='Write a separate makefile fragment for each executable, under `_configuration/` in the makefile directory. `_configuration.mk` then only indexes the fragments, and `make` reads only those needed for the requested executables.')
 
     search_group = parser.add_argument_group(title='Search Paths', description='Options that direct ChampSim to search additional paths for modules')
 
@@ -60,11 +68,35 @@ if __name__ == '__main__':
     parser.add_argument('--compile-all-modules', action='store_true', dest='compile_all_modules',
             help='Compile all modules in the search path')
 
+    parser.add_argument('--no-configure-cache', action='store_false', dest='configure_cache',
+            help='Do not use the cache of previous configuration results. All configurations are parsed and generated again.')
+
     parser.add_argument('-v', action='store_true', dest='verbose')
 
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+            help='Parse configurations with N parallel processes. If N is 0, use the number of available processors. The generated files do not depend on the number of jobs.')
+
     parser.add_argument('--join', choices=['chain','product'], default='product',
             help='The joining method when multiple files are specified. A "chain" join concatenates the files, building the union of all specifications. A "product" join merges each possible combination of the specified builds. In the case of "product", the last file specified has the highest priority.')
 
+    sample_group = parser.add_argument_group(title='Sampling', description='Options that select a subset of the joined configurations. Only the selected configurations are parsed and built.')
+
+    sample_group.add_argument('--sample', type=int, metavar='N',
+            help='Select N of the joined configurations instead of all of them')
+    sample_group.add_argument('--sample-strategy', choices=list(config.sweep.sample_strategies.keys()), default='random',
+            help='The method used to select configurations. "random" selects uniformly at random. "latin-hypercube" selects a Latin hypercube design over the input files. "stratified" divides the selection evenly over the configurations in the first file.')
+    sample_group.add_argument('--seed', type=int, default=0,
+            help='The seed for the random selection of configurations')
+    sample_group.add_argument('--constraint', action='append', default=[], metavar='EXPR',
+            help='A Python expression that must be true for a joined configuration to be selected. The expression may refer to the merged, unparsed configuration as `config` and may convert sizes like "64kB" with `size()`.')
+
+    profile_group = parser.add_argument_group(title='Profiling', description='Options that measure the performance of the configuration step itself')
+
+    profile_group.add_argument('--profile', metavar='FILE',
+            help='Write a JSON summary of the wall time and call count of each stage of configuration, for the whole run and for each build, to FILE.')
+    profile_group.add_argument('--cprofile', metavar='FILE',
+            help='Write cProfile statistics for the configuration process to FILE. Work done in worker processes under --jobs is not included.')
+
     parser.add_argument('files', nargs='*',
             help='A sequence of JSON files describing the configuration.')
 
@@ -75,12 +107,24 @@ if __name__ == '__main__':
 
     if not args.files:
         print("No configuration specified. Building default ChampSim with no prefetching.")
-    files = map(config.util.wrap_list, map(parse_file, reversed(args.files)))
+    files = [config.sweep.expand(config.util.wrap_list(parse_file(f))) for f in reversed(args.files)]
 
     if args.join == 'product':
-        config_files = itertools.product(*files, ({},))
+        dimensions = (*files, ({},))
     elif args.join == 'chain':
-        config_files = ((c,) for c in itertools.chain(*files))
+        dimensions = (config.sweep.Concatenation(files),)
+
+    predicates = [*map(config.sweep.expression_predicate, args.constraint)]
+    config_files = config.sweep.select(dimensions, count=args.sample, strategy=args.sample_strategy, seed=args.seed, predicates=predicates)
+
+    # The module manifest is kept with the configuration cache
+    manifest_fname = os.path.join(objdir_name, 'configure_cache', 'module_manifest.json')
+    if args.configure_cache:
+        config.modules.process_index.load(manifest_fname)
+
+    # Bring the module index up to date before any worker processes are created, so that they inherit it
+    search_paths = config.parse.module_search_paths(module_dir=args.module_dir, branch_dir=args.branch_dir, btb_dir=args.btb_dir, pref_dir=args.prefetcher_dir, repl_dir=args.replacement_dir)
+    config.modules.process_index.refresh(itertools.chain(*search_paths.values()))
 
     parsed_test = config.parse.parse_config({'executable_name': '000-test-main'}, module_dir=[os.path.join(test_root, 'cpp', 'modules')], compile_all_modules=True)
 
@@ -93,10 +137,31 @@ if __name__ == '__main__':
         'compile_all_modules': args.compile_all_modules,
         'verbose': args.verbose
     }
-    parsed_configs = (config.parse.parse_config(*c, **parse_args) for c in config_files)
 
-    with config.filewrite.FileWriter(bindir_name=bindir_name, objdir_name=objdir_name, makedir_name=args.makedir, verbose=args.verbose) as wr:
-        for c in parsed_configs:
-            wr.write_files(c)
+    profiler = config.timing.Profiler() if args.profile else contextlib.nullcontext()
+    cprofiler = cProfile.Profile() if args.cprofile else contextlib.nullcontext()
+
+    with profiler, cprofiler:
+        cache = None
+        if args.configure_cache:
+            cache = config.configcache.ConfigureCache(os.path.join(objdir_name, 'configure_cache'), search_paths=itertools.chain(*search_paths.values()), verbose=args.verbose)
+
+        parsed_configs = config.parse.parse_configs(config_files, jobs=args.jobs, cache=cache, profiler=(profiler if args.profile else None), **parse_args)
+
+        digest_dir = os.path.join(objdir_name, 'configure_cache', 'digests') if args.configure_cache else None
+        with config.filewrite.FileWriter(bindir_name=bindir_name, objdir_name=objdir_name, makedir_name=args.makedir, cache=cache, sharded=args.shard_makefiles, digest_dir=digest_dir, streaming=True, verbose=args.verbose) as wr:
+            for c in parsed_configs:
+                if args.profile:
+                    profiler.add_build(c[0], config.timing.collect(wr.write_files, c)[1])
+                else:
+                    wr.write_files(c)
+
+    if args.configure_cache:
+        config.modules.process_index.save(manifest_fname)
+
+    if args.profile:
+        profiler.write(args.profile)
+    if args.cprofile:
+        cprofiler.dump_stats(args.cprofile)
 
 # vim: set filetype=python:
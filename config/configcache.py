@@ -0,0 +1,109 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+A persistent cache for the results of the configuration step.
+
+Entries are keyed by a hash of their inputs, combined with a fingerprint of the environment:
+the sources of this package and the modules present in the search directories.
+If any of these change, all entries are invalidated.
+'''
+
+import glob
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from . import modules
+from . import util
+
+def directory_state(paths):
+    '''
+    Produce a description of the state of a set of module search directories.
+
+    Module discovery depends on the directories present under each search path, and on which of them are marked as
+    legacy modules. The generated fragments also list the headers of each module. Other files, such as sources and
+    generated legacy bridges, do not affect the results that are cached.
+    The directories are read through the module index shared by the process, so unchanged modules are not walked again.
+
+    :param paths: the root directories to examine
+    '''
+    index = modules.process_index
+    for path in sorted(set(map(os.path.abspath, paths))):
+        if os.path.isdir(path):
+            yield path, '__legacy__' in index.listing(path)
+            for name, is_dir in index.listing(path).items():
+                if is_dir:
+                    entry = index.module(os.path.join(path, name))
+                    yield from ((d, d in entry['legacy_dirs']) for d in entry['dirs'])
+                    yield entry['path'], sorted(entry['headers'])
+
+def source_state():
+    ''' Produce a description of the state of the Python sources of the configuration package. '''
+    fnames = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py')))
+    for fname in fnames:
+        stat = os.stat(fname)
+        yield fname, stat.st_mtime_ns, stat.st_size
+
+class ConfigureCache:
+    '''
+    A persistent key-value store for configuration results, placed in a directory on disk.
+
+    :param directory: the directory to store entries in
+    :param search_paths: the module search paths. Changes to these directories invalidate the cache.
+    :param verbose: print extra verbose output
+    '''
+    def __init__(self, directory, search_paths=tuple(), verbose=False):
+        self.directory = directory
+        self.verbose = verbose
+        environment = {
+            'sources': list(source_state()),
+            'modules': list(directory_state(search_paths))
+        }
+        self.environment = hashlib.sha256(json.dumps(environment).encode('utf-8')).hexdigest()
+
+    def key(self, namespace, *parts):
+        ''' Produce a key for the given parts. The parts must be convertible to JSON. '''
+        data = json.dumps([self.environment, namespace, parts], sort_keys=True, default=util.try_int)
+        return namespace + '-' + hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        ''' The file in which the entry with the given key is stored. '''
+        return os.path.join(self.directory, key[-2:], key + '.pickle')
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key, default=None):
+        ''' Load the entry with the given key, or return the default if it does not exist. '''
+        try:
+            with open(self.path(key), 'rb') as rfp:
+                return pickle.load(rfp)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def put(self, key, value):
+        '''
+        Store the value with the given key.
+        The file is written atomically, so concurrent readers never observe a partial entry.
+        '''
+        fname = self.path(key)
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(fname), delete=False) as wfp:
+            pickle.dump(value, wfp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(wfp.name, fname)
+        if self.verbose:
+            print('Cached', key)
@@ -1,3 +1,6 @@
+import concurrent.futures
+import functools
+import shutil
 import subprocess
 import tempfile
 import os
@@ -17,27 +20,79 @@ class CompileResult:
     def __bool__(self):
         return self.returncode == 0
 
-def check_compiles(body, *args, cxx=None):
+@functools.lru_cache(maxsize=None)
+def _compiler_version(path, mtime_ns, size): # pylint: disable=unused-argument
+    ''' The version reported by the compiler. The modification time and size are only used to refresh the cached value. '''
+    result = subprocess.run((path, '--version'), stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=False)
+    return result.stdout
+
+def compiler_identity(cxx):
+    '''
+    Identify the compiler that is run by the given command, by its resolved path and the output of ``--version``.
+    The version is queried once per process for each compiler, unless its executable changes.
+
+    :param cxx: the compiler command
+    '''
+    path = shutil.which(cxx)
+    if path is None:
+        return {'command': cxx}
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    return {'command': cxx, 'path': path, 'version': _compiler_version(path, stat.st_mtime_ns, stat.st_size)}
+
+def check_compiles(body, *args, cxx=None, cache=None):
     '''
     Check whether the given body compiles as a valid C++ file.
     Additional arguments to the compiler can be provided.
+
+    If a cache is given, results are stored in it, keyed by the body, the full set of compiler arguments, and the identity of the compiler,
+    so repeated checks do not run the compiler again.
+
+    :param cache: an instance of :class:`config.configcache.ConfigureCache`
     '''
+    body = list(body)
+    compiler = cxx or os.environ.get('CXX', 'c++')
     cxxflags = [*filter(None, os.environ.get('CXXFLAGS','').split()), '--std=c++17', '-fsyntax-only']
     cppflags = [*filter(None, os.environ.get('CPPFLAGS','').split())]
+    flags = (*cppflags, *cxxflags, '-o', os.devnull, *args, '-x', 'c++')
+
+    key = None
+    if cache is not None:
+        key = cache.key('check_compiles', body, flags, compiler_identity(compiler))
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
     with tempfile.TemporaryDirectory() as dtemp:
         fname = os.path.join(dtemp, 'temp.cc')
         with open(fname, 'wt') as wfp:
             for line in body:
                 print(line, file=wfp)
-        process_args = (cxx or os.environ.get('CXX', 'c++'), *cppflags, *cxxflags, '-o', os.devnull, *args, '-x', 'c++', fname)
         result = subprocess.run(
-            process_args,
+            (compiler, *flags, fname),
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             universal_newlines=True,
             check=False
         )
-        return CompileResult(result)
+        result = CompileResult(result)
+
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+def check_all_compile(bodies, *args, cxx=None, cache=None, max_workers=None):
+    '''
+    Check whether each of the given bodies compiles, as with :func:`check_compiles`.
+    The compiler is run concurrently by a pool of threads.
+
+    :param bodies: an iterable of bodies, each of which is an iterable of lines
+    :param max_workers: the largest number of concurrent compilations. If None, the number of available processors is used.
+    :returns: a list of results, in the same order as the bodies
+    '''
+    bodies = [list(b) for b in bodies]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=(max_workers or os.cpu_count() or 1)) as executor:
+        return list(executor.map(lambda b: check_compiles(b, *args, cxx=cxx, cache=cache), bodies))
 
 def brace_wrap(body):
     ''' Wrap and indent the iterable. '''
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import itertools
 
 from . import util
@@ -71,19 +72,17 @@ def list_defaults_for_core(cpu, caches):
         map(connect_translator, dcache_path[1], dtlb_path[1]) #L1D translation path
     )
 
-# Round-Robin recipe from itertools
 def roundrobin(*paths):
-    ''' Yield from each of the iterables in turn '''
-    num_active = len(paths)
-    nexts = itertools.cycle(iter(it).__next__ for it in paths)
-    while num_active:
+    ''' Yield from each of the iterables in turn, dropping each as it is exhausted '''
+    iterators = collections.deque(map(iter, paths))
+    while iterators:
+        it = iterators.popleft()
         try:
-            for next_func in nexts:
-                yield next_func()
+            value = next(it)
         except StopIteration:
-            # Remove the iterator we just exhausted from the cycle.
-            num_active -= 1
-            nexts = itertools.cycle(itertools.islice(nexts, num_active))
+            continue
+        yield value
+        iterators.append(it)
 
 def list_defaults(cores, caches):
     ''' Generate the down-path defaults for all cores, merging with priority towards lower levels '''
@@ -12,15 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import difflib
+import collections
+import concurrent.futures
 import hashlib
 import itertools
 import operator
 import os
 import json
 import pathlib
+import uuid
 
 from .makefile import get_makefile_lines
+from .makefile import get_makefile_index_lines
 from .instantiation_file import get_instantiation_lines
 from .instantiation_file import get_instantiation_header
 from . import util
@@ -42,52 +45,182 @@ def make_generated_warning():
     ''' Generate a warning commented in a Make style. '''
     return contextualize_warning('###', '#', '###')
 
+def header_length(fname):
+    ''' The number of lines of generated-file warning at the beginning of a file with the given name. '''
+    if os.path.splitext(fname)[1] in ('.cc', '.h', '.inc'):
+        return len(cxx_generated_warning())
+    if os.path.splitext(fname)[1] in ('.mk',):
+        return len(make_generated_warning())
+    return 0
+
 def cxx_file(lines):
     ''' Generate a C++ file, with a warning header. '''
     yield from cxx_generated_warning()
     yield from lines
 
+def lines_digest(lines):
+    '''
+    Produce a digest of a sequence of lines, excluding whitespace at the beginning or end of each line.
+    The lines are consumed one at a time, so an open file may be given without reading it into memory.
+    '''
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line.strip().encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
 def files_are_different(rfp, new_rfp, verbose=False):
     ''' Determine if the two files are different, excluding whitespace at the beginning or end of lines '''
-    old_file_lines = list(l.strip() for l in rfp)
-    new_file_lines = list(l.strip() for l in new_rfp)
-    diff = difflib.SequenceMatcher(a=old_file_lines, b=new_file_lines).ratio()
+    old_digest = lines_digest(rfp)
+    new_digest = lines_digest(new_rfp)
     if verbose:
-        print('File difference:', diff)
-    return diff < 1
+        print('File digests:', old_digest, new_digest)
+    return old_digest != new_digest
+
+def file_stamp(fname):
+    ''' The modification time and size of a file, or None if it does not exist. '''
+    try:
+        stat = os.stat(fname)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def existing_digest(fname, digest_fname=None):
+    '''
+    Get the digest of an existing file, as given by :func:`lines_digest`, or None if it does not exist.
+
+    If a digest file is given, and it was recorded for the file as it is now, the stored digest is used without reading the file.
 
-def write_if_different(fname, new_file_string, file=None, verbose=False):
+    :param fname: the name of the file
+    :param digest_fname: the name of the file in which the digest was stored by :func:`write_if_different`
+    '''
+    stamp = file_stamp(fname)
+    if stamp is None:
+        return None
+
+    if digest_fname is not None:
+        try:
+            with open(digest_fname, 'rt') as rfp:
+                stored = json.load(rfp)
+            if stored.get('stamp') == stamp:
+                return stored.get('digest')
+        except (OSError, ValueError):
+            pass
+
+    with open(fname, 'rt') as rfp:
+        return lines_digest(rfp)
+
+def temporary_name(fname):
+    ''' A unique name for a temporary file in the same directory as the given file. '''
+    dirname = os.path.dirname(os.path.abspath(fname))
+    return os.path.join(dirname, f'.{os.path.basename(fname)}.{uuid.uuid4().hex}.tmp')
+
+def replace_file(fname, contents):
+    '''
+    Replace the contents of a file atomically.
+    The contents are written to a temporary file in the same directory, which is then renamed over the destination,
+    so concurrent readers such as a running make see either the old file or the new one, never a partial file.
+    '''
+    os.makedirs(os.path.dirname(os.path.abspath(fname)), exist_ok=True)
+    tmp_fname = temporary_name(fname)
+    try:
+        with open(tmp_fname, 'xt') as wfp:
+            wfp.write(contents)
+        os.replace(tmp_fname, fname)
+    except BaseException:
+        if os.path.exists(tmp_fname):
+            os.remove(tmp_fname)
+        raise
+
+def digest_path(digest_dir, fname):
+    ''' The file within the digest directory in which the digest of the given file is stored. '''
+    return os.path.join(digest_dir, hashlib.sha256(os.path.abspath(fname).encode('utf-8')).hexdigest() + '.json')
+
+def store_digest(fname, digest, digest_fname):
+    ''' Record the digest of a file as it is now, unless the same record is already stored. '''
+    stored = {'digest': digest, 'stamp': file_stamp(fname)}
+    try:
+        with open(digest_fname, 'rt') as rfp:
+            up_to_date = (json.load(rfp) == stored)
+    except (OSError, ValueError):
+        up_to_date = False
+    if not up_to_date:
+        replace_file(digest_fname, json.dumps(stored))
+
+def write_if_different(fname, new_file_string, file=None, verbose=False, digest_fname=None):
     '''
     Write to a file if and only if it differs from an existing file with the same name.
+    Files are compared by digest, excluding whitespace at the beginning or end of lines, and are written atomically.
 
     :param fname: the name of the destination file
     :param new_file_string: the desired contents of the file
+    :param file: if given, an open file to write to instead
+    :param digest_fname: if given, the digest of the destination is stored in this file, so that it need not be read again while it is unchanged
     '''
-    should_write = True
-    if os.path.exists(fname):
-        with open(fname, 'rt') as rfp:
-            should_write = files_are_different(rfp, new_file_string.splitlines())
+    new_digest = lines_digest(new_file_string.splitlines())
+    should_write = existing_digest(fname, digest_fname) != new_digest
 
     if should_write:
         if verbose:
             print("Writing file", fname)
 
         if file is None:
-            os.makedirs(os.path.abspath(os.path.dirname(fname)), exist_ok=True)
-            with open(fname, 'wt') as wfp:
-                wfp.write(new_file_string)
+            replace_file(fname, new_file_string)
         else:
             file.write(new_file_string)
 
-def try_int(val):
+    if file is None and digest_fname is not None:
+        store_digest(fname, new_digest, digest_fname)
+
+def replace_if_different(tmp_fname, fname, verbose=False, digest_fname=None):
     '''
-    Attempt to convert the value to a Python standard int.
-    For use with json.dump().
+    Rename a complete temporary file over a destination file if and only if their contents differ, with the same comparison
+    as :func:`write_if_different`. Otherwise, the temporary file is removed.
+
+    :param tmp_fname: the temporary file, which must be in the same directory as the destination
+    :param fname: the name of the destination file
+    :param digest_fname: if given, the digest of the destination is stored in this file
     '''
-    try:
-        return int(val)
-    except Exception as exc:
-        raise TypeError from exc
+    with open(tmp_fname, 'rt') as rfp:
+        new_digest = lines_digest(rfp)
+
+    if existing_digest(fname, digest_fname) != new_digest:
+        if verbose:
+            print("Writing file", fname)
+        os.replace(tmp_fname, fname)
+    else:
+        os.remove(tmp_fname)
+
+    if digest_fname is not None:
+        store_digest(fname, new_digest, digest_fname)
+
+def for_each_file(func, items, max_workers=None):
+    ''' Apply the function to each item, concurrently with a pool of threads if there is more than one. '''
+    items = list(items)
+    if len(items) < 2 or max_workers == 1:
+        for item in items:
+            func(item)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _ in executor.map(func, items): # consume the results to raise any exceptions
+            pass
+
+def build_fingerprint(parsed_config):
+    '''
+    Produce a stable identifier for a build, from only those fields of a parsed configuration that affect its generated code:
+    the executable name, the elements, the modules that are compiled, and the values exported to the environment.
+
+    Modules that are found in the search paths but not compiled do not contribute, so adding an unrelated module does not change the identifier.
+    The sources of the compiled modules do not contribute either, since the build system tracks their dependencies itself.
+
+    :param parsed_config: the result of parsing a configuration file
+    '''
+    executable_basename, elements, modules_to_compile, module_info, config_file = parsed_config
+    joined_module_info = util.chain(*module_info.values())
+    compiled_modules = {name: joined_module_info[name] for name in sorted(modules_to_compile)}
+    canonical = json.dumps([executable_basename, elements, compiled_modules, config_file], sort_keys=True, separators=(',', ':'), default=util.try_int)
+    return hashlib.shake_128(canonical.encode('utf-8')).hexdigest(8)
 
 class Fragment:
     '''
@@ -99,14 +232,7 @@ class Fragment:
     def __part_joiner(iterable):
         it = iter(iterable)
         key, first_value = next(it)
-
-        header_len = 0
-        if os.path.splitext(key)[1] in ('.cc', '.h', '.inc'):
-            header_len = len(cxx_generated_warning())
-        if os.path.splitext(key)[1] in ('.mk',):
-            header_len = len(make_generated_warning())
-
-        contents_parts = (itertools.islice(v[1], header_len, None) for v in it)
+        contents_parts = (itertools.islice(v[1], header_length(key), None) for v in it)
         return key, tuple(itertools.chain(first_value, *contents_parts))
 
     def __init__(self, fileparts=None):
@@ -120,7 +246,7 @@ class Fragment:
         return Fragment(fileparts)
 
     @staticmethod
-    def from_config(parsed_config, bindir_name=None, srcdir_names=None, objdir_name=None, makedir_name=None, verbose=False):
+    def from_config(parsed_config, bindir_name=None, srcdir_names=None, objdir_name=None, makedir_name=None, sharded=False, verbose=False):
         '''
         Produce a sequence of Fragments from the result of parse.parse_config().
 
@@ -129,6 +255,7 @@ class Fragment:
         :param srcdir_name: the directory to search for source files
         :param objdir_name: the directory to place object files
         :param makedir_name: the directory to place makefiles
+        :param sharded: if true, write the makefile lines for this configuration to a separate file, named by the build ID, and list it in an index
         '''
         champsim_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         bindir_name = bindir_name or os.path.join(champsim_root, 'bin')
@@ -143,7 +270,7 @@ class Fragment:
             print('Object directory:', objdir_name)
             print('Makefile directory:', makedir_name)
 
-        build_id = hashlib.shake_128(json.dumps(parsed_config, sort_keys=True, default=try_int).encode('utf-8')).hexdigest(8)
+        build_id = build_fingerprint(parsed_config)
 
         executable_basename, elements, modules_to_compile, module_info, config_file = parsed_config
 
@@ -165,20 +292,44 @@ class Fragment:
         fileparts = [
             # Instantiation file
             (os.path.join(objdir_name, 'core_inst.inc'), cxx_file(get_instantiation_header(len(elements['cores']), config_file, build_id=build_id))),
-            (os.path.join(objdir_name, 'core_inst.cc.inc'), cxx_file(get_instantiation_lines(build_id=build_id, **elements))),
+            (os.path.join(objdir_name, 'core_inst.cc.inc'), cxx_file(get_instantiation_lines(build_id=build_id, **elements)))
+        ]
 
-            # Makefile generation
-            (os.path.join(makedir_name, '_configuration.mk'), (
+        # Makefile generation
+        if sharded:
+            shard_fname = os.path.abspath(os.path.join(makedir_name, '_configuration', f'{build_id}.mk'))
+            fileparts.extend((
+                (shard_fname, (
+                    *make_generated_warning(),
+                    *get_makefile_lines(build_id, executable, joined_module_info, list_executable=False)
+                )),
+                (os.path.join(makedir_name, '_configuration.mk'), (
+                    *make_generated_warning(),
+                    *get_makefile_index_lines(executable, shard_fname, joined_module_info)
+                ))
+            ))
+        else:
+            fileparts.append((os.path.join(makedir_name, '_configuration.mk'), (
                 *make_generated_warning(),
                 *get_makefile_lines(build_id, executable, joined_module_info)
-            ))
-        ]
+            )))
+
         return Fragment(list(util.collect(fileparts, operator.itemgetter(0), Fragment.__part_joiner))) # hoist the parts
 
-    def write(self, verbose=False):
-        ''' Write the internal series of fragments to file. '''
-        for fname, fcontents in self.fileparts:
-            write_if_different(fname, '\n'.join(l.rstrip() for l in fcontents), verbose=verbose)
+    def write(self, verbose=False, digest_dir=None, max_workers=None):
+        '''
+        Write the internal series of fragments to file.
+        If there is more than one file, they are written concurrently by a pool of threads.
+
+        :param digest_dir: if given, a directory in which to store the digest of each file written, so that unchanged files are not read again
+        :param max_workers: the largest number of threads to use. If None, the default for ``concurrent.futures.ThreadPoolExecutor`` is used.
+        '''
+        def write_part(part):
+            fname, fcontents = part
+            digest_fname = None if digest_dir is None else digest_path(digest_dir, fname)
+            write_if_different(fname, '\n'.join(l.rstrip() for l in fcontents), verbose=verbose, digest_fname=digest_fname)
+
+        for_each_file(write_part, self.fileparts, max_workers=max_workers)
 
     def file_parts(self):
         return self.fileparts
@@ -186,6 +337,82 @@ class Fragment:
     def __iter__(self):
         return iter(self.file_parts())
 
+class StreamedOutput:
+    '''
+    A set of output files that are appended to as their parts arrive, rather than held in memory.
+
+    Each file is accumulated in a temporary file beside its destination. The first part written to a file keeps its
+    generated-file warning, and the warning is removed from later parts, as in :meth:`Fragment.join`.
+    When the output is committed, each temporary file replaces its destination only if their contents differ.
+
+    :param max_open_files: the largest number of temporary files to hold open at once
+    '''
+    def __init__(self, max_open_files=64):
+        self.max_open_files = max_open_files
+        self.tmp_fnames = {}
+        self.nonempty = set()
+        self.handles = collections.OrderedDict()
+
+    def handle(self, fname):
+        ''' Get an open handle on the temporary file for the given destination, closing the least recently used if too many are open. '''
+        if fname in self.handles:
+            self.handles.move_to_end(fname)
+            return self.handles[fname]
+        wfp = open(self.tmp_fnames[fname], 'at')
+        self.handles[fname] = wfp
+        if len(self.handles) > self.max_open_files:
+            self.handles.popitem(last=False)[1].close()
+        return wfp
+
+    def append(self, fname, lines):
+        '''
+        Append the lines of one part to the given file.
+
+        :param fname: the name of the destination file
+        :param lines: the lines of the part, including its generated-file warning
+        '''
+        if fname in self.tmp_fnames:
+            lines = itertools.islice(lines, header_length(fname), None)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(fname)), exist_ok=True)
+            self.tmp_fnames[fname] = temporary_name(fname)
+            with open(self.tmp_fnames[fname], 'xt'):
+                pass
+
+        wfp = self.handle(fname)
+        for line in lines:
+            if fname in self.nonempty:
+                wfp.write('\n')
+            wfp.write(line.rstrip())
+            self.nonempty.add(fname)
+
+    def close(self):
+        ''' Close all open handles. '''
+        while self.handles:
+            self.handles.popitem()[1].close()
+
+    def commit(self, verbose=False, digest_dir=None, max_workers=None):
+        '''
+        Move each accumulated file into place, if it differs from the existing file. The parameters are as for :meth:`Fragment.write`.
+        '''
+        self.close()
+        def commit_file(fname):
+            digest_fname = None if digest_dir is None else digest_path(digest_dir, fname)
+            replace_if_different(self.tmp_fnames[fname], fname, verbose=verbose, digest_fname=digest_fname)
+
+        for_each_file(commit_file, sorted(self.tmp_fnames), max_workers=max_workers)
+        self.tmp_fnames = {}
+        self.nonempty = set()
+
+    def discard(self):
+        ''' Remove all accumulated files without writing them. '''
+        self.close()
+        for tmp_fname in self.tmp_fnames.values():
+            if os.path.exists(tmp_fname):
+                os.remove(tmp_fname)
+        self.tmp_fnames = {}
+        self.nonempty = set()
+
 class FileWriter:
     '''
     This class maintains the state of one or more configurations to be written.
@@ -194,17 +421,27 @@ class FileWriter:
 
     :param bindir_name: The default directory for binaries if none is given to write_files().
     :param objdir_name: The default directory for object files if none is given to write_files().
+    :param cache: An instance of :class:`config.configcache.ConfigureCache`. Fragments found in the cache are not generated again.
+    :param sharded: If true, each configuration's makefile lines are written to a separate file, and `_configuration.mk` is an index of them.
+    :param digest_dir: If given, a directory in which to store the digests of the files written. See :meth:`Fragment.write`.
+    :param streaming: If true, each configuration is appended to the output files as it is given to write_files(), instead of being held in memory until finish(). The files written are the same.
     '''
-    def __init__(self, bindir_name=None, objdir_name=None, makedir_name=None, verbose=False):
+    def __init__(self, bindir_name=None, objdir_name=None, makedir_name=None, cache=None, sharded=False, digest_dir=None, streaming=False, verbose=False):
         self.fragments = []
+        self.output = StreamedOutput() if streaming else None
         self.bindir_name = bindir_name
         self.objdir_name = objdir_name
         self.makedir_name = makedir_name
+        self.cache = cache
+        self.sharded = sharded
+        self.digest_dir = digest_dir
         self.verbose = verbose
 
     def __enter__(self):
         ''' This function forms one half of the context manager interface '''
         self.fragments = []
+        if self.output is not None:
+            self.output.discard()
         return self
 
     def write_files(self, parsed_config, bindir_name=None, srcdir_names=None, objdir_name=None, makedir_name=None):
@@ -217,27 +454,49 @@ class FileWriter:
         :param srcdir_name: the directory to search for source files
         :param objdir_name: the directory to place object files
         '''
-        self.fragments.append(Fragment.from_config(
-            parsed_config,
+        fragment_args = dict(
             bindir_name=bindir_name or self.bindir_name,
             srcdir_names=srcdir_names or [],
             objdir_name=os.path.abspath(objdir_name or self.objdir_name),
             makedir_name=makedir_name or self.makedir_name,
-            verbose=self.verbose
-        ))
+            sharded=self.sharded
+        )
+
+        if self.cache is None:
+            fragment = Fragment.from_config(parsed_config, **fragment_args, verbose=self.verbose)
+        else:
+            key = self.cache.key('fragment', parsed_config, fragment_args)
+            fragment = self.cache.get(key)
+            if fragment is None:
+                fragment = Fragment.from_config(parsed_config, **fragment_args, verbose=self.verbose)
+                self.cache.put(key, fragment)
+
+        if self.output is None:
+            self.fragments.append(fragment)
+        else:
+            for fname, fcontents in fragment:
+                self.output.append(fname, fcontents)
 
     @staticmethod
-    def write_fragments(*fragments):
+    def write_fragments(*fragments, digest_dir=None):
         ''' Write out a set of prepared fragments. '''
         if not fragments:
             return
-        Fragment.join(*fragments).write()
+        Fragment.join(*fragments).write(digest_dir=digest_dir)
 
     def finish(self):
         ''' Write all accumulated configurations to their files. '''
-        FileWriter.write_fragments(*self.fragments)
+        if self.output is None:
+            FileWriter.write_fragments(*self.fragments, digest_dir=self.digest_dir)
+        else:
+            self.output.commit(digest_dir=self.digest_dir)
 
     def __exit__(self, exc_type, exc_value, traceback):
-        ''' This function terminates the context manager and calls :meth:`finish()`. '''
+        '''
+        This function terminates the context manager and calls :meth:`finish()`.
+        If an exception was raised, nothing is written, and any partial streamed output is removed.
+        '''
         if exc_type is None:
             self.finish()
+        elif self.output is not None:
+            self.output.discard()
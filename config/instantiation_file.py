@@ -15,12 +15,12 @@
 import itertools
 import functools
 import operator
-import os
 import tempfile
 import multiprocessing as mp
 
 from . import util
 from . import cxx
+from . import modules
 
 pmem_fmtstr = 'champsim::chrono::picoseconds{{{clock_period_dbus}}}, champsim::chrono::picoseconds{{{clock_period_mc}}}, std::size_t{{{_tRP}}}, std::size_t{{{_tRCD}}}, std::size_t{{{_tCAS}}}, std::size_t{{{_tRAS}}}, champsim::chrono::microseconds{{{_refresh_period}}}, {{{_ulptr}}}, {rq_size}, {wq_size}, {channels}, champsim::data::bytes{{{channel_width}}}, {_bank_rows}, {_bank_columns}, {ranks}, {bankgroups}, {banks}, {_refreshes_per_period}'
 vmem_fmtstr = 'champsim::data::bytes{{{pte_page_size}}}, {num_levels}, champsim::chrono::picoseconds{{{clock_period}*{minor_fault_penalty}}}, {dram_name}, {_randomization}'
@@ -105,6 +105,49 @@ def vector_string(iterable):
         return hoisted[0]
     return '{'+', '.join(hoisted)+'}'
 
+class Topology:
+    '''
+    An index over the channels between the elements of a system.
+
+    Channels are numbered by their position in the sequence of (lower_name, upper_name) pairs, as produced by :func:`get_upper_levels`.
+    The channel index of a pair, the channels above an element, and the position of a cache may all be found in constant time.
+
+    :param ul_pairs: a sequence of (lower_name, upper_name) pairs
+    :param caches: the caches of the system, in the order in which they are instantiated
+    '''
+    def __init__(self, ul_pairs, caches=tuple()):
+        self.pairs = list(ul_pairs)
+        self.channel_indices = {}
+        self.uppers = {}
+        for i, pair in enumerate(self.pairs):
+            self.channel_indices.setdefault(pair, i)
+            self.uppers.setdefault(pair[0], []).append(pair)
+
+        self.cache_indices = {}
+        for i, cache in enumerate(caches):
+            self.cache_indices.setdefault(cache['name'], i)
+
+    def __iter__(self):
+        return iter(self.pairs)
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def index(self, pair):
+        ''' The index of the channel between the given (lower_name, upper_name) pair. '''
+        try:
+            return self.channel_indices[pair]
+        except KeyError:
+            raise ValueError(f'{pair} is not a channel') from None
+
+    def upper_channels(self, name):
+        ''' The indices of the channels to the upper levels of the named element. '''
+        return [self.channel_indices[pair] for pair in self.uppers.get(name, [])]
+
+    def cache_index(self, name):
+        ''' The position of the named cache. '''
+        return self.cache_indices[name]
+
 def get_cpu_builder(cpu, caches, ul_pairs):
     '''
     Generate a champsim::core_builder
@@ -112,16 +155,15 @@ def get_cpu_builder(cpu, caches, ul_pairs):
     required_parts = [
     ]
 
-    def cache_index(name):
-        return next(filter(lambda x: x[1]['name'] == name, enumerate(caches)))[0]
+    topology = ul_pairs if isinstance(ul_pairs, Topology) else Topology(ul_pairs, caches)
 
     local_params = {
         '^branch_predictor_string': ', '.join(f'class {k["class"]}' for k in cpu.get('_branch_predictor_data',[])),
         '^btb_string': ', '.join(f'class {k["class"]}' for k in cpu.get('_btb_data',[])),
-        '^fetch_queues': f'channels.at({ul_pairs.index((cpu.get("L1I"), cpu.get("name")))})',
-        '^data_queues': f'channels.at({ul_pairs.index((cpu.get("L1D"), cpu.get("name")))})',
-        '^l1i_ptr': f'(*std::next(std::begin(caches), {cache_index(cpu.get("L1I"))}))',
-        '^l1d_ptr': f'(*std::next(std::begin(caches), {cache_index(cpu.get("L1D"))}))'
+        '^fetch_queues': f'channels.at({topology.index((cpu.get("L1I"), cpu.get("name")))})',
+        '^data_queues': f'channels.at({topology.index((cpu.get("L1D"), cpu.get("name")))})',
+        '^l1i_ptr': f'(*std::next(std::begin(caches), {topology.cache_index(cpu.get("L1I"))}))',
+        '^l1d_ptr': f'(*std::next(std::begin(caches), {topology.cache_index(cpu.get("L1D"))}))'
     }
     if 'frequency' in cpu:
         local_params['^clock_period'] = int(1000000/cpu['frequency'])
@@ -152,20 +194,21 @@ def get_cache_builder(elem, ul_pairs):
         ('virtual_prefetch', False): '.reset_virtual_prefetch()'
     }
 
-    uppers = (v for v in ul_pairs if v[0] == elem.get('name'))
+    topology = ul_pairs if isinstance(ul_pairs, Topology) else Topology(ul_pairs)
+
     local_params = {
         '^defaults': elem.get('_defaults', ''),
-        '^upper_levels_string': vector_string(f'&channels.at({ul_pairs.index(v)})' for v in uppers),
+        '^upper_levels_string': vector_string(f'&channels.at({i})' for i in topology.upper_channels(elem.get('name'))),
         '^prefetch_activate_string': ', '.join('access_type::'+t for t in elem.get('prefetch_activate',[])),
         '^replacement_string': ', '.join(f'class {k["class"]}' for k in elem.get('_replacement_data',[])),
         '^prefetcher_string': ', '.join(f'class {k["class"]}' for k in elem.get('_prefetcher_data',[])),
-        '^lower_level_queues': f'channels.at({ul_pairs.index((elem.get("lower_level"), elem.get("name")))})'
+        '^lower_level_queues': f'channels.at({topology.index((elem.get("lower_level"), elem.get("name")))})'
     }
     if 'frequency' in elem:
         local_params['^clock_period'] = int(1000000/elem['frequency'])
     if 'lower_translate' in elem:
         local_params.update({
-            '^lower_translate_queues': f'channels.at({ul_pairs.index((elem.get("lower_translate"), elem.get("name")))})'
+            '^lower_translate_queues': f'channels.at({topology.index((elem.get("lower_translate"), elem.get("name")))})'
         })
 
     builder_parts = itertools.chain(util.multiline(itertools.chain(
@@ -193,10 +236,11 @@ def get_ptw_builder(ptw, ul_pairs):
         ('pscl2_set', 'pscl2_way'): '.add_pscl(2, {pscl2_set}, {pscl2_way})'
     }
 
-    uppers = (v for v in ul_pairs if v[0] == ptw.get('name'))
+    topology = ul_pairs if isinstance(ul_pairs, Topology) else Topology(ul_pairs)
+
     local_params = {
-        '^upper_levels_string': vector_string(f'&channels.at({ul_pairs.index(v)})' for v in uppers),
-        '^lower_level_queues': f'channels.at({ul_pairs.index((ptw.get("lower_level"), ptw.get("name")))})'
+        '^upper_levels_string': vector_string(f'&channels.at({i})' for i in topology.upper_channels(ptw.get('name'))),
+        '^lower_level_queues': f'channels.at({topology.index((ptw.get("lower_level"), ptw.get("name")))})'
     }
     if 'frequency' in ptw:
         local_params['^clock_period'] = int(1000000/ptw['frequency'])
@@ -248,9 +292,9 @@ def get_builder_function_call(class_name, builders):
 
 def cache_queue_defaults(cache):
     return {
-        'rq_size': cache.get('rq_size', cache['_queue_factor']),
-        'wq_size': cache.get('wq_size', cache['_queue_factor']),
-        'pq_size': cache.get('pq_size', cache['_queue_factor']),
+        'rq_size': cache['rq_size'] if 'rq_size' in cache else cache['_queue_factor'],
+        'wq_size': cache['wq_size'] if 'wq_size' in cache else cache['_queue_factor'],
+        'pq_size': cache['pq_size'] if 'pq_size' in cache else cache['_queue_factor'],
         '_offset_bits': cache['_offset_bits'],
         '_queue_check_full_addr': cache['_queue_check_full_addr']
     }
@@ -282,32 +326,28 @@ def module_include_files(datas):
     Generate C++ include lines for all header files necessary to compile the given modules.
 
     It is assumed that all header files in the directory contribute to compilation.
+    The headers are read from the module index shared by the process, so each module directory is only walked once,
+    no matter how many builds include it.
     '''
+    paths = dict.fromkeys(module_data['path'] for module_data in datas)
+    candidates = dict.fromkeys(itertools.chain.from_iterable(modules.process_index.module(path)['headers'] for path in paths))
 
-    def all_headers_on(path):
-        for base,_,files in os.walk(path):
-            for file in files:
-                if os.path.splitext(file)[1] == '.h':
-                    yield os.path.abspath(os.path.join(base, file))
-
-    class_paths = (zip(itertools.repeat(module_data['class']), all_headers_on(module_data['path'])) for module_data in datas)
-    candidates = set(itertools.chain.from_iterable(class_paths))
-
-    yield from (f'#include "{f}"' for _,f in candidates)
+    yield from (f'#include "{f}"' for f in candidates)
 
 def decorate_queues(caches, ptws, pmem):
-    return util.chain(
-            *({c['name']: cache_queue_defaults(c)} for c in caches),
-            *({p['name']: ptw_queue_defaults(p)} for p in ptws),
-            {pmem['name']: {
+    # Every decoration has the same keys, so earlier elements take priority as they would under util.chain(),
+    # without the cost of merging one element at a time.
+    return dict(itertools.chain(
+            ((pmem['name'], {
                     'rq_size':'std::numeric_limits<std::size_t>::max()',
                     'wq_size':'std::numeric_limits<std::size_t>::max()',
                     'pq_size':'std::numeric_limits<std::size_t>::max()',
                     '_offset_bits':'champsim::lg2(BLOCK_SIZE)',
                     '_queue_check_full_addr':False
-                }
-            }
-    )
+                }),),
+            ((p['name'], ptw_queue_defaults(p)) for p in reversed(ptws)),
+            ((c['name'], cache_queue_defaults(c)) for c in reversed(caches))
+    ))
 
 def get_queue_info(ul_pairs, decoration):
     return [decoration.get(ll) for ll,_ in ul_pairs]
@@ -317,7 +357,7 @@ def get_instantiation_lines(cores, caches, ptws, pmem, vmem, build_id):
     Generate the lines for a C++ file that instantiates a configuration.
     '''
     classname = f'champsim::configured::generated_environment<0x{build_id}>'
-    ul_pairs = get_upper_levels(cores, caches, ptws)
+    ul_pairs = Topology(get_upper_levels(cores, caches, ptws), caches)
     queues = get_queue_info(ul_pairs, decorate_queues(caches, ptws, pmem))
 
     datas = itertools.filterfalse(operator.methodcaller('get', 'legacy', False), itertools.chain(
@@ -347,7 +387,7 @@ def get_instantiation_lines(cores, caches, ptws, pmem, vmem, build_id):
             _bank_columns=int(pmem['columns']*8 if 'columns' in pmem else pmem['bank_columns']),
             _refresh_period=int(1000*pmem['refresh_period']),
             _refreshes_per_period=int(pmem['refreshes_per_period']),
-            _ulptr=vector_string(f'&channels.at({ul_pairs.index(v)})' for v in ul_pairs if v[0] == pmem['name']),
+            _ulptr=vector_string(f'&channels.at({i})' for i in ul_pairs.upper_channels(pmem['name'])),
             **pmem),
         '},'
     )
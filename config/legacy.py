@@ -1,6 +1,8 @@
 import itertools
 import functools
 import os
+import pathlib
+import time
 
 from . import util
 from . import cxx
@@ -125,25 +127,30 @@ def apply_getfunction(info):
         'replacement': get_repl_data
     }.get(info['type_guess'], lambda x: x)(info)
 
-if __name__ == '__main__':
-    import argparse
-
-    parser = argparse.ArgumentParser('Legacy module support generator')
-    parser.add_argument('--kind', choices=['options','header','mangle','source'])
-    parser.add_argument('paths', action='append')
-    args = parser.parse_args()
+legacy_kinds = ('options', 'header', 'mangle', 'source')
 
-    infos = [{
-        'name': modules.get_module_name(p),
-        'path': p,
+def get_legacy_module_info(path):
+    ''' Describe the legacy module at the given path, guessing its type from the path. '''
+    info = {
+        'name': modules.get_module_name(path),
+        'path': path,
         'legacy': True
-    } for p in args.paths]
-    for i in infos:
-        i.update({
-            'type_guess': next(filter(lambda t: t in i['path'], ('branch', 'btb', 'prefetcher', 'replacement')), ''),
-            'class': f'champsim::modules::generated::{i["name"]}'
-        })
-    infos = list(map(apply_getfunction, infos))
+    }
+    info.update({
+        'type_guess': next(filter(lambda t: t in info['path'], ('branch', 'btb', 'prefetcher', 'replacement')), ''),
+        'class': f'champsim::modules::generated::{info["name"]}'
+    })
+    return apply_getfunction(info)
+
+def get_legacy_fileparts(paths, kinds=legacy_kinds):
+    '''
+    Generate the support files for each of the legacy modules at the given paths.
+
+    :param paths: the directories of the legacy modules
+    :param kinds: the kinds of file to generate, a subset of ``legacy_kinds``
+    :returns: a list of tuples of the file name and an iterable of its lines
+    '''
+    infos = list(map(get_legacy_module_info, paths))
 
     parts = {
         'branch': ('ooo_cpu.h', 'branch_predictor', branch_variant_data),
@@ -151,16 +158,16 @@ if __name__ == '__main__':
         'prefetcher': ('cache.h', 'prefetcher', pref_variant_data),
         'replacement': ('cache.h', 'replacement', repl_variant_data)
     }
-    zipped_parts = ((parts.get(i['type_guess'], ('', '', {})),i) for i in infos)
+    zipped_parts = [(parts.get(i['type_guess'], ('', '', {})),i) for i in infos]
 
     fileparts = []
 
-    if args.kind == 'options':
+    if 'options' in kinds:
         fileparts.extend(
             (os.path.join(mod_info['path'], 'legacy.options'), get_legacy_module_opts_lines(mod_info))
         for mod_info in infos)
 
-    if args.kind == 'mangle':
+    if 'mangle' in kinds:
         fileparts.extend((os.path.join(mod_info['path'], 'legacy_bridge.inc'), filewrite.cxx_file((
             f'#ifndef CHAMPSIM_LEGACY_{mod_info["name"]}',
             f'#define CHAMPSIM_LEGACY_{mod_info["name"]}',
@@ -168,7 +175,7 @@ if __name__ == '__main__':
             '#endif'
         ))) for (_, _, var), mod_info in zipped_parts)
 
-    if args.kind == 'header':
+    if 'header' in kinds:
         fileparts.extend((os.path.join(mod_info['path'], 'legacy_bridge.h'), filewrite.cxx_file((
             '#include <string_view>',
             '#include "modules.h"',
@@ -179,14 +186,44 @@ if __name__ == '__main__':
             '}'
         ))) for (header_name, classname, variant), mod_info in zipped_parts)
 
-    if args.kind == 'source':
+    if 'source' in kinds:
         fileparts.extend((os.path.join(mod_info['path'], 'legacy_bridge.cc'), filewrite.cxx_file((
             '#include "legacy_bridge.h"', '',
             *get_discriminator(variant, mod_info),
         ))) for (header_name, _, variant), mod_info in zipped_parts)
 
+    return fileparts
 
-    for fname, fcontents in fileparts:
+def write_legacy_files(paths, kinds=legacy_kinds, stamp=None):
+    '''
+    Write the support files for each of the legacy modules at the given paths, in a single process.
+
+    :param paths: the directories of the legacy modules
+    :param kinds: the kinds of file to generate, a subset of ``legacy_kinds``
+    :param stamp: if given, a file to touch after every support file is written. Its modification time is set to when writing began,
+        so that every support file is at least as new as it, and it is left unchanged if any file cannot be written.
+    '''
+    start = time.time_ns()
+    for fname, fcontents in get_legacy_fileparts(paths, kinds):
         with open(fname, 'wt') as wfp:
             for line in fcontents:
                 print(line, file=wfp)
+
+    if stamp is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(stamp)), exist_ok=True)
+        pathlib.Path(stamp).touch()
+        os.utime(stamp, ns=(start, start))
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser('Legacy module support generator')
+    parser.add_argument('--kind', action='append', choices=legacy_kinds,
+            help='The kind of file to generate. May be given multiple times. If not given, all kinds are generated.')
+    parser.add_argument('--stamp',
+            help='Touch this file after generating, dated to when generating began, so that a single make target can stand for all of the generated files.')
+    parser.add_argument('paths', nargs='*',
+            help='The directories of the legacy modules')
+    args = parser.parse_args()
+
+    write_legacy_files(args.paths, kinds=(args.kind or legacy_kinds), stamp=args.stamp)
@@ -64,8 +64,24 @@ def relroot(abspath):
     champsim_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     return os.path.relpath(abspath, start=champsim_root)
 
-def get_makefile_lines(build_id, executable, module_info):
-    ''' Generate all of the lines to be written in a particular configuration's makefile '''
+def get_legacy_lines(module_info):
+    '''
+    Generate the lines that list the legacy modules of a configuration, both as prerequisites of the shared generated files and
+    in the list of modules whose support files are generated in a single batch.
+
+    :param module_info: The modules compiled for the configuration
+    '''
+    legacy_paths = [relroot(mod['path'])+'/' for mod in module_info.values() if mod.get('legacy',False)]
+    if legacy_paths:
+        yield from append_variable('configured_legacy_dirs', *legacy_paths)
+        yield from append_variable('prereq_for_generated', *legacy_paths, targets=['$(generated_files)'])
+
+def get_makefile_lines(build_id, executable, module_info, list_executable=True):
+    '''
+    Generate all of the lines to be written in a particular configuration's makefile
+
+    :param list_executable: If false, neither the executable nor its legacy modules are listed. This is the case when an index lists them instead.
+    '''
     yield from header({
         'Build ID': build_id,
         'Executable': executable,
@@ -78,12 +94,33 @@ def get_makefile_lines(build_id, executable, module_info):
     yield from hard_assign_variable('build_id', build_id, targets=[exe_basename])
 
     mod_paths = [relroot(mod["path"]) for mod in module_info.values()]
-    yield from append_variable('nonbase_module_objs', '$(filter-out $(base_module_objs),$(call get_module_list,', *mod_paths, '))')
+    if mod_paths:
+        yield from append_variable('configured_module_dirs', *mod_paths)
 
-    legacy_paths = [relroot(mod['path'])+'/' for mod in module_info.values() if mod.get('legacy',False)]
-    if legacy_paths:
-        yield from append_variable('prereq_for_generated', *legacy_paths, targets=['$(generated_files)'])
+    if list_executable:
+        yield from get_legacy_lines(module_info)
+        yield from append_variable('executable_name', exe_basename)
 
-    yield from append_variable('executable_name', exe_basename)
+    yield ''
+
+def get_makefile_index_lines(executable, shard_fname, module_info):
+    '''
+    Generate the lines that list a particular configuration in a sharded makefile index.
+
+    The index names every executable, and associates each with the makefile fragment that describes it,
+    so that only the fragments for the requested executables need to be read.
+    The legacy modules are listed in the index, not the fragment, since they are prerequisites of generated files that every executable
+    shares. Those files then have the same prerequisites no matter which executables are requested.
 
+    :param executable: The path to the executable
+    :param shard_fname: The path to the makefile fragment for the executable
+    :param module_info: The modules compiled for the configuration
+    '''
+    exe_dirname, exe_basename = os.path.split(os.path.normpath(executable))
+    exe_basename = os.path.join('$(BIN_ROOT)', exe_basename)
+    yield from hard_assign_variable('BIN_ROOT', exe_dirname)
+    yield from append_variable('executable_name', exe_basename)
+    yield from hard_assign_variable(f'configuration_shard_$(abspath {exe_basename})', shard_fname)
+    yield from append_variable('configuration_shards', shard_fname)
+    yield from get_legacy_lines(module_info)
     yield ''
@@ -12,22 +12,200 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
+import hashlib
 import itertools
+import json
+import os
+import tempfile
 
 def get_module_name(path, start=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))):
     ''' Create a mangled module name from the path to its sources '''
     fname_translation_table = str.maketrans('./-','_DH')
     return os.path.relpath(path, start=start).translate(fname_translation_table)
 
+def directory_mtimes(paths):
+    ''' Get the modification time of each of the directories, or None for any that no longer exist. '''
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+    return [mtime(p) for p in paths]
+
+def is_module_source(fname):
+    ''' Test whether a file in a module directory contributes to its compilation. Files generated for legacy modules do not. '''
+    base = os.path.basename(fname)
+    return os.path.splitext(base)[1] in ('.h', '.hh', '.hpp', '.inc', '.c', '.cc', '.cpp', '.cxx') and not base.startswith('legacy')
+
+def file_digest(fname):
+    ''' The SHA-256 digest of a file's contents. '''
+    digest = hashlib.sha256()
+    with open(fname, 'rb') as rfp:
+        for chunk in iter(lambda: rfp.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ModuleIndex:
+    '''
+    An index of the contents of module search paths and the module directories within them.
+
+    Each directory is read at most once, and the result is reused until the modification time of the directory changes.
+    Checking a modification time costs a single stat, where reading the directory again costs a full listing,
+    or a full walk of a module.
+
+    For each module, the index holds a manifest entry with its name, class, legacy status, header files,
+    and source files. The digest of each source file is computed only when it is asked for with :meth:`source_digests`, and is then kept in the entry. The index may be saved to disk and loaded by a later process,
+    in which case only the directories that have changed since are read again.
+    '''
+    manifest_version = 1
+
+    def __init__(self):
+        self.listings = {}
+        self.modules = {}
+        self.dirty = False
+
+    def listing(self, path):
+        '''
+        Get the entries in a directory, as a dictionary of names to whether the entry is itself a directory.
+        The order of the entries is the order in which the filesystem lists them.
+
+        :param path: the directory to list
+        '''
+        path = os.path.abspath(path)
+        stamp = directory_mtimes((path,))
+        entry = self.listings.get(path)
+        if entry is None or entry[0] != stamp:
+            with os.scandir(path) as it:
+                entry = [stamp, {e.name: e.is_dir() for e in it}]
+            self.listings[path] = entry
+            self.dirty = True
+        return entry[1]
+
+    def module(self, path):
+        '''
+        Get the manifest entry for the module at the given path.
+        The entry is reused until the modification time of any directory in the module changes.
+        Digests of source files that have not changed are kept when the entry is refreshed.
+
+        :param path: the module directory
+        '''
+        path = os.path.abspath(path)
+        entry = self.modules.get(path)
+        if entry is None or directory_mtimes(entry['dirs']) != entry['mtimes']:
+            walked = list(os.walk(path))
+            dirs = [base for base,_,_ in walked]
+            files = [os.path.join(base, f) for base,_,fnames in walked for f in fnames]
+            legacy_dirs = [base for base,_,fnames in walked if '__legacy__' in fnames]
+            name = get_module_name(path)
+            previous_sources = (entry or {}).get('sources', {})
+            entry = {
+                'name': name,
+                'path': path,
+                'class': 'champsim::modules::generated::'+name if legacy_dirs else os.path.basename(path),
+                'legacy': bool(legacy_dirs),
+                'legacy_dirs': legacy_dirs,
+                'headers': [f for f in files if os.path.splitext(f)[1] == '.h'],
+                'sources': {f: previous_sources.get(f) for f in files if is_module_source(f)},
+                'dirs': dirs,
+                'mtimes': directory_mtimes(dirs)
+            }
+            self.modules[path] = entry
+            self.dirty = True
+        return entry
+
+    def is_legacy(self, path):
+        ''' Test whether the module at the given path is a legacy module, that is, whether a file named ``__legacy__`` appears anywhere under it. '''
+        return self.module(path)['legacy']
+
+    def source_digests(self, path):
+        '''
+        Get a digest of each source file in the module at the given path.
+        Files are only read again if their modification time or size has changed.
+
+        :param path: the module directory
+        :returns: a dictionary of file names to SHA-256 digests
+        '''
+        sources = self.module(path)['sources']
+        result = {}
+        for fname, recorded in sources.items():
+            stat = os.stat(fname)
+            if recorded is None or recorded[:2] != [stat.st_mtime_ns, stat.st_size]:
+                recorded = [stat.st_mtime_ns, stat.st_size, file_digest(fname)]
+                sources[fname] = recorded
+                self.dirty = True
+            result[fname] = recorded[2]
+        return result
+
+    def refresh(self, paths):
+        '''
+        Bring the entries for every module in the given search paths up to date. Unchanged directories are not read again,
+        and source files are not read at all. Calling this before creating worker processes lets the workers share the work.
+
+        :param paths: the search paths
+        '''
+        for path in paths:
+            if os.path.isdir(path):
+                for name, is_dir in self.listing(path).items():
+                    if is_dir:
+                        self.module(os.path.join(path, name))
+
+    def load(self, fname):
+        '''
+        Add the entries in a saved manifest to the index. Entries are validated as they are used, so stale entries are harmless.
+        A missing or unreadable manifest is ignored.
+
+        :param fname: the file to load
+        '''
+        try:
+            with open(fname, 'rt') as rfp:
+                data = json.load(rfp)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.manifest_version:
+            self.listings.update(data.get('listings', {}))
+            self.modules.update(data.get('modules', {}))
+
+    def save(self, fname):
+        '''
+        Save the index to a manifest file, if it has changed. The file is replaced atomically.
+
+        :param fname: the file to write
+        '''
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(fname)), exist_ok=True)
+        with tempfile.NamedTemporaryFile('wt', dir=os.path.dirname(os.path.abspath(fname)), delete=False) as wfp:
+            json.dump({'version': self.manifest_version, 'listings': self.listings, 'modules': self.modules}, wfp)
+        os.replace(wfp.name, fname)
+        self.dirty = False
+
+    def clear(self):
+        ''' Forget all indexed directories. '''
+        self.listings.clear()
+        self.modules.clear()
+        self.dirty = True
+
+process_index = ModuleIndex()
+
 class ModuleSearchContext:
-    def __init__(self, paths, verbose=False):
+    '''
+    A sequence of directories in which to look for modules of one type.
+
+    Directory contents are read through a :class:`ModuleIndex`, which is shared between contexts,
+    so that a run which parses many configurations reads each module directory only once.
+
+    :param paths: the directories to search, in order of priority. Paths that do not exist are ignored.
+    :param verbose: print extra verbose output
+    :param index: the index to read directories through. By default, the index shared by the whole process is used.
+    '''
+    def __init__(self, paths, verbose=False, index=None):
         self.paths = [p for p in paths if os.path.exists(p) and os.path.isdir(p)]
         self.verbose = verbose
+        self.index = index or process_index
 
     def data_from_path(self, path):
         name = get_module_name(path)
-        is_legacy = ('__legacy__' in [*itertools.chain(*(f for _,_,f in os.walk(path)))])
+        is_legacy = self.index.is_legacy(path)
         retval = {
             'name': name,
             'path': path,
@@ -39,8 +217,18 @@ class ModuleSearchContext:
             print('M:', retval)
         return retval
 
+    def find_in_index(self, module):
+        ''' Find a module given by a plain name in the search paths, using the index. '''
+        return next((os.path.join(dirname, module) for dirname in self.paths if module in self.index.listing(dirname)), None)
+
     # Try the context's module directories, then try to interpret as a path
     def find(self, module):
+        # A plain name can be answered by the index
+        if module and not any(c in module for c in (os.sep, '$', '~')) and module not in (os.curdir, os.pardir):
+            path = self.find_in_index(module)
+            if path is not None:
+                return self.data_from_path(os.path.relpath(path))
+
         # Return a normalized directory: variables and user shorthands are expanded
         paths = itertools.chain(
             (os.path.join(dirname, module) for dirname in self.paths), # Prepend search paths
@@ -55,6 +243,5 @@ class ModuleSearchContext:
         return self.data_from_path(path)
 
     def find_all(self):
-        base_dirs = [next(os.walk(p)) for p in self.paths]
-        files = itertools.starmap(os.path.join, itertools.chain(*(zip(itertools.repeat(b), d) for b,d,_ in base_dirs)))
+        files = [os.path.join(p, name) for p in self.paths for name, is_dir in self.index.listing(p).items() if is_dir]
         return [self.data_from_path(f) for f in files]
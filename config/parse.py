@@ -12,15 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import itertools
 import functools
 import operator
 import os
 import math
+import multiprocessing
 from collections import deque
 
 from . import defaults
 from . import modules
+from . import timing
 from . import util
 
 cache_deprecation_keys = {
@@ -45,10 +48,14 @@ pmem_deprecation_warnings = {
 }
 
 def executable_name(*config_list):
-    ''' Produce the executable name from a list of configurations '''
+    '''
+    Produce the executable name from a list of configurations.
+    The labels of any sweep points among the configurations are appended, whichever configuration gives the name.
+    '''
     name_parts = filter(None, ('champsim', *(c.get('name') for c in config_list)))
     name_specifications = reversed(list(filter(None, (c.get('executable_name') for c in config_list))))
-    return next(name_specifications, '_'.join(name_parts))
+    labels = filter(None, (c.get('sweep_label') for c in config_list))
+    return '_'.join((next(name_specifications, '_'.join(name_parts)), *labels))
 
 def duplicate_to_length(elements, count):
     '''
@@ -146,7 +153,8 @@ def default_frequencies(cores, caches):
         freq_top = ({ 'frequency': cpu['frequency'] },)
 
         # put the cpu frequency as the default for the highest level (this does not override a provided value)
-        path = itertools.starmap(util.chain, itertools.zip_longest(base_path, freq_top, fillvalue={}))
+        # The elements are only read from, so they are not merged eagerly
+        path = itertools.starmap(util.LayeredMapping, itertools.zip_longest(base_path, freq_top, fillvalue={}))
 
         # prune out everything but the name and frequency (if present)
         return (util.subdict(element, ('name', 'frequency')) for element in path)
@@ -450,6 +458,26 @@ class NormalizedConfiguration:
 
         return elements, module_info, config_extern
 
+def module_search_paths(module_dir=None, branch_dir=None, btb_dir=None, pref_dir=None, repl_dir=None):
+    '''
+    Get the list of directories to search for each type of module.
+    The parameters have the same meaning as those of :func:`parse_config`.
+    The ChampSim root is always searched last.
+    '''
+    def list_dirs(dirname, var):
+        return [
+            *(os.path.join(m,dirname) for m in (module_dir or [])),
+            *(var or []),
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), dirname) # champsim root
+        ]
+
+    return {
+        'branch': list_dirs('branch', branch_dir),
+        'btb': list_dirs('btb', btb_dir),
+        'replacement': list_dirs('replacement', repl_dir),
+        'prefetcher': list_dirs('prefetcher', pref_dir)
+    }
+
 def parse_config(*configs, module_dir=None, branch_dir=None, btb_dir=None, pref_dir=None, repl_dir=None, compile_all_modules=False, verbose=False): # pylint: disable=line-too-long,
     '''
     This is the main parsing dispatch function. Programmatic use of the configuration system should use this as an entry point.
@@ -463,37 +491,81 @@ def parse_config(*configs, module_dir=None, branch_dir=None, btb_dir=None, pref_
     :param compile_all_modules: If true, all modules in the given directories will be compiled. If false, only the module in the configuration will be compiled.
     :param verbose: Print extra verbose output
     '''
-    def list_dirs(dirname, var):
-        return [
-            *(os.path.join(m,dirname) for m in (module_dir or [])),
-            *var,
-            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), dirname) # champsim root
-        ]
-
     def do_merge(lhs, rhs):
         lhs.merge(rhs)
         return lhs
     merged_config = functools.reduce(do_merge, (NormalizedConfiguration(c, verbose=verbose) for c in configs))
 
-    contexts = dict(
-        branch_context = modules.ModuleSearchContext(list_dirs('branch', branch_dir or []), verbose=verbose),
-        btb_context = modules.ModuleSearchContext(list_dirs('btb', btb_dir or []), verbose=verbose),
-        replacement_context = modules.ModuleSearchContext(list_dirs('replacement', repl_dir or []), verbose=verbose),
-        prefetcher_context = modules.ModuleSearchContext(list_dirs('prefetcher', pref_dir or []), verbose=verbose)
-    )
+    search_paths = module_search_paths(module_dir=module_dir, branch_dir=branch_dir, btb_dir=btb_dir, pref_dir=pref_dir, repl_dir=repl_dir)
+    contexts = {f'{k}_context': modules.ModuleSearchContext(v, verbose=verbose) for k,v in search_paths.items()}
     if verbose:
         for k,v in contexts.items():
             print(k, v.paths)
     elements, module_info, config_file = merged_config.apply_defaults_in(**contexts, verbose=verbose)
 
     if compile_all_modules:
-        modules_to_compile = [*set(itertools.chain(*(d.keys() for d in module_info.values())))]
+        modules_to_compile = sorted(set(itertools.chain(*(d.keys() for d in module_info.values()))))
     else:
-        modules_to_compile = [*set(d['name'] for d in itertools.chain(
+        modules_to_compile = sorted(set(d['name'] for d in itertools.chain(
             *(c['_replacement_data'] for c in elements['caches']),
             *(c['_prefetcher_data'] for c in elements['caches']),
             *(c['_branch_predictor_data'] for c in elements['cores']),
             *(c['_btb_data'] for c in elements['cores'])
-        ))]
+        )))
 
     return executable_name(*configs), elements, modules_to_compile, module_info, config_file
+
+def parse_config_star(configs, **kwargs):
+    ''' Call :func:`parse_config` with the configurations given as a single sequence, for use with process pools. '''
+    return parse_config(*configs, **kwargs)
+
+def parse_configs(config_list, jobs=1, chunksize=8, cache=None, profiler=None, **kwargs):
+    '''
+    Parse a sequence of configurations, yielding the results in the same order.
+
+    If more than one job is requested, the configurations are parsed on a pool of worker processes.
+    The results are streamed back as they complete, but are always yielded in the order of the input sequence.
+
+    :param config_list: An iterable of sequences of configurations. Each member is passed as the positional parameters to :func:`parse_config`.
+    :param jobs: The number of processes to use. If 0 or None, use the number of available processors.
+    :param chunksize: The number of configurations to send to a worker at once.
+    :param cache: An instance of :class:`config.configcache.ConfigureCache`. Configurations found in the cache are not parsed again.
+    :param profiler: An active instance of :class:`config.timing.Profiler`. The parsing time of each configuration is attributed to its executable.
+    :param kwargs: Keyword arguments passed through to :func:`parse_config`.
+    '''
+    if not jobs:
+        jobs = os.cpu_count() or 1
+
+    worker = functools.partial(parse_config_star, **kwargs)
+    if profiler is not None:
+        worker = functools.partial(timing.collect, worker)
+
+    with multiprocessing.Pool(jobs) if jobs > 1 else contextlib.nullcontext() as pool:
+        def attribute_timings(results):
+            for result, stats in results:
+                profiler.add_build(result[0], stats)
+                yield result
+
+        def do_parse(iterable):
+            results = map(worker, iterable) if pool is None else pool.imap(worker, iterable, chunksize=chunksize)
+            if profiler is not None:
+                results = attribute_timings(results)
+            return results
+
+        if cache is None:
+            yield from do_parse(config_list)
+            return
+
+        # Look up each batch of configurations first, so that only the misses are sent to the workers.
+        # An entry that cannot be loaded is a miss.
+        key_args = util.subdict(kwargs, ('verbose',), invert=True)
+        for config_batch in util.batch(config_list, max(256, 4*jobs*chunksize)):
+            keyed = [(k, c, cache.get(k)) for k,c in ((cache.key('parse', c, key_args), c) for c in config_batch)]
+            parsed = do_parse(c for _,c,hit in keyed if hit is None)
+            for key, _, hit in keyed:
+                if hit is not None:
+                    yield hit
+                else:
+                    result = next(parsed)
+                    cache.put(key, result)
+                    yield result
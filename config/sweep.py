@@ -0,0 +1,316 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Utilities for describing and selecting members of a design space without expanding it.
+
+A design space is a sequence of dimensions, each of which is a sequence of configurations.
+The members of the space are the members of ``itertools.product(*dimensions)``, in that order.
+Dimensions need only support ``len()`` and indexing, so they may be computed lazily.
+'''
+
+import bisect
+import collections.abc
+import functools
+import itertools
+import math
+import operator
+import random
+import re
+
+from . import util
+from .parse import int_or_prefixed_size
+
+def product_size(dimensions):
+    ''' The number of members in the product of the given dimensions. '''
+    return math.prod(len(d) for d in dimensions)
+
+def product_at(dimensions, index):
+    '''
+    Get the member of ``itertools.product(*dimensions)`` at the given index, without expanding the product.
+
+    >>> product_at([['a','b'], [1,2,3]], 4)
+    ('b', 2)
+
+    :param dimensions: a sequence of sequences
+    :param index: the position in the product
+    '''
+    result = []
+    for dim in reversed(dimensions):
+        index, i = divmod(index, len(dim))
+        result.append(dim[i])
+    return tuple(reversed(result))
+
+def index_of(dimensions, coordinates):
+    ''' The inverse of :func:`product_at`, operating on positions within each dimension. '''
+    index = 0
+    for dim, i in zip(dimensions, coordinates):
+        index = index * len(dim) + i
+    return index
+
+def is_sweep(value):
+    ''' Test whether the value is a sweep descriptor, a JSON object with the single key "sweep" or "range". '''
+    return isinstance(value, dict) and len(value) == 1 and next(iter(value)) in ('sweep', 'range')
+
+def sweep_values(descriptor):
+    '''
+    Get the sequence of values described by a sweep descriptor.
+
+    A descriptor of the form ``{"sweep": [...]}`` takes each of the listed values.
+    A descriptor of the form ``{"range": [start, stop, step]}`` or ``{"range": {"start": ..., "stop": ..., "step": ...}}``
+    takes the values of Python's ``range()``, so the stop value is excluded.
+    If the range is given as an object, it may instead have a ``"factor"`` key, in which case each value is the previous value
+    multiplied by the factor.
+
+    >>> sweep_values({'sweep': [1, 'a']})
+    [1, 'a']
+    >>> list(sweep_values({'range': [0, 10, 4]}))
+    [0, 4, 8]
+    >>> sweep_values({'range': {'start': 64, 'stop': 1024, 'factor': 2}})
+    [64, 128, 256, 512]
+
+    :param descriptor: the sweep descriptor
+    '''
+    if 'sweep' in descriptor:
+        return list(descriptor['sweep'])
+
+    spec = descriptor['range']
+    if not isinstance(spec, dict):
+        return range(*spec)
+
+    if 'factor' in spec:
+        if spec['factor'] <= 1 or spec['start'] <= 0:
+            raise ValueError(f'A geometric range must have a positive start and a factor greater than 1: {spec}')
+        return list(itertools.takewhile(lambda x: x < spec['stop'], itertools.accumulate(itertools.repeat(spec['factor']), operator.mul, initial=spec['start'])))
+    return range(spec.get('start', 0), spec['stop'], spec.get('step', 1))
+
+def find_sweeps(value, path=tuple()):
+    '''
+    Yield the path to, and the value of, each sweep descriptor in an unparsed configuration.
+    Paths are tuples of dictionary keys and list indices.
+
+    :param value: the configuration to search
+    :param path: the path to the given value
+    '''
+    if is_sweep(value):
+        yield path, value
+    elif isinstance(value, dict):
+        for k,v in value.items():
+            yield from find_sweeps(v, (*path, k))
+    elif isinstance(value, list):
+        for i,v in enumerate(value):
+            yield from find_sweeps(v, (*path, i))
+
+def substitute(value, path, replacement):
+    '''
+    Replace the member of a nested configuration at the given path.
+    Only the containers along the path are copied, the rest are shared with the original.
+
+    :param value: the configuration
+    :param path: a tuple of dictionary keys and list indices
+    :param replacement: the new value
+    '''
+    if not path:
+        return replacement
+    head, *tail = path
+    if isinstance(value, list):
+        return [*value[:head], substitute(value[head], tail, replacement), *value[head+1:]]
+    return {**value, head: substitute(value[head], tail, replacement)}
+
+def sweep_label(path, value):
+    ''' Produce a string that identifies a point in a sweep, suitable for use in an executable name. '''
+    key = next((p for p in reversed(path) if isinstance(p, str)), 'sweep')
+    return re.sub(r'[^A-Za-z0-9.]', '', f'{key}{value}')
+
+class SweepSpace(collections.abc.Sequence):
+    '''
+    The sequence of concrete configurations described by an unparsed configuration that contains sweep descriptors.
+
+    Sweep descriptors may appear anywhere a value is expected.
+    The space is the product of all of the descriptors in the configuration, and members are computed only when indexed.
+    A configuration with no descriptors describes a space with exactly one member, the configuration itself.
+
+    Each member is labelled with the point it represents, under the key ``sweep_label``. The label is appended to the executable name
+    after configurations are joined (see :func:`config.parse.executable_name`), so that each point produces a distinct executable
+    even when another configuration in the join supplies the name.
+
+    :param config: the unparsed configuration
+    '''
+    def __init__(self, config):
+        self.config = config
+        found = list(find_sweeps(config))
+        self.paths = [p for p,_ in found]
+        self.values = [sweep_values(d) for _,d in found]
+
+    def __len__(self):
+        return product_size(self.values)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('SweepSpace index out of range')
+
+        if not self.paths:
+            return self.config
+
+        point = product_at(self.values, index)
+        result = functools.reduce(lambda c, pv: substitute(c, *pv), zip(self.paths, point), self.config)
+
+        label = '_'.join(itertools.starmap(sweep_label, zip(self.paths, point)))
+        return {**result, 'sweep_label': label}
+
+class Concatenation(collections.abc.Sequence):
+    '''
+    A lazy concatenation of sequences, which supports ``len()`` and indexing without copying its members.
+
+    :param sequences: the sequences to concatenate
+    '''
+    def __init__(self, sequences):
+        self.sequences = list(sequences)
+        self.offsets = list(itertools.accumulate(map(len, self.sequences)))
+
+    def __len__(self):
+        return self.offsets[-1] if self.offsets else 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Concatenation index out of range')
+        seq = bisect.bisect_right(self.offsets, index)
+        return self.sequences[seq][index - (self.offsets[seq-1] if seq > 0 else 0)]
+
+def expand(configs):
+    '''
+    Expand the sweep descriptors in a sequence of unparsed configurations.
+    The result is a lazy sequence of concrete configurations.
+
+    :param configs: a sequence of unparsed configurations, such as the contents of a JSON file
+    '''
+    return Concatenation(map(SweepSpace, configs))
+
+def random_indices(dimensions, rng):
+    '''
+    Yield distinct indices into the product of the dimensions, in a random order, until the space is exhausted.
+
+    :param dimensions: a sequence of sequences
+    :param rng: an instance of random.Random
+    '''
+    total = product_size(dimensions)
+    seen = set()
+    while len(seen) < total:
+        index = rng.randrange(total)
+        if index not in seen:
+            seen.add(index)
+            yield index
+
+def latin_hypercube_indices(dimensions, count, rng):
+    '''
+    Yield indices into the product of the dimensions according to a Latin hypercube design.
+    Each dimension is divided into ``count`` strata, and each stratum is sampled exactly once.
+    If a dimension is shorter than ``count``, its members are repeated as evenly as possible.
+    Duplicate indices are only yielded once.
+
+    :param dimensions: a sequence of sequences
+    :param count: the number of samples to draw
+    :param rng: an instance of random.Random
+    '''
+    permutations = [rng.sample(range(count), count) for _ in dimensions]
+    coordinates = ([int((perm[i] + rng.random()) * len(dim) / count) for dim, perm in zip(dimensions, permutations)] for i in range(count))
+    yield from dict.fromkeys(index_of(dimensions, c) for c in coordinates)
+
+def stratified_indices(dimensions, count, rng):
+    '''
+    Yield indices into the product of the dimensions, stratified by the first dimension.
+    The samples are divided as evenly as possible between the members of the first dimension, with any remainder given to strata
+    chosen at random, and the remaining dimensions are sampled randomly within each stratum.
+
+    :param dimensions: a sequence of sequences
+    :param count: the number of samples to draw
+    :param rng: an instance of random.Random
+    '''
+    head, *tail = dimensions
+    stratum_size = product_size(tail)
+    extra = set(rng.sample(range(len(head)), count % len(head)))
+    for stratum in range(len(head)):
+        stratum_count = count // len(head) + (1 if stratum in extra else 0)
+        yield from (stratum * stratum_size + i for i in itertools.islice(random_indices(tail, rng), stratum_count))
+
+sample_strategies = {
+    'random': lambda dimensions, count, rng: random_indices(dimensions, rng),
+    'latin-hypercube': latin_hypercube_indices,
+    'stratified': stratified_indices
+}
+
+def expression_predicate(expression):
+    '''
+    Compile a Python expression into a predicate over a merged, unparsed configuration.
+
+    The expression is evaluated with the name ``config`` bound to the configuration, and ``size`` bound to
+    :func:`config.parse.int_or_prefixed_size`.
+
+    >>> pred = expression_predicate('size(config["L2C"]["size"]) > size(config["L1D"]["size"])')
+    >>> pred({'L1D': {'size': '48kB'}, 'L2C': {'size': '512kB'}})
+    True
+
+    :param expression: the expression to evaluate
+    '''
+    code = compile(expression, '<constraint>', 'eval')
+    def predicate(config):
+        return bool(eval(code, {'size': int_or_prefixed_size}, {'config': config})) # pylint: disable=eval-used
+    return predicate
+
+def satisfies_all(predicates, combination):
+    ''' Test whether the merged combination of configurations satisfies each of the predicates. '''
+    merged = util.chain(*combination)
+    return all(p(merged) for p in predicates)
+
+def select(dimensions, count=None, strategy='random', seed=0, predicates=tuple()):
+    '''
+    Select members of the product of the given dimensions.
+    The members are yielded in the same relative order as ``itertools.product(*dimensions)``.
+
+    Predicates are applied to the unparsed configurations, merged with :func:`config.util.chain`, so that
+    invalid combinations are never parsed.
+    For the "random" strategy, combinations that fail a predicate are replaced by further samples.
+    For the other strategies, the design is drawn first and failing combinations are removed, so fewer than
+    ``count`` combinations may be yielded.
+
+    :param dimensions: a sequence of sequences of configurations
+    :param count: the number of combinations to select. If None, all combinations satisfying the predicates are selected.
+    :param strategy: one of the keys of ``sample_strategies``
+    :param seed: the seed for the random number generator. The same seed always produces the same selection.
+    :param predicates: a sequence of functions accepting a merged configuration and returning a boolean
+    '''
+    dimensions = [d if isinstance(d, collections.abc.Sequence) else list(d) for d in dimensions]
+    predicates = list(predicates)
+
+    if count is None:
+        selected = (product_at(dimensions, i) for i in range(product_size(dimensions)))
+        if predicates:
+            selected = (c for c in selected if satisfies_all(predicates, c))
+        yield from selected
+        return
+
+    rng = random.Random(seed)
+    indices = sample_strategies[strategy](dimensions, min(count, product_size(dimensions)), rng)
+    if not predicates:
+        yield from (product_at(dimensions, i) for i in sorted(itertools.islice(indices, count)))
+    elif strategy == 'random':
+        indices = itertools.islice((i for i in indices if satisfies_all(predicates, product_at(dimensions, i))), count)
+        yield from (product_at(dimensions, i) for i in sorted(indices))
+    else:
+        selected = (product_at(dimensions, i) for i in sorted(indices))
+        yield from (c for c in selected if satisfies_all(predicates, c))
@@ -0,0 +1,182 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Wall-time and call-count profiling for the stages of the configuration pipeline.
+
+While a :class:`Profiler` is active, the functions listed by :func:`pipeline_stages` are wrapped so that each call is timed.
+Times are inclusive: a stage that calls another stage includes the time spent in it.
+When no profiler is active, the pipeline is not modified and has no overhead.
+'''
+
+import functools
+import inspect
+import json
+import threading
+import time
+
+from . import filewrite
+from . import instantiation_file
+from . import modules
+from . import parse
+
+def pipeline_stages():
+    ''' The functions that are timed, as tuples of (owner, attribute, stage name). '''
+    return (
+        (parse, 'parse_config', 'parse_config'),
+        (parse.NormalizedConfiguration, '__init__', 'NormalizedConfiguration.__init__'),
+        (parse.NormalizedConfiguration, 'merge', 'NormalizedConfiguration.merge'),
+        (parse.NormalizedConfiguration, 'apply_defaults_in', 'NormalizedConfiguration.apply_defaults_in'),
+        (modules.ModuleSearchContext, 'find', 'ModuleSearchContext.find'),
+        (modules.ModuleSearchContext, 'find_all', 'ModuleSearchContext.find_all'),
+        (filewrite.Fragment, 'from_config', 'Fragment.from_config'),
+        (filewrite, 'get_instantiation_lines', 'get_instantiation_lines'),
+        (filewrite, 'get_instantiation_header', 'get_instantiation_header'),
+        (filewrite, 'get_makefile_lines', 'get_makefile_lines'),
+        (instantiation_file, 'module_include_files', 'module_include_files'),
+        (filewrite, 'write_if_different', 'write_if_different'),
+        (filewrite.StreamedOutput, 'append', 'StreamedOutput.append'),
+        (filewrite.StreamedOutput, 'commit', 'StreamedOutput.commit'),
+        (filewrite, 'replace_if_different', 'replace_if_different')
+    )
+
+_active = None
+
+class Record:
+    ''' Accumulated call counts and wall times, by stage. Calls may be added from multiple threads. '''
+    def __init__(self, data=None):
+        self.data = dict(data or {})
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds, calls=1):
+        ''' Add a timed call to the given stage. '''
+        with self.lock:
+            entry = self.data.setdefault(stage, {'calls': 0, 'seconds': 0.0})
+            entry['calls'] += calls
+            entry['seconds'] += seconds
+
+    def merge(self, other):
+        ''' Add all of the entries of another Record to this one. '''
+        for stage, entry in other.data.items():
+            self.add(stage, entry['seconds'], calls=entry['calls'])
+
+def _timed(stage, func):
+    ''' Wrap a function so that its calls are recorded in the active record, if any. '''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        record = _active
+        if record is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record.add(stage, time.perf_counter() - start)
+    return wrapper
+
+def _timed_generator(stage, func):
+    ''' Wrap a generator function so that the time spent producing its values is recorded as one call. '''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        record = _active
+        if record is None:
+            yield from func(*args, **kwargs)
+            return
+        elapsed = 0.0
+        it = func(*args, **kwargs)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    value = next(it)
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield value
+        except StopIteration:
+            pass
+        finally:
+            record.add(stage, elapsed)
+    return wrapper
+
+def collect(func, *args, **kwargs):
+    '''
+    Call the function and collect the stage timings for that call alone.
+    The timings are not added to the active profiler; pass them to :meth:`Profiler.add_build`.
+    This is suitable for use in a worker process, as long as the worker was forked while a :class:`Profiler` was active.
+
+    :returns: a tuple of the function's return value and a dictionary of stage timings
+    '''
+    global _active # pylint: disable=global-statement
+    previous, _active = _active, Record()
+    try:
+        return func(*args, **kwargs), _active.data
+    finally:
+        _active = previous
+
+class Profiler:
+    '''
+    A context manager that instruments the configuration pipeline for its duration.
+
+    Timings are collected for the run as a whole, and may be attributed to individual builds with :meth:`add_build`.
+    '''
+    def __init__(self):
+        self.record = Record()
+        self.builds = {}
+        self.originals = []
+        self.start = None
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        global _active # pylint: disable=global-statement
+        for owner, attr, stage in pipeline_stages():
+            original = inspect.getattr_static(owner, attr)
+            func = original.__func__ if isinstance(original, staticmethod) else original
+            wrapped = (_timed_generator if inspect.isgeneratorfunction(func) else _timed)(stage, func)
+            setattr(owner, attr, staticmethod(wrapped) if isinstance(original, staticmethod) else wrapped)
+            self.originals.append((owner, attr, original))
+        _active = self.record
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active # pylint: disable=global-statement
+        self.elapsed += time.perf_counter() - self.start
+        _active = None
+        for owner, attr, original in reversed(self.originals):
+            setattr(owner, attr, original)
+        self.originals = []
+
+    def add_build(self, name, data):
+        '''
+        Attribute stage timings to a build, and add them to the timings for the run.
+        Timings for a build given more than once are accumulated.
+
+        :param name: the name of the build, usually its executable name
+        :param data: a dictionary of stage timings, as returned by :func:`collect`
+        '''
+        self.builds.setdefault(name, Record()).merge(Record(data))
+        self.record.merge(Record(data))
+
+    def summary(self):
+        ''' Produce a dictionary describing the collected timings, suitable for conversion to JSON. '''
+        return {
+            'seconds': self.elapsed,
+            'stages': self.record.data,
+            'builds': [{'name': k, 'stages': v.data} for k,v in self.builds.items()]
+        }
+
+    def write(self, fname):
+        ''' Write the summary to a JSON file. '''
+        with open(fname, 'wt') as wfp:
+            json.dump(self.summary(), wfp, indent=2)
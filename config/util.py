@@ -16,6 +16,7 @@ import itertools
 import functools
 import operator
 import collections
+import collections.abc
 import os
 
 def iter_system(system, name, key='lower_level'):
@@ -30,9 +31,10 @@ def iter_system(system, name, key='lower_level'):
     :param name: the key to start at
     :param key: the key that points to the next element
     '''
-    hoisted = {**system}
-    while name in hoisted:
-        val = hoisted.pop(name)
+    visited = set()
+    while name in system and name not in visited:
+        visited.add(name)
+        val = system[name]
         yield val
         name = val.get(key)
 
@@ -48,6 +50,70 @@ def collect(iterable, key_func, join_func):
     intern_iterable = itertools.groupby(intern_iterable, key=key_func)
     return (join_func(it[1]) for it in intern_iterable)
 
+class LayeredMapping(collections.abc.Mapping):
+    '''
+    A read-only view of the combination of several dictionaries, with the same semantics as :func:`chain`.
+
+    Values are only merged when they are accessed, and each merged value is cached.
+    Values that are dictionaries in more than one layer are presented as a LayeredMapping of those dictionaries,
+    so nested merges are also deferred. The layers must not be modified while the view is in use.
+
+    >>> m = LayeredMapping({ 'a': 1, 'l': [1] }, { 'a': 2, 'b': 2, 'l': [2] })
+    >>> m['a'], m['b'], m['l']
+    (1, 2, [1, 2])
+
+    :param layers: the dictionaries to combine. Dictionaries given earlier have priority.
+    '''
+    missing = object()
+    missing_key = object()
+
+    def __init__(self, *layers):
+        self.layers = tuple(filter(None, layers))
+        self.merged = {}
+        self.key_order = None
+
+    def __getitem__(self, key):
+        result = self.merged.get(key, self.missing)
+        if result is not self.missing:
+            if result is self.missing_key:
+                raise KeyError(key)
+            return result
+
+        values = [layer[key] for layer in self.layers if key in layer]
+        if not values:
+            self.merged[key] = self.missing_key
+            raise KeyError(key)
+
+        result = values[0]
+        if isinstance(result, collections.abc.Mapping):
+            mappings = [v for v in values if isinstance(v, collections.abc.Mapping)]
+            result = LayeredMapping(*mappings) if len(mappings) > 1 else result
+        elif isinstance(result, list):
+            result = list(itertools.chain.from_iterable(v for v in values if isinstance(v, list)))
+
+        self.merged[key] = result
+        return result
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        # Later layers place their keys first, as they would under chain()
+        if self.key_order is None:
+            self.key_order = list(dict.fromkeys(itertools.chain.from_iterable(reversed(self.layers))))
+        return iter(self.key_order)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def to_dict(self):
+        ''' Merge all of the keys into a dictionary, converting any nested LayeredMappings as well. '''
+        return {k: (v.to_dict() if isinstance(v, LayeredMapping) else v) for k,v in self.items()}
+
 def chain(*dicts):
     '''
     Combine two or more dictionaries.
@@ -65,15 +131,17 @@ def chain(*dicts):
 
     :param dicts: the sequence to be chained
     '''
-    def merge(merger, tname, lhs, rhs):
-        return {k:merger(v, rhs[k]) for k,v in lhs.items() if isinstance(v, tname) and isinstance(rhs.get(k), tname)}
-
-    def merge_dicts(lhs,rhs):
-        dict_merges = merge(merge_dicts, dict, lhs, rhs)
-        list_merges = merge(operator.concat, list, lhs, rhs)
-        return dict(itertools.chain(rhs.items(), lhs.items(), dict_merges.items(), list_merges.items()))
+    return LayeredMapping(*dicts).to_dict()
 
-    return functools.reduce(merge_dicts, dicts, {})
+def try_int(val):
+    '''
+    Attempt to convert the value to a Python standard int.
+    For use with json.dump().
+    '''
+    try:
+        return int(val)
+    except Exception as exc:
+        raise TypeError from exc
 
 def star(func):
     ''' Convert a function object that takes a starred parameter into one that takes an iterable parameter. '''
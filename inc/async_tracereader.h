@@ -0,0 +1,242 @@
+/*
+ *    Copyright 2023 The ChampSim Contributors
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef ASYNC_TRACEREADER_H
+#define ASYNC_TRACEREADER_H
+
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <exception>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <stdexcept>
+#include <thread>
+#include <vector>
+
+#include "instruction.h"
+
+namespace champsim
+{
+/**
+ * A fixed-capacity FIFO queue that one producer thread and one consumer thread may use concurrently without locking.
+ */
+template <typename T>
+class spsc_ring
+{
+  std::vector<std::optional<T>> slots_;
+
+  // The indices increase without bound and are reduced modulo the capacity when used.
+  // Each is written by only one of the threads, and they are kept on separate cache lines so the threads do not contend.
+  // Each thread also keeps its last observation of the other thread's index, and only reloads it when the buffer appears full or empty.
+  alignas(64) std::atomic<std::size_t> head_{0}; // The next slot to pop, written by the consumer
+  std::size_t cached_tail_ = 0;                  // Used only by the consumer
+  alignas(64) std::atomic<std::size_t> tail_{0}; // The next slot to push, written by the producer
+  std::size_t cached_head_ = 0;                  // Used only by the producer
+
+public:
+  explicit spsc_ring(std::size_t capacity) : slots_(capacity) {}
+
+  /**
+   * Push a value, if there is room for it. The value is only moved from if the push succeeds.
+   * This may only be called from the producer thread.
+   */
+  bool try_push(T&& value)
+  {
+    auto tail = tail_.load(std::memory_order_relaxed);
+    if (tail - cached_head_ == std::size(slots_)) {
+      cached_head_ = head_.load(std::memory_order_acquire);
+      if (tail - cached_head_ == std::size(slots_)) {
+        return false;
+      }
+    }
+    slots_[tail % std::size(slots_)] = std::move(value);
+    tail_.store(tail + 1, std::memory_order_release);
+    return true;
+  }
+
+  /**
+   * Pop the oldest value, if there is one.
+   * This may only be called from the consumer thread.
+   */
+  std::optional<T> try_pop()
+  {
+    auto head = head_.load(std::memory_order_relaxed);
+    if (head == cached_tail_) {
+      cached_tail_ = tail_.load(std::memory_order_acquire);
+      if (head == cached_tail_) {
+        return std::nullopt;
+      }
+    }
+    auto& slot = slots_[head % std::size(slots_)];
+    std::optional<T> retval{std::move(slot)};
+    slot.reset();
+    head_.store(head + 1, std::memory_order_release);
+    return retval;
+  }
+
+  [[nodiscard]] bool empty() const { return head_.load(std::memory_order_acquire) == tail_.load(std::memory_order_acquire); }
+  [[nodiscard]] std::size_t capacity() const { return std::size(slots_); }
+};
+
+/**
+ * A trace reader that runs another reader on a dedicated thread.
+ *
+ * The wrapped reader decompresses and decodes instructions ahead of the simulation, into a ring buffer, and the simulation only pops
+ * instructions that are ready. Instructions are produced in the same order as by the wrapped reader, so the simulation is unchanged.
+ * If the wrapped reader throws, the exception is rethrown to the simulation when it reaches that point in the trace.
+ */
+template <typename T>
+class async_tracereader
+{
+  struct shared_state {
+    T intern_;
+    spsc_ring<ooo_model_instr> buffer_;
+    std::exception_ptr error_;
+    std::atomic<bool> done_{false};
+    std::atomic<bool> stop_{false};
+
+    // The simulation blocks on this when the buffer stays empty, so that it does not take processor time from the producer
+    std::mutex mutex_;
+    std::condition_variable ready_;
+    std::atomic<bool> waiting_{false};
+
+    // Wake the simulation, if it is blocked. The fence orders the preceding push or completion before the check of waiting_.
+    void notify()
+    {
+      std::atomic_thread_fence(std::memory_order_seq_cst);
+      if (waiting_.load(std::memory_order_relaxed)) {
+        std::lock_guard lock{mutex_};
+        ready_.notify_one();
+      }
+    }
+
+    shared_state(T&& intern, std::size_t capacity) : intern_(std::move(intern)), buffer_(capacity) {}
+  };
+
+  std::unique_ptr<shared_state> state_;
+  std::thread worker_;
+  mutable std::optional<ooo_model_instr> next_; // An instruction popped by eof(), but not yet returned
+
+  static void produce(shared_state* state)
+  {
+    // When the buffer is full, the simulation is behind. Sleep rather than spin, since it will take some time to catch up.
+    constexpr std::chrono::microseconds full_backoff{100};
+    try {
+      while (!state->stop_.load(std::memory_order_relaxed) && !state->intern_.eof()) {
+        auto instr = state->intern_();
+        while (!state->buffer_.try_push(std::move(instr))) {
+          if (state->stop_.load(std::memory_order_relaxed)) {
+            break;
+          }
+          std::this_thread::sleep_for(full_backoff);
+        }
+        state->notify();
+      }
+    } catch (...) {
+      state->error_ = std::current_exception();
+    }
+    state->done_.store(true, std::memory_order_release);
+    state->notify();
+  }
+
+  // Block until the buffer is not empty or the wrapped reader has finished
+  void wait_for_producer() const
+  {
+    std::unique_lock lock{state_->mutex_};
+    state_->waiting_.store(true, std::memory_order_relaxed);
+    std::atomic_thread_fence(std::memory_order_seq_cst);
+    state_->ready_.wait(lock, [state = state_.get()] { return !state->buffer_.empty() || state->done_.load(std::memory_order_acquire); });
+    state_->waiting_.store(false, std::memory_order_relaxed);
+  }
+
+  // Pop the next instruction into next_, waiting for the wrapped reader if necessary. Returns false if the trace has ended.
+  bool fill_next() const
+  {
+    // The producer is usually only briefly behind, so spin for a short time before blocking
+    constexpr int spin_limit = 64;
+    for (int spins = 0; !next_.has_value(); ++spins) {
+      next_ = state_->buffer_.try_pop();
+      if (!next_.has_value() && state_->done_.load(std::memory_order_acquire)) {
+        next_ = state_->buffer_.try_pop(); // The final instructions may have been pushed since the first attempt
+        if (!next_.has_value()) {
+          if (state_->error_) {
+            std::rethrow_exception(state_->error_);
+          }
+          return false;
+        }
+      }
+      if (!next_.has_value()) {
+        if (spins < spin_limit) {
+          std::this_thread::yield();
+        } else {
+          wait_for_producer();
+        }
+      }
+    }
+    return true;
+  }
+
+  void stop()
+  {
+    if (worker_.joinable()) {
+      state_->stop_.store(true, std::memory_order_relaxed);
+      worker_.join();
+    }
+  }
+
+public:
+  constexpr static std::size_t default_capacity = 1 << 16;
+
+  explicit async_tracereader(T&& intern, std::size_t capacity = default_capacity)
+      : state_(std::make_unique<shared_state>(std::move(intern), capacity)), worker_(produce, state_.get())
+  {
+  }
+
+  async_tracereader(async_tracereader&&) noexcept = default;
+  async_tracereader& operator=(async_tracereader&& other) noexcept
+  {
+    stop();
+    state_ = std::move(other.state_);
+    worker_ = std::move(other.worker_);
+    next_ = std::move(other.next_);
+    return *this;
+  }
+  async_tracereader(const async_tracereader&) = delete;
+  async_tracereader& operator=(const async_tracereader&) = delete;
+
+  ~async_tracereader() { stop(); }
+
+  ooo_model_instr operator()()
+  {
+    if (!fill_next()) {
+      throw std::out_of_range{"Read past the end of the trace"};
+    }
+    auto retval = std::move(*next_);
+    next_.reset();
+    return retval;
+  }
+
+  /**
+   * Check whether all instructions have been consumed.
+   * If no instruction is ready, this waits until the wrapped reader either produces another instruction or reaches the end of the trace.
+   */
+  [[nodiscard]] bool eof() const { return !fill_next(); }
+};
+} // namespace champsim
+
+#endif
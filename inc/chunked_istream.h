@@ -0,0 +1,91 @@
+/*
+ *    Copyright 2023 The ChampSim Contributors
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+
+#ifndef CHUNKED_ISTREAM_H
+#define CHUNKED_ISTREAM_H
+
+#include <array>
+#include <cstdint>
+#include <fstream>
+#include <ios>
+#include <string>
+#include <vector>
+
+namespace champsim
+{
+/**
+ * A read-only, seekable input stream over a chunked trace.
+ *
+ * A chunked trace is divided into chunks of a fixed number of records, each compressed independently as an xz stream, and ends with an
+ * index of the offset of each chunk. Seeking decompresses only the chunk holding the new position, so any instruction in the trace can be
+ * reached in constant time. Chunked traces are produced from other traces by ``python3 -m runner.chunked``, which describes the format.
+ *
+ * This provides the subset of the interface of std::istream that the trace readers use, with the same end-of-file behavior.
+ */
+class chunked_istream
+{
+public:
+  constexpr static std::array<char, 8> magic{'C', 'H', 'A', 'M', 'P', 'S', 'I', 'M'};
+  constexpr static uint32_t version = 1;
+
+private:
+  struct chunk_location {
+    uint64_t offset;
+    uint64_t size;
+  };
+
+  std::ifstream file_;
+  uint64_t record_size_ = 0;
+  uint64_t records_per_chunk_ = 0;
+  uint64_t records_ = 0;
+  std::vector<chunk_location> index_;
+
+  std::vector<uint8_t> compressed_;
+  std::vector<char> chunk_;     // The decompressed contents of the current chunk
+  std::size_t next_chunk_ = 0;  // The index of the chunk following the current chunk
+  std::size_t chunk_position_ = 0;
+  std::streamsize gcount_ = 0;
+  bool eof_ = false;
+
+  void load_chunk(std::size_t i);
+  [[nodiscard]] uint64_t chunk_bytes() const { return records_per_chunk_ * record_size_; }
+
+public:
+  /**
+   * Open a chunked trace.
+   *
+   * \throws std::runtime_error if the file is not a chunked trace
+   */
+  explicit chunked_istream(const std::string& fname);
+
+  chunked_istream& read(char* dest, std::streamsize count);
+
+  /**
+   * Move to the given byte offset in the uncompressed trace.
+   * Seeking to or beyond the end of the trace reaches the end of the file.
+   */
+  chunked_istream& seekg(std::streamoff pos);
+
+  [[nodiscard]] std::streamsize gcount() const { return gcount_; }
+  [[nodiscard]] bool eof() const { return eof_; }
+  [[nodiscard]] uint64_t record_size() const { return record_size_; }
+  [[nodiscard]] uint64_t records() const { return records_; }
+  [[nodiscard]] uint64_t size() const { return records_ * record_size_; }
+};
+} // namespace champsim
+
+#endif
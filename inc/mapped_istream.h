@@ -0,0 +1,70 @@
+/*
+ *    Copyright 2023 The ChampSim Contributors
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef MAPPED_ISTREAM_H
+#define MAPPED_ISTREAM_H
+
+#include <cstddef>
+#include <ios>
+#include <memory>
+#include <string>
+
+namespace champsim
+{
+/**
+ * A read-only input stream over a memory-mapped file.
+ *
+ * This provides the subset of the interface of std::istream that the trace readers use, with the same end-of-file behavior.
+ * Reads copy directly out of the page cache, so many simulations reading the same uncompressed trace share one copy of it in memory.
+ * Only a regular file can be mapped. If the file does not exist, is not a regular file, or is empty, is_mapped() is false
+ * and the stream behaves as an empty file.
+ */
+class mapped_istream
+{
+  struct unmapper {
+    std::size_t length = 0;
+    void operator()(char* addr) const;
+  };
+
+  std::unique_ptr<char, unmapper> data_{nullptr, unmapper{0}};
+  std::size_t size_ = 0;
+  std::size_t position_ = 0;
+  std::streamsize gcount_ = 0;
+  bool eof_ = false;
+
+public:
+  /**
+   * Map the given file.
+   *
+   * \throws std::runtime_error if the file is a regular file that cannot be opened or mapped
+   */
+  explicit mapped_istream(const std::string& fname);
+
+  mapped_istream& read(char* dest, std::streamsize count);
+
+  /**
+   * Move to the given byte offset in the file.
+   * Seeking to or beyond the end of the file reaches the end of the file.
+   */
+  mapped_istream& seekg(std::streamoff pos);
+  [[nodiscard]] std::streamsize gcount() const { return gcount_; }
+  [[nodiscard]] bool eof() const { return eof_; }
+  [[nodiscard]] std::size_t size() const { return size_; }
+  [[nodiscard]] bool is_mapped() const { return data_ != nullptr; }
+};
+} // namespace champsim
+
+#endif
@@ -17,11 +17,14 @@
 #ifndef TRACEREADER_H
 #define TRACEREADER_H
 
+#include <array>
 #include <cstring>
 #include <deque>
+#include <istream>
 #include <memory>
 #include <numeric>
 #include <string>
+#include <stdexcept>
 #include <type_traits>
 
 #include "instruction.h"
@@ -88,12 +91,37 @@ class bulk_tracereader
   constexpr static std::size_t refresh_thresh = 1;
   std::deque<ooo_model_instr> instr_buffer;
 
+  template <typename U>
+  using has_seekg = decltype(std::declval<U&>().seekg(std::declval<std::streamoff>()));
+
+  // A std::istream is not seekable here, because it cannot seek in a pipe and does not reach the end of the file by seeking past it
+  template <typename U>
+  constexpr static bool is_seekable = champsim::is_detected_v<has_seekg, U> && !std::is_base_of_v<std::istream, U>;
+
+  // Advance the file past the given number of records. Seekable files skip directly, and others are read through.
+  void skip(uint64_t records);
+
+  // Read the next block of the file into the instruction buffer
+  void refill();
+
 public:
+  /**
+   * Read the next instruction.
+   *
+   * \throws std::out_of_range if there are no instructions remaining
+   */
   ooo_model_instr operator()();
 
   bulk_tracereader(uint8_t cpu_idx, std::string tf) : cpu(cpu_idx), trace_file(tf) {}
   bulk_tracereader(uint8_t cpu_idx, F&& file) : cpu(cpu_idx), trace_file(std::move(file)) {}
 
+  /**
+   * Read the trace beginning at the instruction with the given index.
+   *
+   * \throws std::out_of_range if the trace has no instruction with that index
+   */
+  bulk_tracereader(uint8_t cpu_idx, std::string tf, uint64_t start_instruction) : bulk_tracereader(cpu_idx, tf) { skip(start_instruction); }
+
   [[nodiscard]] bool eof() const { return trace_file.eof() && std::size(instr_buffer) <= refresh_thresh; }
 };
 
@@ -108,28 +136,63 @@ void set_branch_targets(It begin, It end)
 }
 
 template <typename T, typename F>
-ooo_model_instr bulk_tracereader<T, F>::operator()()
+void bulk_tracereader<T, F>::skip(uint64_t records)
 {
-  if (std::size(instr_buffer) <= refresh_thresh) {
-    std::array<T, buffer_size - refresh_thresh> trace_read_buf;
-    std::array<char, std::size(trace_read_buf) * sizeof(T)> raw_buf;
-    std::size_t bytes_read;
+  if constexpr (is_seekable<F>) {
+    trace_file.seekg(static_cast<std::streamoff>(records * sizeof(T)));
+  } else {
+    std::array<char, buffer_size * sizeof(T)> discard;
+    for (auto remaining = records * sizeof(T); remaining > 0 && !trace_file.eof();) {
+      trace_file.read(std::data(discard), static_cast<std::streamsize>(std::min<uint64_t>(remaining, std::size(discard))));
+      if (trace_file.gcount() == 0) {
+        break;
+      }
+      remaining -= static_cast<uint64_t>(trace_file.gcount());
+    }
+  }
 
-    // Read from trace file
-    trace_file.read(std::data(raw_buf), std::size(raw_buf));
-    bytes_read = static_cast<std::size_t>(trace_file.gcount());
-    eof_ = trace_file.eof();
+  // Whether the end was reached depends on the stream, so check for the start instruction itself
+  if (records > 0) {
+    refill();
+    if (std::empty(instr_buffer)) {
+      throw std::out_of_range{"The trace ends before the start instruction"};
+    }
+  }
+}
 
-    // Transform bytes into trace format instructions
-    std::memcpy(std::data(trace_read_buf), std::data(raw_buf), bytes_read);
+template <typename T, typename F>
+void bulk_tracereader<T, F>::refill()
+{
+  std::array<T, buffer_size - refresh_thresh> trace_read_buf;
+  std::array<char, std::size(trace_read_buf) * sizeof(T)> raw_buf;
+  std::size_t bytes_read;
+
+  // Read from trace file
+  trace_file.read(std::data(raw_buf), std::size(raw_buf));
+  bytes_read = static_cast<std::size_t>(trace_file.gcount());
+  eof_ = trace_file.eof();
+
+  // Transform bytes into trace format instructions
+  std::memcpy(std::data(trace_read_buf), std::data(raw_buf), bytes_read);
+
+  // Inflate trace format into core model instructions
+  auto begin = std::begin(trace_read_buf);
+  auto end = std::next(begin, bytes_read / sizeof(T));
+  std::transform(begin, end, std::back_inserter(instr_buffer), [cpu = this->cpu](T t) { return ooo_model_instr{cpu, t}; });
+
+  // Set branch targets
+  set_branch_targets(std::begin(instr_buffer), std::end(instr_buffer));
+}
 
-    // Inflate trace format into core model instructions
-    auto begin = std::begin(trace_read_buf);
-    auto end = std::next(begin, bytes_read / sizeof(T));
-    std::transform(begin, end, std::back_inserter(instr_buffer), [cpu = this->cpu](T t) { return ooo_model_instr{cpu, t}; });
+template <typename T, typename F>
+ooo_model_instr bulk_tracereader<T, F>::operator()()
+{
+  if (std::size(instr_buffer) <= refresh_thresh) {
+    refill();
+  }
 
-    // Set branch targets
-    set_branch_targets(std::begin(instr_buffer), std::end(instr_buffer));
+  if (std::empty(instr_buffer)) {
+    throw std::out_of_range{"Read past the end of the trace"};
   }
 
   auto retval = instr_buffer.front();
@@ -141,6 +204,7 @@ ooo_model_instr bulk_tracereader<T, F>::operator()()
 std::string get_fptr_cmd(std::string_view fname);
 } // namespace champsim
 
-champsim::tracereader get_tracereader(const std::string& fname, uint8_t cpu, bool is_cloudsuite, bool repeat);
+champsim::tracereader get_tracereader(const std::string& fname, uint8_t cpu, bool is_cloudsuite, bool repeat, bool async = false,
+                                      uint64_t start_instruction = 0);
 
 #endif
@@ -0,0 +1,5 @@
+'''
+Once binaries have been built with the configuration step, this package runs them over sets of traces.
+Runs are scheduled on the local machine, one per processor, and their state is kept in a database so that an interrupted sweep can be resumed.
+The runner can be used from the command line, with ``python3 -m runner``, or programmatically.
+'''
@@ -0,0 +1,110 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import argparse
+import collections
+import json
+import os
+import sys
+
+from . import database
+from . import jobs
+from . import pool
+from . import tracecache
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m runner', description='Run ChampSim binaries over sets of traces')
+
+    parser.add_argument('binaries', nargs='+',
+            help='The binaries to run. Every binary is run over every trace set.')
+
+    trace_group = parser.add_argument_group('Traces')
+    trace_group.add_argument('--trace-list', action='append', default=[], metavar='FILE',
+            help='A file listing trace sets, one per line, with the traces in each set separated by whitespace. May be given multiple times.')
+    trace_group.add_argument('--trace', action='append', nargs='+', default=[], metavar='TRACE',
+            help='The traces for a single run, one for each simulated core. May be given multiple times.')
+
+    run_group = parser.add_argument_group('Simulation')
+    run_group.add_argument('-w', '--warmup-instructions', type=int,
+            help='The number of instructions in the warmup phase of each run')
+    run_group.add_argument('-i', '--simulation-instructions', type=int,
+            help='The number of instructions in the simulation phase of each run')
+    run_group.add_argument('--arg', action='append', default=[], dest='args', metavar='ARG',
+            help='An additional argument to pass to each binary, for example --arg=--hide-heartbeat. May be given multiple times.')
+    run_group.add_argument('--trace-cache', metavar='DIR',
+            help='Decompress each compressed trace once into DIR, and run over the decompressed copy. The directory may be shared by concurrent runners.')
+
+    schedule_group = parser.add_argument_group('Scheduling')
+    schedule_group.add_argument('-j', '--jobs', type=int,
+            help='Run at most this many jobs at once. By default, one job is run for each available processor.')
+    schedule_group.add_argument('--cpus', type=pool.parse_cpu_list,
+            help='The processors to run on, as a list such as 0-3,8. Each job is pinned to one of them.')
+    schedule_group.add_argument('--cpus-per-job', type=int,
+            help='Pin each job to this many of the processors. By default, this is 2 if --arg=--async-traces is given, so that trace reading overlaps with simulation, and 1 otherwise.')
+    schedule_group.add_argument('--timeout', type=float,
+            help='Stop any job that runs for longer than this many seconds, and mark it as failed')
+
+    state_group = parser.add_argument_group('Results')
+    state_group.add_argument('--results-dir', default='results',
+            help='The directory in which to place the output of each run')
+    state_group.add_argument('--database',
+            help='The database recording the state of each run. Defaults to runs.sqlite in the results directory. Runs already completed in it are not repeated.')
+    state_group.add_argument('--retry-failed', action='store_true',
+            help='Run again any runs that failed on an earlier attempt')
+    state_group.add_argument('--json', metavar='FILE',
+            help='Write the collected JSON output of all completed runs to FILE')
+
+    args = parser.parse_args(argv)
+
+    trace_sets = [*(ts for fname in args.trace_list for ts in jobs.read_trace_list(fname)), *map(tuple, args.trace)]
+    if not trace_sets:
+        parser.error('No traces given. Use --trace or --trace-list.')
+
+    cpus_per_job = args.cpus_per_job or (2 if '--async-traces' in args.args else 1)
+    cpus = args.cpus or pool.available_cpus()
+    if args.jobs is not None:
+        cpus = cpus[:max(args.jobs, 1)*cpus_per_job]
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    with database.RunDatabase(args.database or os.path.join(args.results_dir, 'runs.sqlite')) as db:
+        requested = jobs.make_jobs(args.binaries, trace_sets, args.warmup_instructions, args.simulation_instructions, args.args)
+        db.add(requested)
+        pending_keys = {j.key for j in db.pending(retry_failed=args.retry_failed)}
+        to_run = [j for j in requested if j.key in pending_keys]
+        if len(to_run) < len(requested):
+            print(f'Resuming: {len(requested) - len(to_run)} of {len(requested)} runs were already attempted')
+
+        finished = 0
+        def report(job, outcome):
+            nonlocal finished
+            finished += 1
+            print(f'[{finished}/{len(to_run)}] {outcome["state"]:>6} {os.path.basename(job.binary)} {" ".join(map(os.path.basename, job.traces))} ({outcome["seconds"]:.1f} s)', flush=True)
+
+        trace_cache = tracecache.TraceCache(args.trace_cache) if args.trace_cache else None
+        pool.run_all(to_run, db, args.results_dir, cpus=cpus, timeout=args.timeout, callback=report, trace_cache=trace_cache, cpus_per_job=cpus_per_job)
+
+        requested_keys = {j.key for j in requested}
+        outcomes = [r for r in db.results(state=None) if r['key'] in requested_keys]
+        states = collections.Counter(r['state'] for r in outcomes)
+        print(', '.join(f'{v} {k}' for k,v in sorted(states.items())))
+
+        if args.json:
+            with open(args.json, 'wt') as wfp:
+                json.dump([r for r in outcomes if r['state'] == 'done'], wfp, indent=2)
+
+    return 1 if states['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+A seekable trace container, in which the trace is divided into chunks of a fixed number of records, each compressed independently.
+
+Any instruction can be reached by decompressing only the chunk that holds it, so a simulation may begin anywhere in the trace, such as at
+a simulation point, without decompressing everything before it. The simulator recognizes these traces by the suffix ``.ctrace``.
+
+The file consists of a header, the compressed chunks, and an index. All integers are little-endian.
+
+- The header holds the magic bytes ``CHAMPSIM``, a 32-bit version, the 32-bit size of each record, and 64-bit counts of the records in
+  each chunk (the last may hold fewer), the records in the trace, and the chunks, followed by the 64-bit offset of the index.
+- Each chunk is a complete xz stream.
+- The index holds, for each chunk in order, its 64-bit offset and 64-bit compressed size.
+
+Run ``python3 -m runner.chunked IN OUT`` to convert a trace to this format.
+'''
+
+import argparse
+import collections
+import concurrent.futures
+import lzma
+import os
+import struct
+import sys
+
+from . import compression
+from . import tracecache
+
+magic = b'CHAMPSIM'
+version = 1
+suffix = 'ctrace'
+header_format = struct.Struct('<8sIIQQQQ')
+index_format = struct.Struct('<QQ')
+
+record_sizes = {'input_instr': 64, 'cloudsuite_instr': 96}
+
+def is_chunked(fname):
+    ''' Test whether the trace is a chunked trace, by its name. '''
+    return os.fspath(fname).endswith('.' + suffix)
+
+class ChunkedTrace:
+    '''
+    Read access to a chunked trace.
+
+    :param fname: the file to read
+    '''
+    def __init__(self, fname):
+        self.file = open(fname, 'rb')
+        try:
+            header = self.file.read(header_format.size)
+            if len(header) < header_format.size:
+                raise ValueError(f'{fname} is not a chunked trace')
+            file_magic, file_version, self.record_size, self.records_per_chunk, self.records, chunks, index_offset = header_format.unpack(header)
+            if file_magic != magic or file_version != version:
+                raise ValueError(f'{fname} is not a chunked trace of version {version}')
+            self.file.seek(index_offset)
+            index = self.file.read(index_format.size * chunks)
+            if len(index) < index_format.size * chunks:
+                raise ValueError(f'The index of {fname} is truncated')
+            self.index = list(index_format.iter_unpack(index))
+        except Exception:
+            self.file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        ''' Close the underlying file. '''
+        self.file.close()
+
+    def __len__(self):
+        return self.records
+
+    def chunk(self, i):
+        ''' Decompress the chunk with the given index, returning its records as bytes. '''
+        offset, size = self.index[i]
+        self.file.seek(offset)
+        data = lzma.decompress(self.file.read(size), format=lzma.FORMAT_XZ)
+        expected = min(self.records_per_chunk, self.records - i*self.records_per_chunk) * self.record_size
+        if len(data) != expected:
+            raise ValueError(f'Chunk {i} holds {len(data)} bytes, where {expected} were expected')
+        return data
+
+    def iter_chunks(self, start=0):
+        '''
+        Yield the records of the trace as bytes, one chunk at a time, beginning at the given record.
+        Only the chunks holding the records at or after the start are decompressed.
+        '''
+        first, skip = divmod(start, self.records_per_chunk) if start < self.records else (len(self.index), 0)
+        for i in range(first, len(self.index)):
+            data = self.chunk(i)
+            yield data[skip*self.record_size:] if i == first else data
+
+    def read(self, start, count):
+        ''' Read the given number of records, or as many as remain, beginning at the given record, as bytes. '''
+        result = bytearray()
+        for data in self.iter_chunks(start):
+            result += data[:count*self.record_size - len(result)]
+            if len(result) >= count*self.record_size:
+                break
+        return bytes(result)
+
+def read_exactly(rfp, size):
+    ''' Read the given number of bytes from a binary file, or fewer only at the end of the file. '''
+    result = bytearray()
+    while len(result) < size:
+        data = rfp.read(size - len(result))
+        if not data:
+            break
+        result += data
+    return bytes(result)
+
+def write(rfp, out_fname, record_size, records_per_chunk=1<<16, preset=6, max_workers=None):
+    '''
+    Write the contents of a binary file as a chunked trace.
+    Chunks are compressed concurrently, and the output is written atomically. A partial record at the end of the input is discarded.
+
+    :param rfp: the file to read the records from
+    :param out_fname: the chunked trace to write
+    :param record_size: the size of each record in bytes
+    :param records_per_chunk: the number of records in each chunk. Smaller chunks are faster to seek within, but compress less well.
+    :param preset: the xz compression preset
+    :param max_workers: the largest number of chunks to compress at once. If None, use the number of processors.
+    :returns: the number of records written
+    '''
+    max_workers = max_workers or os.cpu_count() or 1
+    chunk_bytes = records_per_chunk * record_size
+    records = 0
+
+    def write_file(wfp):
+        nonlocal records
+        index = []
+        def write_chunk(future):
+            data = future.result()
+            index.append((wfp.tell(), len(data)))
+            wfp.write(data)
+
+        wfp.write(bytes(header_format.size)) # Reserve space for the header, which is written last
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            # lzma releases the GIL while compressing, so the chunks are compressed in parallel.
+            # Only a few chunks are held at once, and they are written in order.
+            pending = collections.deque()
+            while True:
+                data = read_exactly(rfp, chunk_bytes)
+                data = data[:len(data) - (len(data) % record_size)]
+                if data:
+                    records += len(data) // record_size
+                    pending.append(executor.submit(lzma.compress, data, format=lzma.FORMAT_XZ, preset=preset))
+                if len(pending) > 2*max_workers:
+                    write_chunk(pending.popleft())
+                if len(data) < chunk_bytes:
+                    break
+            while pending:
+                write_chunk(pending.popleft())
+
+        index_offset = wfp.tell()
+        for entry in index:
+            wfp.write(index_format.pack(*entry))
+        wfp.seek(0)
+        wfp.write(header_format.pack(magic, version, record_size, records_per_chunk, records, len(index), index_offset))
+
+    tracecache.TraceCache.write_atomic(os.path.abspath(out_fname), write_file)
+    return records
+
+def convert(in_fname, out_fname, record_size, **kwargs):
+    '''
+    Convert a trace into a chunked trace. The input may be compressed, as its name indicates.
+
+    :param in_fname: the trace to convert
+    :param out_fname: the chunked trace to write
+    :param record_size: the size of each record in bytes
+    :param kwargs: options for :func:`write`
+    :returns: the number of records written
+    '''
+    with compression.open_trace(in_fname) as rfp:
+        return write(rfp, out_fname, record_size, **kwargs)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m runner.chunked', description='Convert a trace into a seekable chunked trace')
+    parser.add_argument('input', help='The trace to convert, which may be compressed')
+    parser.add_argument('output', help=f'The chunked trace to write. Its name should end in .{suffix}.')
+    parser.add_argument('-c', '--cloudsuite', action='store_true',
+            help='The trace holds CloudSuite records')
+    parser.add_argument('--chunk-records', type=int, default=1<<16,
+            help='The number of records in each chunk')
+    parser.add_argument('--preset', type=int, default=6, choices=range(10),
+            help='The xz compression preset')
+    parser.add_argument('-j', '--jobs', type=int,
+            help='Compress at most this many chunks at once. By default, one for each available processor.')
+    args = parser.parse_args(argv)
+
+    if not is_chunked(args.output):
+        parser.error(f'The output must end in .{suffix} to be recognized by the simulator')
+
+    record_size = record_sizes['cloudsuite_instr' if args.cloudsuite else 'input_instr']
+    records = convert(args.input, args.output, record_size, records_per_chunk=args.chunk_records, preset=args.preset, max_workers=args.jobs)
+    print(f'Wrote {records} records to {args.output}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
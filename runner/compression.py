@@ -0,0 +1,40 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Recognition of compressed traces, by the same suffixes as ``get_tracereader()``.
+'''
+
+import bz2
+import gzip
+import lzma
+import os
+
+# The openers for each compression format, keyed by the suffix that get_tracereader() recognizes
+compressed_openers = {
+    'gz': gzip.open,
+    'xz': lzma.open,
+    'bz2': bz2.open
+}
+
+def compression(fname):
+    ''' The suffix naming the compression format of the trace, or None if it is not compressed. '''
+    return next((suffix for suffix in compressed_openers if os.fspath(fname).endswith(suffix)), None)
+
+def open_trace(fname, mode='rb'):
+    ''' Open a trace as a binary file, compressing or decompressing it as its name indicates. '''
+    suffix = compression(fname)
+    if suffix is None:
+        return open(fname, mode)
+    return compressed_openers[suffix](fname, mode)
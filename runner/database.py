@@ -0,0 +1,112 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+'''
+A local SQLite database that records the state of each job in a sweep.
+
+Jobs are added in the ``pending`` state, and become ``done`` or ``failed`` when they finish.
+Each result is committed as soon as it is recorded, so if a sweep is interrupted, only the jobs that were running are lost,
+and they remain pending for the next attempt.
+'''
+
+import json
+import sqlite3
+
+from .jobs import Job
+
+class RunDatabase:
+    '''
+    The state of a set of jobs, stored in a SQLite database.
+
+    :param fname: the database file, which is created if it does not exist
+    '''
+    schema = '''CREATE TABLE IF NOT EXISTS runs (
+        key TEXT PRIMARY KEY,
+        description TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'pending',
+        returncode INTEGER,
+        seconds REAL,
+        cpu INTEGER,
+        log TEXT,
+        result TEXT
+    )'''
+
+    def __init__(self, fname):
+        self.connection = sqlite3.connect(fname)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(self.schema)
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        ''' Close the connection to the database. '''
+        self.connection.close()
+
+    def add(self, jobs):
+        ''' Add the jobs in the pending state. Jobs that are already present keep their state. '''
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO runs (key, description) VALUES (?, ?)',
+                ((j.key, json.dumps(j.description(), sort_keys=True)) for j in jobs))
+
+    def pending(self, retry_failed=False):
+        '''
+        Get the jobs that have not yet completed.
+
+        :param retry_failed: if true, include the jobs that failed
+        '''
+        states = ('pending', 'failed') if retry_failed else ('pending',)
+        rows = self.connection.execute(f'SELECT description FROM runs WHERE state IN ({",".join("?" for _ in states)}) ORDER BY rowid', states)
+        return [Job.from_description(json.loads(d)) for d, in rows]
+
+    def record(self, job, state, returncode=None, seconds=None, cpu=None, log=None, result=None):
+        '''
+        Record the outcome of a job.
+
+        :param job: the job
+        :param state: one of 'pending', 'done', or 'failed'
+        :param result: the JSON output of the run, already parsed
+        '''
+        with self.connection:
+            self.connection.execute('UPDATE runs SET state=?, returncode=?, seconds=?, cpu=?, log=?, result=? WHERE key=?',
+                (state, returncode, seconds, cpu, log, (None if result is None else json.dumps(result)), job.key))
+
+    def counts(self):
+        ''' The number of jobs in each state. '''
+        return dict(self.connection.execute('SELECT state, COUNT(*) FROM runs GROUP BY state'))
+
+    def results(self, state='done'):
+        '''
+        Yield a dictionary for each job in the given state, with its key, its description, its outcome, and its parsed JSON output.
+
+        :param state: the state of the jobs to include. If None, all jobs are included.
+        '''
+        query = 'SELECT key, description, state, returncode, seconds, cpu, log, result FROM runs'
+        rows = self.connection.execute(query + ' ORDER BY rowid') if state is None else self.connection.execute(query + ' WHERE state=? ORDER BY rowid', (state,))
+        for key, description, row_state, returncode, seconds, cpu, log, result in rows:
+            yield {
+                'key': key,
+                **json.loads(description),
+                'state': row_state,
+                'returncode': returncode,
+                'seconds': seconds,
+                'cpu': cpu,
+                'log': log,
+                'result': None if result is None else json.loads(result)
+            }
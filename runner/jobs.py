@@ -0,0 +1,106 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+'''
+Descriptions of individual runs of ChampSim binaries.
+'''
+
+import hashlib
+import itertools
+import json
+import os
+
+class Job:
+    '''
+    A single run of a ChampSim binary over a set of traces.
+
+    :param binary: the path to the binary
+    :param traces: a sequence of paths to traces, one for each core simulated by the binary
+    :param warmup_instructions: the number of instructions in the warmup phase. If None, the binary's default is used.
+    :param simulation_instructions: the number of instructions in the simulation phase. If None, the binary's default is used.
+    :param args: additional arguments to pass to the binary
+    '''
+    def __init__(self, binary, traces, warmup_instructions=None, simulation_instructions=None, args=tuple()):
+        self.binary = os.path.abspath(binary)
+        self.traces = tuple(map(os.path.abspath, traces))
+        self.warmup_instructions = warmup_instructions
+        self.simulation_instructions = simulation_instructions
+        self.args = tuple(args)
+
+    def description(self):
+        ''' Produce a dictionary describing the job, suitable for conversion to JSON. '''
+        return {
+            'binary': self.binary,
+            'traces': list(self.traces),
+            'warmup_instructions': self.warmup_instructions,
+            'simulation_instructions': self.simulation_instructions,
+            'args': list(self.args)
+        }
+
+    @staticmethod
+    def from_description(description):
+        ''' The inverse of :meth:`description`. '''
+        return Job(**description)
+
+    @property
+    def key(self):
+        ''' A stable identifier for the job, which is the same for any two jobs with the same description. '''
+        return hashlib.sha256(json.dumps(self.description(), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def command(self, json_fname, traces=None):
+        '''
+        The command line that runs the job.
+
+        :param json_fname: the file to which the binary should write its JSON output
+        :param traces: if given, the traces to read in place of the job's own traces, such as decompressed copies of them
+        '''
+        phase_args = (
+            *(('--warmup-instructions', str(self.warmup_instructions)) if self.warmup_instructions is not None else ()),
+            *(('--simulation-instructions', str(self.simulation_instructions)) if self.simulation_instructions is not None else ())
+        )
+        return [self.binary, *phase_args, '--json', json_fname, *self.args, *(self.traces if traces is None else traces)]
+
+    def __eq__(self, other):
+        return isinstance(other, Job) and self.description() == other.description()
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f'Job({self.binary!r}, {self.traces!r})'
+
+def read_trace_list(fname):
+    '''
+    Read a list of trace sets from a file.
+    Each non-empty line names the traces for one run, separated by whitespace, one for each simulated core.
+    Relative paths are relative to the directory containing the file. Text following a ``#`` is ignored.
+
+    :param fname: the name of the file
+    '''
+    dirname = os.path.dirname(os.path.abspath(fname))
+    with open(fname, 'rt') as rfp:
+        for line in rfp:
+            traces = line.split('#', 1)[0].split()
+            if traces:
+                yield tuple(os.path.join(dirname, t) for t in traces)
+
+def make_jobs(binaries, trace_sets, warmup_instructions=None, simulation_instructions=None, args=tuple()):
+    '''
+    Produce a job for every combination of binary and trace set.
+
+    :param binaries: a sequence of paths to binaries
+    :param trace_sets: a sequence of sequences of traces
+    '''
+    return [Job(b, t, warmup_instructions, simulation_instructions, args) for b,t in itertools.product(binaries, trace_sets)]
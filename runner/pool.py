@@ -0,0 +1,221 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+'''
+Scheduling of jobs on the local machine.
+
+Each job runs as its own process, pinned to one processor or a group of them, and no more jobs run at once than there are processor groups available.
+The processes are supervised by a pool of threads, which only wait for them to finish.
+'''
+
+import concurrent.futures
+import json
+import lzma
+import os
+import queue
+import subprocess
+import threading
+import time
+import zlib
+
+def available_cpus():
+    ''' The processors on which this process may run. '''
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def parse_cpu_list(text):
+    '''
+    Parse a list of processors in the format used by ``taskset``, such as ``0-3,8``.
+
+    >>> parse_cpu_list('0-3,8')
+    [0, 1, 2, 3, 8]
+    '''
+    cpus = []
+    for part in filter(None, text.split(',')):
+        first, _, last = part.partition('-')
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+def pin(pid, cpu):
+    '''
+    Restrict a process to the given processor, where the platform supports it.
+    The process is pinned by the parent as soon as it starts, because a ``preexec_fn`` is not safe to use from the supervising threads.
+    A process that has already exited is ignored.
+
+    :param pid: the process to pin
+    :param cpu: the processor to pin it to, a tuple of processors, or None to leave it unpinned
+    '''
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(pid, set(cpu) if isinstance(cpu, tuple) else {cpu})
+        except OSError:
+            pass
+
+class ProcessGroup:
+    '''
+    A set of running child processes that can all be stopped at once, from any thread.
+    Once the group is stopped, no more processes are started in it.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processes = set()
+        self.stopped = False
+
+    def popen(self, *args, **kwargs):
+        '''
+        Start a process, with the same arguments as :class:`subprocess.Popen`, and add it to the group.
+
+        :raises RuntimeError: if the group has been stopped
+        '''
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError('The process group has been stopped')
+            process = subprocess.Popen(*args, **kwargs) # pylint: disable=consider-using-with
+            self.processes.add(process)
+            return process
+
+    def discard(self, process):
+        ''' Remove a process that has finished from the group. '''
+        with self.lock:
+            self.processes.discard(process)
+
+    def stop(self):
+        ''' Kill every process in the group, and prevent any more from starting. '''
+        with self.lock:
+            self.stopped = True
+            for process in self.processes:
+                process.kill()
+
+def run_job(job, results_dir, cpu=None, timeout=None, trace_cache=None, group=None):
+    '''
+    Run a job to completion, and collect its JSON output.
+    The output of the binary is written to a log file beside the JSON output.
+
+    :param job: the job to run
+    :param results_dir: the directory in which to place the output of the job
+    :param cpu: the processor to pin the job to, a tuple of processors, or None to leave it unpinned. The first processor is recorded in the outcome.
+    :param timeout: the longest time, in seconds, to allow the job to run. If None, there is no limit.
+    :param trace_cache: if given, an instance of :class:`runner.tracecache.TraceCache` from which to read decompressed traces
+    :param group: if given, a :class:`ProcessGroup` in which to start the process, so that it can be stopped from another thread
+    :returns: a dictionary of the outcome, with the same keys as the arguments to :meth:`runner.database.RunDatabase.record`
+    '''
+    os.makedirs(results_dir, exist_ok=True)
+    json_fname = os.path.join(results_dir, f'{job.key}.json')
+    log_fname = os.path.join(results_dir, f'{job.key}.log')
+
+    recorded_cpu = cpu[0] if isinstance(cpu, tuple) else cpu
+    start = time.perf_counter()
+    with open(log_fname, 'wt') as log:
+        try:
+            traces = None if trace_cache is None else [trace_cache.path(t) for t in job.traces]
+        except (OSError, EOFError, lzma.LZMAError, zlib.error) as err:
+            print('Could not decompress the traces:', err, file=log)
+            return {'state': 'failed', 'returncode': None, 'seconds': time.perf_counter() - start, 'cpu': recorded_cpu, 'log': log_fname, 'result': None}
+
+        popen = subprocess.Popen if group is None else group.popen
+        try:
+            process = popen(job.command(json_fname, traces), stdout=log, stderr=subprocess.STDOUT)
+        except OSError as err:
+            print('Could not start the binary:', err, file=log)
+            return {'state': 'failed', 'returncode': None, 'seconds': time.perf_counter() - start, 'cpu': recorded_cpu, 'log': log_fname, 'result': None}
+
+        pin(process.pid, cpu)
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            returncode = None
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            if group is not None:
+                group.discard(process)
+    seconds = time.perf_counter() - start
+
+    result = None
+    if returncode == 0:
+        try:
+            with open(json_fname, 'rt') as rfp:
+                result = json.load(rfp)
+        except (OSError, ValueError):
+            pass
+
+    # The binary ran over the cached copies, so record the traces under the names the job was given
+    if result is not None and traces is not None:
+        original_names = dict(zip(traces, job.traces))
+        for phase in result:
+            if 'traces' in phase:
+                phase['traces'] = [original_names.get(t, t) for t in phase['traces']]
+
+    return {
+        'state': 'done' if result is not None else 'failed',
+        'returncode': returncode,
+        'seconds': seconds,
+        'cpu': recorded_cpu,
+        'log': log_fname,
+        'result': result
+    }
+
+def run_all(jobs, database, results_dir, cpus=None, timeout=None, callback=None, trace_cache=None, cpus_per_job=1):
+    '''
+    Run the jobs concurrently, one for each of the given processors, and record each outcome in the database as it finishes.
+
+    If the run is interrupted, jobs that were not started are left pending, and running jobs are killed and also left pending.
+
+    :param jobs: a sequence of jobs
+    :param database: an instance of :class:`runner.database.RunDatabase`
+    :param results_dir: the directory in which to place the output of the jobs
+    :param cpus: the processors to run on. If None, all available processors are used.
+    :param timeout: the longest time, in seconds, to allow each job to run
+    :param callback: if given, a function called with each job and its outcome as it finishes
+    :param trace_cache: if given, an instance of :class:`runner.tracecache.TraceCache` from which to read decompressed traces
+    :param cpus_per_job: the number of the processors to pin each job to. Simulations that read their traces on a background thread need two.
+    '''
+    cpus = list(cpus or available_cpus())
+    if cpus_per_job > 1 and None not in cpus:
+        cpus = [tuple(cpus[i:i+cpus_per_job]) for i in range(0, len(cpus), cpus_per_job)]
+    free_cpus = queue.Queue()
+    for cpu in cpus:
+        free_cpus.put(cpu)
+
+    group = ProcessGroup()
+
+    def run_on_free_cpu(job):
+        cpu = free_cpus.get()
+        try:
+            return run_job(job, results_dir, cpu=cpu, timeout=timeout, trace_cache=trace_cache, group=group)
+        finally:
+            free_cpus.put(cpu)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(cpus))
+    futures = {}
+    try:
+        futures = {executor.submit(run_on_free_cpu, job): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            job, outcome = futures[future], future.result()
+            database.record(job, **outcome)
+            if callback is not None:
+                callback(job, outcome)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        group.stop()
+        raise
+    finally:
+        executor.shutdown(wait=True)
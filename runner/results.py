@@ -0,0 +1,256 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+'''
+Columnar storage for the JSON output of many runs.
+
+The JSON printer writes, for each run, a list of phases. Each phase holds statistics for the region of interest (``roi``) and for the
+whole simulation (``sim``), with an entry for the cores, the DRAM channels, and each cache.
+This module flattens that structure into a table with one row for each run, phase, region, and component, where a component is a core,
+a DRAM channel, or a cache. Each statistic becomes a column of floating-point values, which is NaN where a component does not report it.
+Nested statistics are named by joining their keys with a dot, such as ``LOAD.hit`` or ``mispredict.BRANCH_CONDITIONAL``.
+Per-core counts reported by caches are summed over the cores.
+
+Files are read one at a time, so only the table itself is held in memory, and a table may be saved as a directory of NumPy arrays
+that are memory-mapped when loaded again.
+'''
+
+import array
+import contextlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+
+import numpy as np
+
+from . import database as run_database
+
+category_columns = ('phase', 'region', 'kind', 'component')
+
+def as_float(value):
+    ''' Convert a statistic to a float. The JSON printer writes null for values that are not a number. '''
+    return math.nan if value is None else float(value)
+
+def flatten_stats(stats, prefix=''):
+    '''
+    Flatten a nested dictionary of statistics into a dictionary of floats, joining nested keys with a dot.
+    Lists, which hold a value for each core, are summed.
+    '''
+    result = {}
+    for key, value in stats.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            result.update(flatten_stats(value, prefix=name+'.'))
+        elif isinstance(value, list):
+            result[name] = math.fsum(map(as_float, value))
+        else:
+            result[name] = as_float(value)
+    return result
+
+def flatten_run(phases):
+    '''
+    Yield a row for each phase, region, and component in the JSON output of a single run.
+    Each row is a tuple of the phase name, the region, the kind of component, the component name, the core index (or -1), and a dictionary of statistics.
+
+    :param phases: the parsed JSON output of a run
+    '''
+    for phase in phases:
+        for region in ('roi', 'sim'):
+            region_stats = phase.get(region, {})
+            for name, stats in region_stats.items():
+                if name == 'cores':
+                    yield from ((phase['name'], region, 'core', f'cpu{i}', i, flatten_stats(s)) for i,s in enumerate(stats))
+                elif name == 'DRAM':
+                    yield from ((phase['name'], region, 'dram', f'channel{i}', -1, flatten_stats(s)) for i,s in enumerate(stats))
+                else:
+                    yield (phase['name'], region, 'cache', name, -1, flatten_stats(stats))
+
+def read_run(fname):
+    ''' Read the JSON output of a run from a file, and return its traces and rows as given by :func:`flatten_run`. '''
+    with open(fname, 'rt') as rfp:
+        phases = json.load(rfp)
+    traces = phases[0].get('traces', []) if phases else []
+    return traces, list(flatten_run(phases))
+
+class TableBuilder:
+    ''' Accumulates rows into compact typed columns. Each statistic is only stored from the first row that reports it, and padded with NaN as needed. '''
+    def __init__(self):
+        self.count = 0
+        self.runs = []
+        self.codes = {k: {} for k in category_columns}
+        self.coded = {k: array.array('q') for k in category_columns}
+        self.run = array.array('q')
+        self.cpu = array.array('q')
+        self.metrics = {}
+
+    def add_run(self, description, rows):
+        '''
+        Add the rows of a run to the table.
+
+        :param description: a dictionary describing the run, such as its source file and traces
+        :param rows: the rows of the run, as given by :func:`flatten_run`
+        '''
+        run_index = len(self.runs)
+        self.runs.append(description)
+        for *categories, cpu, stats in rows:
+            for name, value in zip(category_columns, categories):
+                self.coded[name].append(self.codes[name].setdefault(value, len(self.codes[name])))
+            self.run.append(run_index)
+            self.cpu.append(cpu)
+            for name, value in stats.items():
+                column = self.metrics.setdefault(name, array.array('d'))
+                if len(column) < self.count: # fill the rows that did not report this statistic
+                    column.extend(itertools.repeat(math.nan, self.count - len(column)))
+                column.append(value)
+            self.count += 1
+
+    def table(self):
+        ''' Produce the finished table. '''
+        columns = {
+            'run': np.frombuffer(self.run, dtype=np.int64).astype(np.int32),
+            'cpu': np.frombuffer(self.cpu, dtype=np.int64).astype(np.int32),
+            **{k: np.frombuffer(v, dtype=np.int64).astype(np.int32) for k,v in self.coded.items()},
+            **{k: np.frombuffer(v + array.array('d', itertools.repeat(math.nan, self.count - len(v))), dtype=np.float64) for k,v in sorted(self.metrics.items())}
+        }
+        categories = {k: list(v) for k,v in self.codes.items()}
+        return ResultTable(columns, categories, self.runs)
+
+class ResultTable:
+    '''
+    A table of statistics from many runs, stored as NumPy columns.
+
+    The columns ``run`` and ``cpu`` hold integers. The columns named in ``category_columns`` hold integer codes, which index into
+    the list of values for that column in ``categories``. All other columns hold statistics.
+
+    :param columns: a dictionary of column names to arrays of equal length
+    :param categories: a dictionary of category column names to the list of values their codes represent
+    :param runs: a list of dictionaries describing each run, indexed by the ``run`` column
+    '''
+    def __init__(self, columns, categories, runs):
+        self.columns = columns
+        self.categories = categories
+        self.runs = runs
+
+    def __len__(self):
+        return len(self.columns['run'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def metric_names(self):
+        ''' The names of the statistics columns. '''
+        return [k for k in self.columns if k not in ('run', 'cpu', *category_columns)]
+
+    def labels(self, name):
+        ''' Decode a category column into an array of its values. '''
+        return np.asarray(self.categories[name], dtype=object)[self.columns[name]]
+
+    def where(self, **criteria):
+        '''
+        Produce a boolean mask selecting the rows that match all of the criteria.
+        Category columns are compared with their values, rather than their codes.
+
+        >>> table.where(kind='cache', component='LLC', region='sim')
+        '''
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in criteria.items():
+            if name in self.categories:
+                if value not in self.categories[name]:
+                    return np.zeros(len(self), dtype=bool)
+                value = self.categories[name].index(value)
+            mask &= (self.columns[name] == value)
+        return mask
+
+    def total(self, metric, by='run', where=None):
+        '''
+        Sum a statistic over the rows that share the same value in another column. Missing values count as zero.
+        Rows with no value in the grouping column, such as the ``cpu`` of a cache or a DRAM channel, are excluded.
+
+        :param metric: the name of the statistic
+        :param by: the name of an integer or category column to group by
+        :param where: a boolean mask selecting the rows to include
+        :returns: an array indexed by the values of the grouping column
+        '''
+        keys = self.columns[by]
+        values = self.columns[metric]
+        included = keys >= 0
+        if where is not None:
+            included &= where
+        keys, values = keys[included], values[included]
+        minlength = len(self.runs) if by == 'run' else len(self.categories.get(by, ()))
+        return np.bincount(keys, weights=np.nan_to_num(values), minlength=minlength)
+
+    def save(self, directory):
+        '''
+        Save the table as a directory of NumPy arrays, one for each column, which may be memory-mapped by :meth:`load`.
+
+        :param directory: the directory to write to, which is created if it does not exist
+        '''
+        os.makedirs(directory, exist_ok=True)
+        names = list(self.columns)
+        for i, name in enumerate(names):
+            np.save(os.path.join(directory, f'column{i}.npy'), self.columns[name])
+        with open(os.path.join(directory, 'table.json'), 'wt') as wfp:
+            json.dump({'columns': names, 'categories': self.categories, 'runs': self.runs}, wfp)
+
+    @staticmethod
+    def load(directory, mmap=True):
+        '''
+        Load a table written by :meth:`save`.
+
+        :param directory: the directory to read from
+        :param mmap: if true, the columns are memory-mapped rather than read into memory
+        '''
+        with open(os.path.join(directory, 'table.json'), 'rt') as rfp:
+            metadata = json.load(rfp)
+        columns = {name: np.load(os.path.join(directory, f'column{i}.npy'), mmap_mode=('r' if mmap else None)) for i, name in enumerate(metadata['columns'])}
+        return ResultTable(columns, metadata['categories'], metadata['runs'])
+
+def load_files(fnames, jobs=1, chunksize=64):
+    '''
+    Read the JSON output of many runs into a table.
+    Each file is parsed and flattened independently, and may be read by a pool of processes.
+
+    :param fnames: the files written by the ``--json`` option of each run
+    :param jobs: the number of processes to use. If 0 or None, use the number of available processors.
+    '''
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    fnames = list(fnames)
+    builder = TableBuilder()
+    with multiprocessing.Pool(jobs) if jobs > 1 else contextlib.nullcontext() as pool:
+        runs = pool.imap(read_run, fnames, chunksize=chunksize) if pool is not None else map(read_run, fnames)
+        for fname, (traces, rows) in zip(fnames, runs):
+            builder.add_run({'source': fname, 'traces': traces}, rows)
+    return builder.table()
+
+def load_database(database):
+    '''
+    Read the JSON output of every completed run recorded by the runner into a table.
+
+    :param database: an instance of :class:`runner.database.RunDatabase`, or the path to the file written by the ``--database`` option of the runner
+    '''
+    if isinstance(database, (str, os.PathLike)):
+        with run_database.RunDatabase(database) as opened:
+            return load_database(opened)
+
+    builder = TableBuilder()
+    for run in database.results():
+        description = {k: v for k,v in run.items() if k not in ('result', 'state', 'log')}
+        builder.add_run(description, flatten_run(run['result']))
+    return builder.table()
@@ -0,0 +1,382 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Selection of representative simulation points from a trace, in the manner of SimPoint.
+
+A trace is divided into intervals of a fixed number of instructions, and each interval is summarized by its basic block vector:
+the number of instructions executed in each basic block, where a basic block begins at the first instruction of the trace and at
+each instruction following a branch. Blocks are identified by the address of their first instruction, hashed into a fixed number of
+dimensions so that a trace may be processed in chunks without first discovering all of its blocks.
+The normalized vectors are randomly projected into a few dimensions and clustered with k-means. The interval nearest the centre of each
+cluster represents it, weighted by the fraction of the trace's instructions that fall in the cluster.
+
+The simulator reads most traces from their beginning, so each selected interval, with the instructions preceding it that are used for
+warmup, is extracted into a trace of its own. Chunked traces (see :mod:`runner.chunked`) are not extracted, since the simulator can begin
+reading them at any instruction. The regions are run with :mod:`runner`, and the statistics of the runs are combined by weight.
+'''
+
+import argparse
+import json
+import contextlib
+import math
+import os
+import sys
+import uuid
+
+import numpy as np
+
+from . import chunked
+from . import database
+from . import jobs
+from . import pool
+from . import results
+from . import traces
+
+hash_multiplier = np.uint64(0x9E3779B97F4A7C15)
+
+def block_hash(addresses, dimensions):
+    ''' Hash block addresses into the given number of dimensions. '''
+    return (addresses * hash_multiplier >> np.uint64(32)) % np.uint64(dimensions)
+
+def basic_block_vectors(chunks, interval, dimensions=4096):
+    '''
+    Compute the basic block vector of each interval of a trace.
+
+    :param chunks: the records of the trace, as an iterable of arrays such as that produced by :func:`runner.traces.iter_chunks`
+    :param interval: the number of instructions in each interval. The final interval may be shorter.
+    :param dimensions: the number of dimensions into which block addresses are hashed
+    :returns: an array with one row for each interval, holding the number of instructions executed in each dimension
+    '''
+    pieces = []
+    rows = 0
+    offset = 0
+    block_start = np.uint64(0)
+    follows_branch = True
+    for chunk in chunks:
+        count = len(chunk)
+        if count == 0:
+            continue
+        ips = chunk['ip']
+        is_branch = chunk['is_branch'] != 0
+
+        # Find the address of the block containing each instruction. Instructions before the first block boundary in this chunk
+        # continue the block from the previous chunk.
+        starts = np.empty(count, dtype=bool)
+        starts[0] = follows_branch
+        starts[1:] = is_branch[:-1]
+        positions = np.maximum.accumulate(np.where(starts, np.arange(count), 0))
+        blocks = ips[positions]
+        blocks[~np.logical_or.accumulate(starts)] = block_start
+        block_start, follows_branch = blocks[-1], bool(is_branch[-1])
+
+        first = offset // interval
+        span = (offset + count - 1) // interval - first + 1
+        local_interval = (np.arange(offset, offset + count) // interval) - first
+        counts = np.bincount(local_interval * dimensions + block_hash(blocks, dimensions).astype(np.int64), minlength=span*dimensions)
+        counts = counts.reshape(span, dimensions)
+        if first < rows: # The first interval of this chunk continues the last interval of the previous chunk
+            pieces[-1][-1] += counts[0]
+            counts = counts[1:]
+        if len(counts) > 0:
+            pieces.append(counts)
+            rows += len(counts)
+        offset += count
+
+    if not pieces:
+        return np.zeros((0, dimensions), dtype=np.int64)
+    return np.concatenate(pieces)
+
+def project(vectors, dimensions=15, seed=0):
+    ''' Normalize each vector to sum to one, and randomly project them into fewer dimensions. '''
+    totals = vectors.sum(axis=1, keepdims=True)
+    normalized = vectors / np.maximum(totals, 1)
+    projection = np.random.default_rng(seed).uniform(-1, 1, size=(vectors.shape[1], dimensions))
+    return normalized @ projection
+
+def kmeans(points, clusters, seed=0, iterations=100):
+    '''
+    Cluster the points with k-means, initialized with k-means++.
+
+    :param points: an array with one row for each point
+    :param clusters: the number of clusters, which must not exceed the number of points
+    :returns: a tuple of the centroids and the cluster of each point
+    '''
+    rng = np.random.default_rng(seed)
+    centroids = points[[rng.integers(len(points))]]
+    for _ in range(1, clusters):
+        distances = ((points[:, None, :] - centroids[None, :, :])**2).sum(axis=2).min(axis=1)
+        total = distances.sum()
+        choice = rng.choice(len(points), p=distances/total) if total > 0 else rng.integers(len(points))
+        centroids = np.vstack((centroids, points[choice]))
+
+    assignment = np.full(len(points), -1)
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centroids[None, :, :])**2).sum(axis=2)
+        new_assignment = distances.argmin(axis=1)
+        if np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, points)
+        sizes = np.bincount(assignment, minlength=len(centroids))
+        occupied = sizes > 0
+        centroids[occupied] = sums[occupied] / sizes[occupied, None]
+    return centroids, assignment
+
+def choose_points(points, lengths, clusters, seed=0):
+    '''
+    Cluster the intervals and choose the interval closest to the centre of each cluster.
+
+    :param points: the projected basic block vector of each interval
+    :param lengths: the number of instructions in each interval
+    :param clusters: the largest number of clusters to form
+    :returns: a list of tuples of (cluster, interval index, weight), in the order of the intervals
+    '''
+    centroids, assignment = kmeans(points, min(clusters, len(points)), seed=seed)
+    distances = ((points - centroids[assignment])**2).sum(axis=1)
+    weights = np.bincount(assignment, weights=lengths, minlength=len(centroids)) / lengths.sum()
+    chosen = []
+    for cluster in np.unique(assignment):
+        members = np.flatnonzero(assignment == cluster)
+        chosen.append((int(cluster), int(members[distances[members].argmin()]), float(weights[cluster])))
+    return sorted(chosen, key=lambda c: c[1])
+
+def select_points(fname, interval, clusters=10, cloudsuite=False, dimensions=4096, projection=15, seed=0, chunk_size=1<<20):
+    '''
+    Select weighted simulation points from a trace.
+
+    :param fname: the trace file
+    :param interval: the number of instructions in each interval
+    :param clusters: the largest number of simulation points to select
+    :param cloudsuite: whether the trace holds CloudSuite records
+    :param dimensions: the number of dimensions into which block addresses are hashed
+    :param projection: the number of dimensions into which basic block vectors are projected before clustering
+    :param seed: the seed for the random projection and the clustering. The same seed always produces the same selection.
+    :returns: a dictionary describing the selection, suitable for conversion to JSON
+    '''
+    vectors = basic_block_vectors(traces.iter_chunks(fname, cloudsuite, chunk_size=chunk_size), interval, dimensions)
+    lengths = vectors.sum(axis=1)
+    points = []
+    if len(vectors) > 0:
+        chosen = choose_points(project(vectors, projection, seed), lengths, clusters, seed=seed)
+        points = [{'cluster': c, 'interval': i, 'start': i*interval, 'length': int(lengths[i]), 'weight': w} for c,i,w in chosen]
+    return {
+        'trace': os.path.abspath(fname),
+        'cloudsuite': cloudsuite,
+        'interval': interval,
+        'instructions': int(lengths.sum()),
+        'points': points
+    }
+
+def region_name(trace, start, length):
+    ''' The name of the uncompressed trace holding the region of the given trace. '''
+    base = os.path.basename(trace)
+    suffix = traces.compression(trace)
+    if suffix is not None:
+        base = base[:-len(suffix)].rstrip('.')
+    return f'{base}.{start}-{start+length}'
+
+def extract_regions(fname, regions, cloudsuite=False, chunk_size=1<<20):
+    '''
+    Copy regions of a trace into uncompressed traces of their own, reading the trace once.
+    Each output is written to a uniquely named temporary file and moved into place when it is complete,
+    so that concurrent extractions into the same directory do not interfere.
+
+    :param fname: the trace file
+    :param regions: a sequence of tuples of (start, length, output file name)
+    :param cloudsuite: whether the trace holds CloudSuite records
+    '''
+    pending = sorted(regions)
+    if not pending:
+        return
+    end = max(start + length for start, length, _ in pending)
+    tmp_fnames = {out_fname: os.path.join(os.path.dirname(out_fname), f'.{os.path.basename(out_fname)}.{uuid.uuid4().hex}.tmp') for _,_,out_fname in pending}
+    outputs = {}
+    try:
+        for out_fname, tmp_fname in tmp_fnames.items():
+            outputs[out_fname] = open(tmp_fname, 'xb')
+        offset = 0
+        for chunk in traces.iter_chunks(fname, cloudsuite, chunk_size=chunk_size):
+            for start, length, out_fname in pending:
+                lo, hi = max(start - offset, 0), min(start + length - offset, len(chunk))
+                if lo < hi:
+                    outputs[out_fname].write(np.ascontiguousarray(chunk[lo:hi]).view(np.uint8))
+            offset += len(chunk)
+            if offset >= end:
+                break
+        for wfp in outputs.values():
+            wfp.close()
+        for out_fname, tmp_fname in tmp_fnames.items():
+            os.replace(tmp_fname, out_fname)
+    finally:
+        for wfp in outputs.values():
+            wfp.close()
+        for tmp_fname in tmp_fnames.values():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_fname)
+
+def point_jobs(binary, selection, warmup_instructions, regions_dir, args=tuple()):
+    '''
+    Extract the region of each simulation point that has not already been extracted, and produce a job that simulates it.
+    Regions of chunked traces are not extracted, and their jobs begin simulating at the first instruction of the region instead.
+
+    :param binary: the binary to run
+    :param selection: a selection, as produced by :func:`select_points`
+    :param warmup_instructions: the number of instructions preceding each point to simulate for warmup
+    :param regions_dir: the directory in which to place the extracted regions
+    :returns: a list of tuples of each point and its job
+    '''
+    phase_args = ('--cloudsuite',) if selection['cloudsuite'] else ()
+    if chunked.is_chunked(selection['trace']):
+        result = []
+        for point in selection['points']:
+            start = max(point['start'] - warmup_instructions, 0)
+            start_args = ('--start-instruction', str(start))
+            result.append((point, jobs.Job(binary, (selection['trace'],), point['start'] - start, point['length'], (*start_args, *phase_args, *args))))
+        return result
+
+    os.makedirs(regions_dir, exist_ok=True)
+    itemsize = traces.record_dtype(selection['cloudsuite']).itemsize
+    result = []
+    to_extract = []
+    for point in selection['points']:
+        start = max(point['start'] - warmup_instructions, 0)
+        length = point['start'] + point['length'] - start
+        region = os.path.join(regions_dir, region_name(selection['trace'], start, length))
+        if not os.path.exists(region) or os.path.getsize(region) != length * itemsize:
+            to_extract.append((start, length, region))
+        result.append((point, jobs.Job(binary, (region,), point['start'] - start, point['length'], (*phase_args, *args))))
+    extract_regions(selection['trace'], to_extract, selection['cloudsuite'])
+    return result
+
+def combine(points, outputs):
+    '''
+    Combine the statistics of the simulation points of a trace by their weights.
+
+    Cycles per instruction are averaged by weight, as is every other statistic in the simulation phase of each run, after dividing it by
+    the number of instructions in that run.
+
+    :param points: the simulation points, as in the selection produced by :func:`select_points`
+    :param outputs: the JSON output of the run of each point
+    :returns: a dictionary of the estimated IPC and CPI, and the estimated statistics per instruction of each component
+    '''
+    cpi = 0.0
+    per_instruction = {}
+    total_weight = math.fsum(p['weight'] for p in points)
+    for point, output in zip(points, outputs):
+        weight = point['weight'] / total_weight
+        rows = [r for r in results.flatten_run(output) if r[1] == 'roi']
+        core = next(stats for _, _, kind, _, _, stats in rows if kind == 'core')
+        instructions = core['instructions']
+        cpi += weight * core['cycles'] / instructions
+        for _, _, _, component, _, stats in rows:
+            component_stats = per_instruction.setdefault(component, {})
+            for name, value in stats.items():
+                component_stats[name] = component_stats.get(name, 0.0) + weight * value / instructions
+    return {'cpi': cpi, 'ipc': 1/cpi if cpi > 0 else math.nan, 'per_instruction': per_instruction}
+
+def select_main(args):
+    selection = select_points(args.trace, args.interval, clusters=args.clusters, cloudsuite=args.cloudsuite, seed=args.seed)
+    if args.output:
+        with open(args.output, 'wt') as wfp:
+            json.dump(selection, wfp, indent=2)
+    else:
+        json.dump(selection, sys.stdout, indent=2)
+    return 0
+
+def run_main(args):
+    selections = []
+    for fname in args.selections:
+        with open(fname, 'rt') as rfp:
+            selections.append(json.load(rfp))
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    regions_dir = args.regions_dir or os.path.join(args.results_dir, 'regions')
+    planned = [point_jobs(args.binary, s, args.warmup_instructions, regions_dir, args.args) for s in selections]
+
+    cpus = args.cpus or pool.available_cpus()
+    if args.jobs is not None:
+        cpus = cpus[:max(args.jobs, 1)]
+
+    with database.RunDatabase(args.database or os.path.join(args.results_dir, 'runs.sqlite')) as db:
+        requested = [j for p in planned for _, j in p]
+        db.add(requested)
+        pending_keys = {j.key for j in db.pending(retry_failed=args.retry_failed)}
+        pool.run_all([j for j in requested if j.key in pending_keys], db, args.results_dir, cpus=cpus, timeout=args.timeout)
+        outputs = {r['key']: r['result'] for r in db.results()}
+
+    summary = []
+    for selection, pairs in zip(selections, planned):
+        if all(j.key in outputs for _, j in pairs):
+            estimate = combine([p for p,_ in pairs], [outputs[j.key] for _, j in pairs])
+            print(f'{os.path.basename(selection["trace"])}: IPC {estimate["ipc"]:.4f} from {len(pairs)} points')
+        else:
+            estimate = None
+            print(f'{os.path.basename(selection["trace"])}: some points failed')
+        summary.append({'trace': selection['trace'], 'points': [{**p, 'key': j.key} for p,j in pairs], 'estimate': estimate})
+
+    if args.json:
+        with open(args.json, 'wt') as wfp:
+            json.dump(summary, wfp, indent=2)
+    return 0 if all(s['estimate'] is not None for s in summary) else 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m runner.simpoint', description='Select and simulate representative regions of traces')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    select_parser = subparsers.add_parser('select', help='Select weighted simulation points from a trace')
+    select_parser.add_argument('trace', help='The trace to select from')
+    select_parser.add_argument('--interval', type=int, default=100000000,
+            help='The number of instructions in each interval')
+    select_parser.add_argument('--clusters', type=int, default=10,
+            help='The largest number of simulation points to select')
+    select_parser.add_argument('-c', '--cloudsuite', action='store_true',
+            help='Read the trace using the cloudsuite format')
+    select_parser.add_argument('--seed', type=int, default=0,
+            help='The seed for the random projection and clustering')
+    select_parser.add_argument('-o', '--output',
+            help='The file to write the selection to. If not given, it is written to stdout.')
+    select_parser.set_defaults(func=select_main)
+
+    run_parser = subparsers.add_parser('run', help='Simulate the selected points and combine their statistics')
+    run_parser.add_argument('binary', help='The binary to run. It must simulate a single core.')
+    run_parser.add_argument('selections', nargs='+', help='Files written by the select command')
+    run_parser.add_argument('-w', '--warmup-instructions', type=int, default=0,
+            help='The number of instructions preceding each point to simulate for warmup')
+    run_parser.add_argument('--arg', action='append', default=[], dest='args', metavar='ARG',
+            help='An additional argument to pass to the binary. May be given multiple times.')
+    run_parser.add_argument('-j', '--jobs', type=int,
+            help='Run at most this many jobs at once')
+    run_parser.add_argument('--cpus', type=pool.parse_cpu_list,
+            help='The processors to run on, as a list such as 0-3,8')
+    run_parser.add_argument('--timeout', type=float,
+            help='Stop any job that runs for longer than this many seconds, and mark it as failed')
+    run_parser.add_argument('--results-dir', default='results',
+            help='The directory in which to place the output of each run')
+    run_parser.add_argument('--regions-dir',
+            help='The directory in which to place the extracted regions. Defaults to regions in the results directory.')
+    run_parser.add_argument('--database',
+            help='The database recording the state of each run. Defaults to runs.sqlite in the results directory.')
+    run_parser.add_argument('--retry-failed', action='store_true',
+            help='Run again any runs that failed on an earlier attempt')
+    run_parser.add_argument('--json', metavar='FILE',
+            help='Write the points, their runs, and the combined estimate of each trace to FILE')
+    run_parser.set_defaults(func=run_main)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
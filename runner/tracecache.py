@@ -0,0 +1,112 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+A cache of decompressed traces, shared by all of the runs on a machine.
+
+Each compressed trace is expanded once into an uncompressed file, named for the SHA-256 digest of the compressed contents, so that
+copies of a trace under different names share one entry. The simulator memory-maps uncompressed traces, so concurrent runs over the
+same trace share its pages in the page cache rather than each decompressing it.
+
+Computing the digest requires reading the whole compressed file, so the digest of each file is remembered, keyed by the identity of
+the file (its device, inode, size, and modification time). A file that has not changed is not read again.
+Expansion is guarded by a lock file, so concurrent runners, or concurrent jobs within one runner, expand each trace only once.
+Uncompressed traces are used in place.
+'''
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+import uuid
+
+from . import compression
+
+class TraceCache:
+    '''
+    A directory of decompressed traces.
+
+    :param directory: the directory in which to place the decompressed traces. It is created if it does not exist.
+    :param block_size: the size of the blocks in which traces are read
+    '''
+    def __init__(self, directory, block_size=1<<20):
+        self.directory = os.path.abspath(directory)
+        self.block_size = block_size
+
+    @staticmethod
+    def identity(fname):
+        ''' A string identifying the current version of a file, without reading it. '''
+        stat = os.stat(fname)
+        return f'{stat.st_dev}-{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}'
+
+    def identity_path(self, fname):
+        ''' The file holding the remembered digest of the given file. '''
+        return os.path.join(self.directory, 'identities', hashlib.sha256(self.identity(fname).encode('utf-8')).hexdigest())
+
+    def digest(self, fname):
+        ''' The digest of the contents of the file, which is remembered until the file changes. '''
+        id_fname = self.identity_path(fname)
+        with contextlib.suppress(OSError):
+            with open(id_fname, 'rt') as rfp:
+                return rfp.read().strip()
+
+        sha = hashlib.sha256()
+        with open(fname, 'rb') as rfp:
+            for block in iter(lambda: rfp.read(self.block_size), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        self.write_atomic(id_fname, lambda wfp: wfp.write(digest.encode('utf-8')))
+        return digest
+
+    @staticmethod
+    def write_atomic(fname, func):
+        ''' Write a file by calling the function with a temporary file, then moving it into place. '''
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        tmp_fname = os.path.join(os.path.dirname(fname), f'.{os.path.basename(fname)}.{uuid.uuid4().hex}.tmp')
+        try:
+            with open(tmp_fname, 'xb') as wfp:
+                func(wfp)
+            os.replace(tmp_fname, fname)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_fname)
+
+    def entry_path(self, digest):
+        ''' The decompressed trace for the compressed contents with the given digest. '''
+        return os.path.join(self.directory, f'{digest[:32]}.champsimtrace')
+
+    def path(self, fname):
+        '''
+        Get the path to a decompressed copy of the trace, expanding it into the cache if it is not already present.
+        Uncompressed traces are returned unchanged.
+
+        :param fname: the trace
+        '''
+        if compression.compression(fname) is None:
+            return os.path.abspath(fname)
+
+        entry = self.entry_path(self.digest(fname))
+        if os.path.exists(entry):
+            return entry
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(entry + '.lock', 'wb') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.exists(entry): # Another process may have expanded the trace while this one waited for the lock
+                def expand(wfp):
+                    with compression.open_trace(fname) as rfp:
+                        shutil.copyfileobj(rfp, wfp, self.block_size)
+                self.write_atomic(entry, expand)
+        return entry
@@ -0,0 +1,161 @@
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Access to ChampSim traces as structured NumPy arrays.
+
+The record layouts match ``input_instr`` and ``cloudsuite_instr`` in ``inc/trace_instruction.h``, including the padding the compiler
+inserts, so that a trace is an array of records that may be analyzed with vectorized operations rather than per-record loops.
+Uncompressed traces are memory-mapped, and their records are never copied.
+Traces compressed with gzip, xz, or bzip2 are recognized by the same suffixes as ``get_tracereader()``, and are decompressed in chunks
+of a fixed number of records, so that only one chunk is held in memory at a time.
+'''
+
+import io
+import os
+
+import numpy as np
+
+from . import chunked
+from .compression import compression, open_trace # pylint: disable=unused-import
+
+NUM_INSTR_DESTINATIONS_SPARC = 4
+NUM_INSTR_DESTINATIONS = 2
+NUM_INSTR_SOURCES = 4
+
+def instruction_dtype(num_destinations, asid=False):
+    ''' Produce the structured dtype for a record with the given number of destinations, laid out as a C compiler would. '''
+    fields = [
+        ('ip', np.uint64),
+        ('is_branch', np.uint8),
+        ('branch_taken', np.uint8),
+        ('destination_registers', np.uint8, (num_destinations,)),
+        ('source_registers', np.uint8, (NUM_INSTR_SOURCES,)),
+        ('destination_memory', np.uint64, (num_destinations,)),
+        ('source_memory', np.uint64, (NUM_INSTR_SOURCES,))
+    ]
+    if asid:
+        fields.append(('asid', np.uint8, (2,)))
+    return np.dtype(fields, align=True)
+
+input_instr = instruction_dtype(NUM_INSTR_DESTINATIONS)
+cloudsuite_instr = instruction_dtype(NUM_INSTR_DESTINATIONS_SPARC, asid=True)
+
+def record_dtype(cloudsuite=False):
+    ''' The dtype of the records in a trace, as selected by the ``--cloudsuite`` option of the simulator. '''
+    return cloudsuite_instr if cloudsuite else input_instr
+
+def map_trace(fname, cloudsuite=False):
+    '''
+    Memory-map an uncompressed trace as a read-only array of records.
+    A partial record at the end of the file is ignored, as it is by the simulator.
+
+    :param fname: the trace file, which must not be compressed
+    :param cloudsuite: whether the trace holds CloudSuite records
+    '''
+    if compression(fname) is not None or chunked.is_chunked(fname):
+        raise ValueError(f'{fname} is compressed and cannot be memory-mapped')
+    dtype = record_dtype(cloudsuite)
+    count = os.path.getsize(fname) // dtype.itemsize
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(fname, dtype=dtype, mode='r', shape=(count,))
+
+def read_records(rfp, count, dtype):
+    '''
+    Read up to the given number of whole records from a binary file, directly into a new array.
+    The array is shorter than requested only at the end of the file. A trailing partial record is discarded.
+    '''
+    result = np.empty(count, dtype=dtype)
+    view = memoryview(result).cast('B')
+    filled = 0
+    while filled < len(view):
+        nbytes = rfp.readinto(view[filled:])
+        if not nbytes:
+            break
+        filled += nbytes
+    return result[:filled // dtype.itemsize]
+
+def iter_chunks(fname, cloudsuite=False, chunk_size=1<<20):
+    '''
+    Yield the records of a trace as a sequence of arrays of at most ``chunk_size`` records each.
+    Chunks of an uncompressed trace are views of a memory map. Chunks of a compressed trace are decompressed into a fresh array,
+    so earlier chunks remain valid after later ones are read.
+
+    :param fname: the trace file
+    :param cloudsuite: whether the trace holds CloudSuite records
+    :param chunk_size: the largest number of records in each chunk
+    '''
+    if chunked.is_chunked(fname):
+        yield from iter_chunked(fname, cloudsuite, chunk_size)
+        return
+
+    if compression(fname) is None:
+        records = map_trace(fname, cloudsuite)
+        yield from (records[i:i+chunk_size] for i in range(0, len(records), chunk_size))
+        return
+
+    dtype = record_dtype(cloudsuite)
+    with open_trace(fname) as rfp:
+        while True:
+            chunk = read_records(rfp, chunk_size, dtype)
+            if len(chunk) > 0:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+
+def iter_chunked(fname, cloudsuite=False, chunk_size=1<<20, start=0):
+    '''
+    Yield the records of a chunked trace, beginning at the given record, as a sequence of arrays of at most ``chunk_size`` records each.
+    Only the container's chunks that hold records at or after the start are decompressed.
+
+    :param fname: the chunked trace file
+    :param cloudsuite: whether the trace holds CloudSuite records
+    :param chunk_size: the largest number of records in each array
+    :param start: the index of the first record to produce
+    '''
+    dtype = record_dtype(cloudsuite)
+    with chunked.ChunkedTrace(fname) as trace:
+        if trace.record_size != dtype.itemsize:
+            raise ValueError(f'{fname} holds records of {trace.record_size} bytes, but {dtype.itemsize} were expected')
+        for data in trace.iter_chunks(start):
+            records = np.frombuffer(data, dtype=dtype)
+            yield from (records[i:i+chunk_size] for i in range(0, len(records), chunk_size))
+
+def load_trace(fname, cloudsuite=False):
+    '''
+    Get all of the records in a trace as a single array.
+    Uncompressed traces are memory-mapped. Compressed traces are decompressed into memory.
+    '''
+    if compression(fname) is None and not chunked.is_chunked(fname):
+        return map_trace(fname, cloudsuite)
+    return np.concatenate(list(iter_chunks(fname, cloudsuite)) or [np.empty(0, dtype=record_dtype(cloudsuite))])
+
+def write_trace(fname, records):
+    ''' Write an array of records to a trace, compressing it as its name indicates. '''
+    if chunked.is_chunked(fname):
+        chunked.write(io.BytesIO(np.ascontiguousarray(records).view(np.uint8)), fname, records.dtype.itemsize)
+        return
+    with open_trace(fname, 'wb') as wfp:
+        wfp.write(np.ascontiguousarray(records).view(np.uint8))
+
+def branch_targets(records):
+    '''
+    The target of each record, as the simulator computes it: the address of the following record if the record is a taken branch,
+    and 0 otherwise. The target of the final record is unknown, and is 0.
+    '''
+    taken = (records['is_branch'] != 0) & (records['branch_taken'] != 0)
+    targets = np.zeros(len(records), dtype=np.uint64)
+    targets[:-1] = np.where(taken[:-1], records['ip'][1:], 0)
+    return targets
@@ -0,0 +1,139 @@
+/*
+ *    Copyright 2023 The ChampSim Contributors
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+
+#include "chunked_istream.h"
+
+#include <algorithm>
+#include <cstring>
+#include <limits>
+#include <lzma.h>
+#include <stdexcept>
+#include <fmt/core.h>
+
+namespace
+{
+// The fields of the file are little-endian, as is every host ChampSim runs on, so they are copied directly.
+template <typename T>
+T take(const char*& ptr)
+{
+  T retval;
+  std::memcpy(&retval, ptr, sizeof(T));
+  ptr += sizeof(T);
+  return retval;
+}
+} // namespace
+
+champsim::chunked_istream::chunked_istream(const std::string& fname) : file_(fname, std::ios::binary)
+{
+  std::array<char, std::size(magic) + 2 * sizeof(uint32_t) + 4 * sizeof(uint64_t)> header{};
+  file_.read(std::data(header), std::size(header));
+  if (file_.gcount() != static_cast<std::streamsize>(std::size(header)) || !std::equal(std::begin(magic), std::end(magic), std::begin(header))) {
+    throw std::runtime_error{fmt::format("{} is not a chunked trace", fname)};
+  }
+
+  const char* ptr = std::next(std::data(header), std::size(magic));
+  auto file_version = take<uint32_t>(ptr);
+  record_size_ = take<uint32_t>(ptr);
+  records_per_chunk_ = take<uint64_t>(ptr);
+  records_ = take<uint64_t>(ptr);
+  auto chunk_count = take<uint64_t>(ptr);
+  auto index_offset = take<uint64_t>(ptr);
+  if (file_version != version) {
+    throw std::runtime_error{fmt::format("{} is a chunked trace of version {}, but only version {} is supported", fname, file_version, version)};
+  }
+  if (record_size_ == 0 || records_per_chunk_ == 0) {
+    throw std::runtime_error{fmt::format("{} has an invalid header", fname)};
+  }
+
+  std::vector<char> index(chunk_count * 2 * sizeof(uint64_t));
+  file_.seekg(static_cast<std::streamoff>(index_offset));
+  file_.read(std::data(index), static_cast<std::streamsize>(std::size(index)));
+  if (file_.gcount() != static_cast<std::streamsize>(std::size(index))) {
+    throw std::runtime_error{fmt::format("The index of {} is truncated", fname)};
+  }
+  ptr = std::data(index);
+  for (uint64_t i = 0; i < chunk_count; ++i) {
+    auto offset = take<uint64_t>(ptr);
+    auto size = take<uint64_t>(ptr);
+    index_.push_back({offset, size});
+  }
+}
+
+void champsim::chunked_istream::load_chunk(std::size_t i)
+{
+  auto [offset, size] = index_.at(i);
+  compressed_.resize(size);
+  file_.clear();
+  file_.seekg(static_cast<std::streamoff>(offset));
+  file_.read(reinterpret_cast<char*>(std::data(compressed_)), static_cast<std::streamsize>(size)); // NOLINT(cppcoreguidelines-pro-type-reinterpret-cast)
+
+  auto expected = std::min(records_per_chunk_, records_ - i * records_per_chunk_) * record_size_;
+  chunk_.resize(expected);
+
+  uint64_t memlimit = std::numeric_limits<uint64_t>::max();
+  std::size_t in_pos = 0;
+  std::size_t out_pos = 0;
+  auto ret = ::lzma_stream_buffer_decode(&memlimit, 0, nullptr, std::data(compressed_), &in_pos, static_cast<std::size_t>(file_.gcount()),
+                                         reinterpret_cast<uint8_t*>(std::data(chunk_)), &out_pos, std::size(chunk_)); // NOLINT(cppcoreguidelines-pro-type-reinterpret-cast)
+  if (ret != LZMA_OK || out_pos != expected) {
+    throw std::runtime_error{fmt::format("Chunk {} of the trace is corrupt", i)};
+  }
+
+  next_chunk_ = i + 1;
+  chunk_position_ = 0;
+}
+
+champsim::chunked_istream& champsim::chunked_istream::read(char* dest, std::streamsize count)
+{
+  auto requested = static_cast<std::size_t>(std::max<std::streamsize>(count, 0));
+  std::size_t copied = 0;
+  while (copied < requested) {
+    if (chunk_position_ == std::size(chunk_)) {
+      if (next_chunk_ == std::size(index_)) {
+        break;
+      }
+      load_chunk(next_chunk_);
+    }
+
+    auto available = std::min(requested - copied, std::size(chunk_) - chunk_position_);
+    std::memcpy(std::next(dest, static_cast<std::ptrdiff_t>(copied)), std::next(std::data(chunk_), static_cast<std::ptrdiff_t>(chunk_position_)), available);
+    chunk_position_ += available;
+    copied += available;
+  }
+
+  gcount_ = static_cast<std::streamsize>(copied);
+  eof_ = eof_ || (copied < requested);
+  return *this;
+}
+
+champsim::chunked_istream& champsim::chunked_istream::seekg(std::streamoff pos)
+{
+  auto target = static_cast<uint64_t>(std::max<std::streamoff>(pos, 0));
+  eof_ = (target >= size());
+  if (eof_) {
+    chunk_.clear();
+    chunk_position_ = 0;
+    next_chunk_ = std::size(index_);
+    return *this;
+  }
+
+  if (auto i = static_cast<std::size_t>(target / chunk_bytes()); i + 1 != next_chunk_ || std::empty(chunk_)) {
+    load_chunk(i);
+  }
+  chunk_position_ = static_cast<std::size_t>(target % chunk_bytes());
+  return *this;
+}
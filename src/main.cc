@@ -60,9 +60,11 @@ int main(int argc, char** argv) // NOLINT(bugprone-exception-escape)
 
   bool knob_cloudsuite{false};
   bool no_repeat_traces{false};
+  bool async_traces{false};
   long long warmup_instructions = 0;
   long long estimated_instructions = 0;
   long long sim_points = 0;
+  uint64_t start_instruction = 0;
   long long simulation_instructions = std::numeric_limits<long long>::max();
   std::string json_file_name;
   std::vector<std::string> trace_names;
@@ -76,6 +78,10 @@ int main(int argc, char** argv) // NOLINT(bugprone-exception-escape)
   app.add_flag("-c,--cloudsuite", knob_cloudsuite, "Read all traces using the cloudsuite format");
   app.add_flag("--hide-heartbeat", set_heartbeat_callback, "Hide the heartbeat output");
   app.add_flag("--no-repeat-traces", no_repeat_traces, "Disable trace repetition when the end is reached");
+  app.add_flag("--async-traces", async_traces, "Decompress and decode each trace on a background thread, ahead of the simulation");
+  app.add_option("--start-instruction", start_instruction,
+                 "Begin reading each trace at the instruction with this index. Chunked traces (.ctrace) seek to it directly, and other compressed "
+                 "traces are read up to it.");
   auto estimated_instr_option = app.add_option("-e,--estimated-instructions", estimated_instructions,
                                                "The estimated number of instructions in the detailed phase. If not specified, run to the end of the trace.");
   auto* sim_points_option = app.add_option("-p,--sim-points", sim_points, "The number of simulation points in the detailed phase. If not specified, no simulation points are used.");
@@ -117,7 +123,9 @@ int main(int argc, char** argv) // NOLINT(bugprone-exception-escape)
   std::transform(
       std::begin(trace_names), std::end(trace_names), std::back_inserter(traces),
       // [knob_cloudsuite, repeat = simulation_given, i = uint8_t(0)](auto name) mutable { return get_tracereader(name, i++, knob_cloudsuite, repeat); });
-      [knob_cloudsuite, repeat = (simulation_given && !no_repeat_traces), i = uint8_t(0)](auto name) mutable { return get_tracereader(name, i++, knob_cloudsuite, repeat); });
+      [knob_cloudsuite, repeat = (simulation_given && !no_repeat_traces), async_traces, start_instruction, i = uint8_t(0)](auto name) mutable {
+        return get_tracereader(name, i++, knob_cloudsuite, repeat, async_traces, start_instruction);
+      });
 
   std::vector<champsim::phase_info> phases{
       // {champsim::phase_info{"Warmup", true, warmup_instructions, std::vector<std::size_t>(std::size(trace_names), 0), trace_names},
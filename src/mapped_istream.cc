@@ -0,0 +1,78 @@
+/*
+ *    Copyright 2023 The ChampSim Contributors
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#include "mapped_istream.h"
+
+#include <algorithm>
+#include <cstring>
+#include <stdexcept>
+#include <fcntl.h>
+#include <fmt/core.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+void champsim::mapped_istream::unmapper::operator()(char* addr) const { ::munmap(addr, length); }
+
+champsim::mapped_istream::mapped_istream(const std::string& fname)
+{
+  // Opening a pipe would block until it has a writer, and closing it again could lose its contents, so only regular files are opened
+  struct stat path_info {};
+  if (::stat(fname.c_str(), &path_info) != 0 || !S_ISREG(path_info.st_mode)) {
+    return;
+  }
+
+  int fd = ::open(fname.c_str(), O_RDONLY); // NOLINT(cppcoreguidelines-pro-type-vararg)
+  if (fd < 0) {
+    throw std::runtime_error{fmt::format("Could not open {}", fname)};
+  }
+
+  struct stat info {};
+  if (::fstat(fd, &info) == 0 && S_ISREG(info.st_mode) && info.st_size > 0) {
+    auto length = static_cast<std::size_t>(info.st_size);
+    void* addr = ::mmap(nullptr, length, PROT_READ, MAP_SHARED, fd, 0);
+    if (addr == MAP_FAILED) {
+      ::close(fd);
+      throw std::runtime_error{fmt::format("Could not map {}", fname)};
+    }
+    ::madvise(addr, length, MADV_SEQUENTIAL);
+    data_ = std::unique_ptr<char, unmapper>{static_cast<char*>(addr), unmapper{length}};
+    size_ = length;
+  }
+
+  // The mapping remains valid after the descriptor is closed
+  ::close(fd);
+}
+
+champsim::mapped_istream& champsim::mapped_istream::read(char* dest, std::streamsize count)
+{
+  auto requested = static_cast<std::size_t>(std::max<std::streamsize>(count, 0));
+  auto available = std::min(requested, size_ - position_);
+  if (available > 0) {
+    std::memcpy(dest, std::next(data_.get(), static_cast<std::ptrdiff_t>(position_)), available);
+  }
+  position_ += available;
+  gcount_ = static_cast<std::streamsize>(available);
+  eof_ = eof_ || (available < requested);
+  return *this;
+}
+
+champsim::mapped_istream& champsim::mapped_istream::seekg(std::streamoff pos)
+{
+  position_ = std::min(static_cast<std::size_t>(std::max<std::streamoff>(pos, 0)), size_);
+  eof_ = (position_ == size_);
+  return *this;
+}
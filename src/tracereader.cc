@@ -16,10 +16,17 @@
 
 #include "tracereader.h"
 
+#include <filesystem>
 #include <fstream>
+#include <stdexcept>
 #include <string>
+#include <fmt/core.h>
+#include <unistd.h>
 
+#include "async_tracereader.h"
+#include "chunked_istream.h"
 #include "inf_stream.h"
+#include "mapped_istream.h"
 #include "repeatable.h"
 
 namespace champsim
@@ -32,41 +39,65 @@ ooo_model_instr apply_branch_target(ooo_model_instr branch, const ooo_model_inst
   return branch;
 }
 
+template <typename R>
+champsim::tracereader make_tracereader(std::string fname, uint8_t cpu, bool async, uint64_t start)
+{
+  if (async) {
+    return champsim::tracereader{champsim::async_tracereader<R>{R(cpu, fname, start)}};
+  }
+  return champsim::tracereader{R(cpu, fname, start)};
+}
+
 template <template <class, class> typename R, typename T>
-champsim::tracereader get_tracereader_for_type(std::string fname, uint8_t cpu)
+champsim::tracereader get_tracereader_for_type(std::string fname, uint8_t cpu, bool async, uint64_t start)
 {
+  if (bool is_chunked = (std::size(fname) >= 6 && fname.substr(std::size(fname) - 6) == "ctrace"); is_chunked) {
+    if (auto record_size = champsim::chunked_istream{fname}.record_size(); record_size != sizeof(T)) {
+      throw std::invalid_argument{fmt::format("{} holds records of {} bytes, but {} were expected", fname, record_size, sizeof(T))};
+    }
+    return make_tracereader<R<T, champsim::chunked_istream>>(fname, cpu, async, start);
+  }
+
   if (bool is_gzip_compressed = (fname.substr(std::size(fname) - 2) == "gz"); is_gzip_compressed) {
-    return champsim::tracereader{R<T, champsim::inf_istream<champsim::decomp_tags::gzip_tag_t<>>>(cpu, fname)};
+    return make_tracereader<R<T, champsim::inf_istream<champsim::decomp_tags::gzip_tag_t<>>>>(fname, cpu, async, start);
   }
 
   if (bool is_lzma_compressed = (fname.substr(std::size(fname) - 2) == "xz"); is_lzma_compressed) {
-    return champsim::tracereader{R<T, champsim::inf_istream<champsim::decomp_tags::lzma_tag_t<>>>(cpu, fname)};
+    return make_tracereader<R<T, champsim::inf_istream<champsim::decomp_tags::lzma_tag_t<>>>>(fname, cpu, async, start);
   }
 
   if (bool is_bzip2_compressed = (fname.substr(std::size(fname) - 3) == "bz2"); is_bzip2_compressed) {
-    return champsim::tracereader{R<T, champsim::inf_istream<champsim::decomp_tags::bzip2_tag_t>>(cpu, fname)};
+    return make_tracereader<R<T, champsim::inf_istream<champsim::decomp_tags::bzip2_tag_t>>>(fname, cpu, async, start);
+  }
+
+  // Pipes and devices cannot be mapped, and are read as a stream
+  if (std::error_code ec; std::filesystem::is_regular_file(fname, ec)) {
+    return make_tracereader<R<T, champsim::mapped_istream>>(fname, cpu, async, start);
   }
 
-  return champsim::tracereader{R<T, std::ifstream>(cpu, fname)};
+  if (::access(fname.c_str(), R_OK) != 0) {
+    throw std::runtime_error{fmt::format("Could not open trace {}", fname)};
+  }
+  return make_tracereader<R<T, std::ifstream>>(fname, cpu, async, start);
 }
 } // namespace champsim
 
 template <typename T, typename S>
-using repeatable_reader_t = champsim::repeatable<champsim::bulk_tracereader<T, S>, uint8_t, std::string>;
+using repeatable_reader_t = champsim::repeatable<champsim::bulk_tracereader<T, S>, uint8_t, std::string, uint64_t>;
 
-champsim::tracereader get_tracereader(const std::string& fname, uint8_t cpu, bool is_cloudsuite, bool repeat)
+champsim::tracereader get_tracereader(const std::string& fname, uint8_t cpu, bool is_cloudsuite, bool repeat, bool async, uint64_t start_instruction)
 {
   if (is_cloudsuite && repeat) {
-    return champsim::get_tracereader_for_type<repeatable_reader_t, cloudsuite_instr>(fname, cpu);
+    return champsim::get_tracereader_for_type<repeatable_reader_t, cloudsuite_instr>(fname, cpu, async, start_instruction);
   }
 
   if (is_cloudsuite && !repeat) {
-    return champsim::get_tracereader_for_type<champsim::bulk_tracereader, cloudsuite_instr>(fname, cpu);
+    return champsim::get_tracereader_for_type<champsim::bulk_tracereader, cloudsuite_instr>(fname, cpu, async, start_instruction);
   }
 
   if (!is_cloudsuite && repeat) {
-    return champsim::get_tracereader_for_type<repeatable_reader_t, input_instr>(fname, cpu);
+    return champsim::get_tracereader_for_type<repeatable_reader_t, input_instr>(fname, cpu, async, start_instruction);
   }
 
-  return champsim::get_tracereader_for_type<champsim::bulk_tracereader, input_instr>(fname, cpu);
+  return champsim::get_tracereader_for_type<champsim::bulk_tracereader, input_instr>(fname, cpu, async, start_instruction);
 }
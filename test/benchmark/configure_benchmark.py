@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+#    Copyright 2023 The ChampSim Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Scaling benchmarks for the configuration step.
+
+Each family of benchmarks generates synthetic configurations of increasing size and runs them through the configuration
+pipeline, recording the wall time of each stage and the peak memory allocated by Python.
+The growth of each measurement with size is summarized as an exponent, the slope of a least-squares fit in log-log space,
+so that a stage which becomes superlinear is caught regardless of the speed of the machine running the benchmark.
+
+Run from the ChampSim root with ``make benchmark``, or with ``PYTHONPATH=. python3 test/benchmark/configure_benchmark.py``.
+'''
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import config.filewrite
+import config.parse
+import config.sweep
+import config.timing
+
+def cores_case(size, workdir):
+    ''' A system with the given number of cores, each with the default private hierarchy. '''
+    return lambda: run_pipeline(({'executable_name': f'cores{size}', 'num_cores': size},), workdir)
+
+def caches_case(size, workdir):
+    ''' A four-core system with the given number of shared cache levels between the L2C and the LLC. '''
+    queues = {'rq_size': 32, 'wq_size': 32, 'pq_size': 32} # Default queue sizes are only inferred for the first three levels
+    caches = [{'name': f'L3_{i}', 'lower_level': (f'L3_{i+1}' if i+1 < size else 'LLC'), 'sets': 1024, 'ways': 8, **queues} for i in range(size)]
+    cfg = {'executable_name': f'caches{size}', 'num_cores': 4, 'L2C': {'lower_level': 'L3_0'}, 'LLC': queues, 'caches': caches}
+    return lambda: run_pipeline((cfg,), workdir)
+
+def modules_case(size, workdir):
+    ''' A system configured against the given number of module directories, each holding several prefetchers, all of which are compiled. '''
+    module_dirs = [os.path.join(workdir, 'modules', f'dir{i}') for i in range(size)]
+    for i, module_dir in enumerate(module_dirs):
+        for j in range(4):
+            path = os.path.join(module_dir, 'prefetcher', f'pref{i}_{j}')
+            os.makedirs(path, exist_ok=True)
+            for fname in (f'pref{i}_{j}.h', f'pref{i}_{j}.cc'):
+                with open(os.path.join(path, fname), 'wt') as wfp:
+                    wfp.write('\n')
+
+    cfg = {'executable_name': f'modules{size}', 'L2C': {'prefetcher': f'pref{size-1}_0'}}
+    return lambda: run_pipeline((cfg,), workdir, module_dir=module_dirs, compile_all_modules=True)
+
+def sweep_case(size, workdir): # pylint: disable=unused-argument
+    ''' The selection of all combinations of two swept configuration files, filtered by a constraint, with the given number of combinations. '''
+    width = math.isqrt(size)
+    lhs = config.sweep.expand([{'name': 'lhs', 'L2C': {'sets': {'range': [1, width+1]}}}])
+    rhs = config.sweep.expand([{'name': 'rhs', 'ooo_cpu': [{'rob_size': {'range': [1, (size // width)+1]}}]}])
+    predicate = config.sweep.expression_predicate('config["L2C"]["sets"] % 2 == 0')
+    return lambda: sum(1 for _ in config.sweep.select((lhs, rhs, ({},)), predicates=(predicate,)))
+
+def run_pipeline(configs, workdir, **kwargs):
+    ''' Parse the configurations and write the generated files, as config.sh would. '''
+    parsed_config = config.parse.parse_config(*configs, **kwargs)
+    fragment = config.filewrite.Fragment.from_config(parsed_config,
+            bindir_name=os.path.join(workdir, 'bin'), objdir_name=os.path.join(workdir, 'obj'), makedir_name=workdir)
+    fragment.write()
+
+families = {
+    'cores': (cores_case, (1, 4, 16, 64, 256, 1024)),
+    'caches': (caches_case, (1, 2, 4, 8, 16, 32, 64)),
+    'modules': (modules_case, (1, 4, 16, 64, 256)),
+    'sweep': (sweep_case, (100, 400, 1600, 10000))
+}
+
+def measure(case, repeat):
+    '''
+    Run the case several times, returning the median of the wall times and of each stage timing,
+    and the peak memory of a separate run under tracemalloc.
+    The median is used so that one disturbed repetition does not move the scaling fit.
+    '''
+    profilers = []
+    for _ in range(repeat):
+        with config.timing.Profiler() as profiler:
+            case()
+        profilers.append(profiler)
+
+    tracemalloc.start()
+    try:
+        case()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    stages = {k for p in profilers for k in p.record.data}
+    return {
+        'seconds': statistics.median(p.elapsed for p in profilers),
+        'peak_bytes': peak,
+        'stages': {k: statistics.median(p.record.data.get(k, {}).get('seconds', 0.0) for p in profilers) for k in sorted(stages)}
+    }
+
+def scaling_exponent(points, minimum=0.0):
+    '''
+    The slope of the least-squares line through the points in log-log space.
+    Points with a measurement below the minimum are too noisy to contribute and are discarded.
+
+    :param points: a sequence of tuples of (size, measurement)
+    :param minimum: the smallest measurement to consider
+    :returns: the exponent, or None if fewer than two points remain
+    '''
+    logs = [(math.log(s), math.log(m)) for s,m in points if m > minimum and m > 0]
+    if len(logs) < 2:
+        return None
+    mean_x = sum(x for x,_ in logs) / len(logs)
+    mean_y = sum(y for _,y in logs) / len(logs)
+    denom = sum((x - mean_x)**2 for x,_ in logs)
+    if denom == 0:
+        return None
+    return sum((x - mean_x)*(y - mean_y) for x,y in logs) / denom
+
+def measurements(cases):
+    ''' Rearrange the cases into a dictionary of {measurement: {size: value}}, covering the total time, the peak memory, and each stage. '''
+    result = {'seconds': {}, 'peak_bytes': {}}
+    for case in cases:
+        result['seconds'][case['size']] = case['seconds']
+        result['peak_bytes'][case['size']] = case['peak_bytes']
+        for stage, seconds in case['stages'].items():
+            result.setdefault(f'stage:{stage}', {})[case['size']] = seconds
+    return result
+
+def minimum_for(key, min_seconds):
+    ''' The smallest value of the given measurement that is large enough to fit. '''
+    return 0 if key == 'peak_bytes' else min_seconds
+
+def compare(results, baseline, tolerance, min_seconds, min_points=3):
+    '''
+    Compare the scaling exponents of the results against those of the baseline.
+
+    Each exponent is fit over only the sizes at which both runs measured a value large enough to be reliable,
+    so a quick run may be compared against a full baseline, and noise in very short stages is not reported.
+
+    :returns: a list of strings describing each regression
+    '''
+    regressions = []
+    for family, cases in results.items():
+        if family not in baseline:
+            continue
+        current = measurements(cases)
+        previous = measurements(baseline[family])
+        for key, values in current.items():
+            floor = minimum_for(key, min_seconds)
+            sizes = [s for s,v in values.items() if v > floor and previous.get(key, {}).get(s, 0) > floor]
+            if len(sizes) < min_points:
+                continue
+            value = scaling_exponent([(s, values[s]) for s in sizes])
+            base_value = scaling_exponent([(s, previous[key][s]) for s in sizes])
+            if value is not None and base_value is not None and value > base_value + tolerance:
+                regressions.append(f'{family} {key}: exponent {value:.2f} exceeds baseline {base_value:.2f}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how the configuration step scales with the size of the configuration')
+    parser.add_argument('--family', action='append', choices=families.keys(),
+            help='Run only the given family of benchmarks. May be given multiple times.')
+    parser.add_argument('--max-size', type=int,
+            help='Skip cases larger than this size, for a faster run')
+    parser.add_argument('--repeat', type=int, default=5,
+            help='Time each case this many times and keep the median')
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json'),
+            help='The stored baseline to compare against')
+    parser.add_argument('--update-baseline', action='store_true',
+            help='Replace the baseline with the results of this run instead of comparing against it')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+            help='The amount by which a scaling exponent may exceed the baseline before it is reported as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.02,
+            help='Timings shorter than this are excluded from the scaling fit')
+    parser.add_argument('--output',
+            help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for family in (args.family or families.keys()):
+            make_case, sizes = families[family]
+            results[family] = []
+            for size in sizes:
+                if args.max_size is not None and size > args.max_size:
+                    continue
+                case = make_case(size, os.path.join(workdir, f'{family}{size}'))
+                result = {'size': size, **measure(case, args.repeat)}
+                results[family].append(result)
+                print(f'{family:>8} {size:>6} {result["seconds"]:>10.4f} s {result["peak_bytes"]/2**20:>10.2f} MiB', flush=True)
+
+            exps = {k: scaling_exponent(v.items(), minimum_for(k, args.min_seconds)) for k,v in measurements(results[family]).items()}
+            if exps['seconds'] is not None and exps['peak_bytes'] is not None:
+                print(f'{family:>8} scaling: time n^{exps["seconds"]:.2f}, memory n^{exps["peak_bytes"]:.2f}', flush=True)
+
+    if args.output:
+        with open(args.output, 'wt') as wfp:
+            json.dump(results, wfp, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'rt') as rfp:
+                baseline = json.load(rfp)
+        with open(args.baseline, 'wt') as wfp:
+            json.dump({**baseline, **results}, wfp, indent=2)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline found at', args.baseline)
+        return 0
+
+    with open(args.baseline, 'rt') as rfp:
+        baseline = json.load(rfp)
+
+    regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+    for regression in regressions:
+        print('REGRESSION:', regression)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    status = main()
+    print(f'Finished in {time.perf_counter() - start:.1f} s')
+    sys.exit(status)
@@ -0,0 +1,98 @@
+#include <catch.hpp>
+
+#include <cstring>
+#include <sstream>
+#include <stdexcept>
+
+#include "async_tracereader.h"
+#include "tracereader.h"
+
+namespace {
+  std::string make_trace(std::size_t count)
+  {
+    std::string retval(count * sizeof(input_instr), '\0');
+    for (std::size_t i = 0; i < count; ++i) {
+      input_instr instr{};
+      instr.ip = 0x1000 + 4*i;
+      instr.is_branch = (i % 3 == 0);
+      instr.branch_taken = (i % 2 == 0);
+      std::memcpy(std::data(retval) + i*sizeof(input_instr), &instr, sizeof(input_instr));
+    }
+    return retval;
+  }
+
+  using stream_reader = champsim::bulk_tracereader<input_instr, std::istringstream>;
+
+  struct endless_reader {
+    ooo_model_instr operator()() { return ooo_model_instr{0, input_instr{}}; }
+    bool eof() const { return false; }
+  };
+
+  struct throwing_reader {
+    int remaining = 3;
+    ooo_model_instr operator()()
+    {
+      if (remaining-- == 0) {
+        throw std::runtime_error{"bad trace"};
+      }
+      return ooo_model_instr{0, input_instr{}};
+    }
+    bool eof() const { return false; }
+  };
+}
+
+TEST_CASE("A ring buffer returns values in the order they were pushed") {
+  champsim::spsc_ring<int> uut{2};
+  REQUIRE(uut.empty());
+  REQUIRE(uut.try_push(1));
+  REQUIRE(uut.try_push(2));
+  REQUIRE_FALSE(uut.try_push(3));
+  REQUIRE(uut.try_pop() == 1);
+  REQUIRE(uut.try_push(3));
+  REQUIRE(uut.try_pop() == 2);
+  REQUIRE(uut.try_pop() == 3);
+  REQUIRE_FALSE(uut.try_pop().has_value());
+  REQUIRE(uut.empty());
+}
+
+TEST_CASE("An asynchronous tracereader produces the same instructions as the reader it wraps") {
+  auto capacity = GENERATE(as<std::size_t>{}, 1, 7, 1 << 16);
+  const auto trace = make_trace(1000);
+
+  stream_reader expected{0, std::istringstream{trace}};
+  champsim::async_tracereader<stream_reader> uut{stream_reader{0, std::istringstream{trace}}, capacity};
+
+  while (!expected.eof()) {
+    REQUIRE_FALSE(uut.eof());
+    auto expected_instr = expected();
+    auto instr = uut();
+    REQUIRE(instr.ip == expected_instr.ip);
+    REQUIRE(instr.is_branch == expected_instr.is_branch);
+    REQUIRE(instr.branch_target == expected_instr.branch_target);
+  }
+  REQUIRE(uut.eof());
+}
+
+TEST_CASE("An asynchronous tracereader can be wrapped in a tracereader") {
+  const auto trace = make_trace(10);
+  champsim::tracereader uut{champsim::async_tracereader<stream_reader>{stream_reader{0, std::istringstream{trace}}}};
+
+  auto first = uut();
+  auto second = uut();
+  REQUIRE(first.ip == champsim::address{0x1000});
+  REQUIRE(second.instr_id == first.instr_id + 1);
+}
+
+TEST_CASE("An asynchronous tracereader may be destroyed before its trace ends") {
+  champsim::async_tracereader<::endless_reader> uut{::endless_reader{}, 4};
+  (void)uut();
+  REQUIRE_FALSE(uut.eof());
+}
+
+TEST_CASE("An asynchronous tracereader rethrows exceptions from the reader it wraps") {
+  champsim::async_tracereader<::throwing_reader> uut{::throwing_reader{}};
+  for (int i = 0; i < 3; ++i) {
+    (void)uut();
+  }
+  REQUIRE_THROWS_AS(uut(), std::runtime_error);
+}
@@ -0,0 +1,115 @@
+#include <catch.hpp>
+
+#include <cstdio>
+#include <filesystem>
+#include <fstream>
+#include <thread>
+#include <vector>
+#include <sys/stat.h>
+
+#include "mapped_istream.h"
+#include "tracereader.h"
+
+namespace {
+  struct temporary_file {
+    std::filesystem::path path;
+
+    temporary_file(std::string_view name, const std::string& contents) : path(std::filesystem::temp_directory_path() / name)
+    {
+      std::ofstream{path, std::ios::binary} << contents;
+    }
+    ~temporary_file() { std::filesystem::remove(path); }
+  };
+
+  std::string make_trace(std::size_t count)
+  {
+    std::string retval(count * sizeof(input_instr), '\0');
+    for (std::size_t i = 0; i < count; ++i) {
+      input_instr instr{};
+      instr.ip = 0x1000 + 4*i;
+      instr.is_branch = (i % 3 == 0);
+      instr.branch_taken = (i % 2 == 0);
+      std::memcpy(std::data(retval) + i*sizeof(input_instr), &instr, sizeof(input_instr));
+    }
+    return retval;
+  }
+}
+
+TEST_CASE("A mapped_istream reads the same bytes as an ifstream") {
+  auto read_size = GENERATE(as<std::streamsize>{}, 1, 7, 10, 1000);
+  ::temporary_file file{"champsim-087-mapped-istream", "0123456789"};
+
+  std::ifstream expected{file.path};
+  champsim::mapped_istream uut{file.path.string()};
+  REQUIRE(uut.size() == 10);
+
+  std::vector<char> expected_buf(static_cast<std::size_t>(read_size));
+  std::vector<char> buf(static_cast<std::size_t>(read_size));
+  do {
+    expected.read(std::data(expected_buf), read_size);
+    uut.read(std::data(buf), read_size);
+    REQUIRE(uut.gcount() == expected.gcount());
+    REQUIRE(uut.eof() == expected.eof());
+    REQUIRE(std::equal(std::begin(buf), std::next(std::begin(buf), uut.gcount()), std::begin(expected_buf)));
+  } while (!expected.eof());
+}
+
+TEST_CASE("A mapped_istream over a missing or empty file is empty") {
+  ::temporary_file file{"champsim-087-mapped-istream-empty", ""};
+  auto fname = GENERATE(as<std::string>{}, "champsim-087-does-not-exist", "");
+
+  champsim::mapped_istream uut{fname.empty() ? file.path.string() : fname};
+  REQUIRE_FALSE(uut.is_mapped());
+  char c{};
+  uut.read(&c, 1);
+  REQUIRE(uut.gcount() == 0);
+  REQUIRE(uut.eof());
+}
+
+TEST_CASE("A tracereader over a mapped_istream produces the same instructions as over an ifstream") {
+  ::temporary_file file{"champsim-087-mapped-trace", ::make_trace(300)};
+
+  champsim::bulk_tracereader<input_instr, std::ifstream> expected{0, file.path.string()};
+  champsim::bulk_tracereader<input_instr, champsim::mapped_istream> uut{0, file.path.string()};
+  while (!expected.eof()) {
+    REQUIRE_FALSE(uut.eof());
+    auto expected_instr = expected();
+    auto instr = uut();
+    REQUIRE(instr.ip == expected_instr.ip);
+    REQUIRE(instr.branch_target == expected_instr.branch_target);
+  }
+  REQUIRE(uut.eof());
+}
+
+TEST_CASE("A tracereader over an empty trace throws rather than reading past the end") {
+  ::temporary_file file{"champsim-087-empty-trace", ""};
+
+  auto uut = get_tracereader(file.path.string(), 0, false, false);
+  REQUIRE_THROWS_AS(uut(), std::out_of_range);
+}
+
+TEST_CASE("A tracereader over a missing trace throws") {
+  REQUIRE_THROWS_AS(get_tracereader("champsim-087-does-not-exist", 0, false, false), std::runtime_error);
+}
+
+TEST_CASE("A tracereader over a pipe reads it as a stream") {
+  auto start_instruction = GENERATE(as<uint64_t>{}, 0, 100);
+  auto path = std::filesystem::temp_directory_path() / "champsim-087-fifo";
+  std::filesystem::remove(path);
+  REQUIRE(::mkfifo(path.c_str(), 0600) == 0);
+
+  auto contents = ::make_trace(300);
+  ::temporary_file file{"champsim-087-fifo-expected", contents};
+  champsim::bulk_tracereader<input_instr, champsim::mapped_istream> expected{0, file.path.string(), start_instruction};
+
+  std::thread writer{[&] { std::ofstream{path, std::ios::binary} << contents; }};
+  auto uut = get_tracereader(path.string(), 0, false, false, false, start_instruction);
+  while (!expected.eof()) {
+    REQUIRE_FALSE(uut.eof());
+    REQUIRE(uut().ip == expected().ip);
+  }
+  REQUIRE(uut.eof());
+
+  writer.join();
+  std::filesystem::remove(path);
+}
@@ -0,0 +1,164 @@
+#include <catch.hpp>
+
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <lzma.h>
+#include <sstream>
+#include <stdexcept>
+#include <vector>
+
+#include "chunked_istream.h"
+#include "mapped_istream.h"
+#include "tracereader.h"
+
+namespace {
+  struct temporary_file {
+    std::filesystem::path path;
+
+    temporary_file(std::string_view name, const std::string& contents) : path(std::filesystem::temp_directory_path() / name)
+    {
+      std::ofstream{path, std::ios::binary} << contents;
+    }
+    ~temporary_file() { std::filesystem::remove(path); }
+  };
+
+  std::string make_trace(std::size_t count)
+  {
+    std::string retval(count * sizeof(input_instr), '\0');
+    for (std::size_t i = 0; i < count; ++i) {
+      input_instr instr{};
+      instr.ip = 0x1000 + 4*i;
+      instr.is_branch = (i % 3 == 0);
+      instr.branch_taken = (i % 2 == 0);
+      std::memcpy(std::data(retval) + i*sizeof(input_instr), &instr, sizeof(input_instr));
+    }
+    return retval;
+  }
+
+  template <typename T>
+  void put(std::string& dest, T value)
+  {
+    dest.append(reinterpret_cast<const char*>(&value), sizeof(T));
+  }
+
+  // Write a chunked trace in the format produced by runner.chunked
+  std::string make_chunked(const std::string& data, uint32_t record_size, uint64_t records_per_chunk)
+  {
+    constexpr std::size_t header_size = 48;
+    std::string chunks;
+    std::vector<std::pair<uint64_t, uint64_t>> index;
+    for (std::size_t offset = 0; offset < std::size(data); offset += records_per_chunk * record_size) {
+      auto length = std::min<std::size_t>(records_per_chunk * record_size, std::size(data) - offset);
+      std::vector<uint8_t> out(lzma_stream_buffer_bound(length));
+      std::size_t out_pos = 0;
+      auto ret = lzma_easy_buffer_encode(LZMA_PRESET_DEFAULT, LZMA_CHECK_CRC64, nullptr, reinterpret_cast<const uint8_t*>(std::data(data)) + offset, length,
+                                         std::data(out), &out_pos, std::size(out));
+      REQUIRE(ret == LZMA_OK);
+      index.emplace_back(header_size + std::size(chunks), out_pos);
+      chunks.append(reinterpret_cast<const char*>(std::data(out)), out_pos);
+    }
+
+    std::string retval{"CHAMPSIM"};
+    put<uint32_t>(retval, 1);
+    put<uint32_t>(retval, record_size);
+    put<uint64_t>(retval, records_per_chunk);
+    put<uint64_t>(retval, std::size(data) / record_size);
+    put<uint64_t>(retval, std::size(index));
+    put<uint64_t>(retval, header_size + std::size(chunks));
+    REQUIRE(std::size(retval) == header_size);
+    retval += chunks;
+    for (auto [offset, size] : index) {
+      put<uint64_t>(retval, offset);
+      put<uint64_t>(retval, size);
+    }
+    return retval;
+  }
+
+  // A stream over a string, without seekg(), so that readers must read through skipped instructions
+  struct unseekable_stream {
+    std::istringstream intern;
+    explicit unseekable_stream(std::string contents) : intern(std::move(contents)) {}
+    unseekable_stream& read(char* dest, std::streamsize count) { intern.read(dest, count); return *this; }
+    std::streamsize gcount() const { return intern.gcount(); }
+    bool eof() const { return intern.eof(); }
+  };
+}
+
+TEST_CASE("A chunked_istream reads the bytes of the trace it was made from") {
+  auto read_size = GENERATE(as<std::streamsize>{}, 1, 7, 64, 1000, 100000);
+  const auto trace = ::make_trace(300);
+  ::temporary_file file{"champsim-088-chunked.ctrace", ::make_chunked(trace, sizeof(input_instr), 64)};
+
+  champsim::chunked_istream uut{file.path.string()};
+  REQUIRE(uut.record_size() == sizeof(input_instr));
+  REQUIRE(uut.records() == 300);
+  REQUIRE(uut.size() == std::size(trace));
+
+  std::string result;
+  std::vector<char> buf(static_cast<std::size_t>(read_size));
+  while (!uut.eof()) {
+    uut.read(std::data(buf), read_size);
+    result.append(std::data(buf), static_cast<std::size_t>(uut.gcount()));
+  }
+  REQUIRE(result == trace);
+}
+
+TEST_CASE("A chunked_istream can seek to any position") {
+  const auto trace = ::make_trace(300);
+  ::temporary_file file{"champsim-088-chunked-seek.ctrace", ::make_chunked(trace, sizeof(input_instr), 64)};
+  auto position = GENERATE(as<std::size_t>{}, 0, 1, 63*sizeof(input_instr), 64*sizeof(input_instr), 299*sizeof(input_instr) + 5);
+
+  champsim::chunked_istream uut{file.path.string()};
+  std::vector<char> buf(1000);
+  uut.read(std::data(buf), std::size(buf)); // The seek is absolute, regardless of earlier reads
+  uut.seekg(static_cast<std::streamoff>(position));
+  REQUIRE_FALSE(uut.eof());
+  uut.read(std::data(buf), std::size(buf));
+
+  auto expected = std::min(std::size(buf), std::size(trace) - position);
+  REQUIRE(uut.gcount() == static_cast<std::streamsize>(expected));
+  REQUIRE(std::string(std::data(buf), expected) == trace.substr(position, expected));
+}
+
+TEST_CASE("A chunked_istream reaches the end of the file when seeking past the end") {
+  ::temporary_file file{"champsim-088-chunked-end.ctrace", ::make_chunked(::make_trace(10), sizeof(input_instr), 4)};
+
+  champsim::chunked_istream uut{file.path.string()};
+  uut.seekg(10*sizeof(input_instr));
+  REQUIRE(uut.eof());
+  char c{};
+  uut.read(&c, 1);
+  REQUIRE(uut.gcount() == 0);
+}
+
+TEST_CASE("A chunked_istream rejects files that are not chunked traces") {
+  ::temporary_file file{"champsim-088-not-chunked.ctrace", ::make_trace(10)};
+  REQUIRE_THROWS_AS(champsim::chunked_istream{file.path.string()}, std::runtime_error);
+}
+
+TEMPLATE_TEST_CASE("A tracereader can begin at any instruction", "", champsim::chunked_istream, champsim::mapped_istream, std::istringstream, ::unseekable_stream) {
+  auto start = GENERATE(as<uint64_t>{}, 0, 1, 63, 64, 100, 298);
+  const auto trace = ::make_trace(300);
+  ::temporary_file file{"champsim-088-start", std::is_same_v<TestType, champsim::chunked_istream> ? ::make_chunked(trace, sizeof(input_instr), 64) : trace};
+  constexpr bool from_file = std::is_same_v<TestType, champsim::chunked_istream> || std::is_same_v<TestType, champsim::mapped_istream>;
+
+  champsim::bulk_tracereader<input_instr, TestType> uut{0, from_file ? file.path.string() : trace, start};
+  // The final instruction is held back, since its branch target is unknown
+  for (auto i = start; i < 299; ++i) {
+    REQUIRE_FALSE(uut.eof());
+    auto instr = uut();
+    REQUIRE(instr.ip == champsim::address{0x1000 + 4*i});
+  }
+  REQUIRE(uut.eof());
+}
+
+TEMPLATE_TEST_CASE("A tracereader cannot begin at or past the end of the trace", "", champsim::chunked_istream, champsim::mapped_istream, std::istringstream, ::unseekable_stream) {
+  auto start = GENERATE(as<uint64_t>{}, 10, 11);
+  const auto trace = ::make_trace(10);
+  ::temporary_file file{"champsim-088-start-end", std::is_same_v<TestType, champsim::chunked_istream> ? ::make_chunked(trace, sizeof(input_instr), 4) : trace};
+  constexpr bool from_file = std::is_same_v<TestType, champsim::chunked_istream> || std::is_same_v<TestType, champsim::mapped_istream>;
+
+  using reader_type = champsim::bulk_tracereader<input_instr, TestType>;
+  REQUIRE_THROWS_AS(reader_type(0, from_file ? file.path.string() : trace, start), std::out_of_range);
+}
@@ -0,0 +1,106 @@
+import unittest
+import unittest.mock
+import io
+import lzma
+import os
+import struct
+import tempfile
+
+import runner.chunked
+import runner.compression
+
+def make_records(count, record_size=64):
+    ''' Records whose first eight bytes hold their index. '''
+    return b''.join(struct.pack('<Q', i) + bytes(record_size - 8) for i in range(count))
+
+class ChunkedTraceTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def convert(self, data, records_per_chunk=16, record_size=64, suffix='xz'):
+        in_fname = os.path.join(self.tmpdir.name, 'a.champsimtrace.' + suffix)
+        out_fname = os.path.join(self.tmpdir.name, 'a.ctrace')
+        with runner.compression.open_trace(in_fname, 'wb') as wfp:
+            wfp.write(data)
+        runner.chunked.convert(in_fname, out_fname, record_size, records_per_chunk=records_per_chunk, max_workers=2)
+        return out_fname
+
+    def test_is_chunked(self):
+        self.assertTrue(runner.chunked.is_chunked('/x/a.ctrace'))
+        self.assertFalse(runner.chunked.is_chunked('/x/a.champsimtrace.xz'))
+
+    def test_round_trip(self):
+        data = make_records(100)
+        for suffix in ('gz', 'xz', 'bz2'):
+            with self.subTest(suffix=suffix):
+                with runner.chunked.ChunkedTrace(self.convert(data, suffix=suffix)) as trace:
+                    self.assertEqual(len(trace), 100)
+                    self.assertEqual(trace.record_size, 64)
+                    self.assertEqual(len(trace.index), 7)
+                    self.assertEqual(trace.read(0, 100), data)
+
+    def test_chunks_are_independent_xz_streams(self):
+        data = make_records(40)
+        fname = self.convert(data)
+        with runner.chunked.ChunkedTrace(fname) as trace, open(fname, 'rb') as rfp:
+            for i, (offset, size) in enumerate(trace.index):
+                rfp.seek(offset)
+                self.assertEqual(lzma.decompress(rfp.read(size)), data[i*16*64:(i+1)*16*64])
+
+    def test_read_from_any_record(self):
+        data = make_records(100)
+        with runner.chunked.ChunkedTrace(self.convert(data)) as trace:
+            for start, count in ((0, 1), (15, 2), (16, 16), (50, 1000), (99, 1), (100, 1)):
+                with self.subTest(start=start, count=count):
+                    self.assertEqual(trace.read(start, count), data[start*64:(start+count)*64])
+
+    def test_only_needed_chunks_are_decompressed(self):
+        with runner.chunked.ChunkedTrace(self.convert(make_records(100))) as trace:
+            with unittest.mock.patch('lzma.decompress', wraps=lzma.decompress) as decompress:
+                trace.read(70, 5)
+            self.assertEqual(decompress.call_count, 1)
+
+    def test_partial_record_is_discarded(self):
+        data = make_records(20)
+        with runner.chunked.ChunkedTrace(self.convert(data + b'\x01\x02\x03')) as trace:
+            self.assertEqual(len(trace), 20)
+            self.assertEqual(trace.read(0, 100), data)
+
+    def test_empty_trace(self):
+        with runner.chunked.ChunkedTrace(self.convert(b'')) as trace:
+            self.assertEqual(len(trace), 0)
+            self.assertEqual(trace.index, [])
+            self.assertEqual(trace.read(0, 10), b'')
+
+    def test_write_from_file(self):
+        data = make_records(33, record_size=96)
+        fname = os.path.join(self.tmpdir.name, 'b.ctrace')
+        self.assertEqual(runner.chunked.write(io.BytesIO(data), fname, 96, records_per_chunk=8), 33)
+        with runner.chunked.ChunkedTrace(fname) as trace:
+            self.assertEqual(trace.record_size, 96)
+            self.assertEqual(trace.read(0, 33), data)
+
+    def test_not_a_chunked_trace(self):
+        fname = os.path.join(self.tmpdir.name, 'c.ctrace')
+        with open(fname, 'wb') as wfp:
+            wfp.write(make_records(2))
+        with self.assertRaises(ValueError):
+            runner.chunked.ChunkedTrace(fname)
+
+    def test_main(self):
+        in_fname = os.path.join(self.tmpdir.name, 'a.champsimtrace')
+        with open(in_fname, 'wb') as wfp:
+            wfp.write(make_records(10, record_size=96))
+        out_fname = os.path.join(self.tmpdir.name, 'a.ctrace')
+        with unittest.mock.patch('sys.stdout', new_callable=io.StringIO):
+            self.assertEqual(runner.chunked.main([in_fname, out_fname, '--cloudsuite', '--chunk-records', '4']), 0)
+        with runner.chunked.ChunkedTrace(out_fname) as trace:
+            self.assertEqual((len(trace), trace.record_size, trace.records_per_chunk), (10, 96, 4))
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['a.champsimtrace', 'a.ctrace'])
+
+    def test_main_requires_suffix(self):
+        with unittest.mock.patch('sys.stderr', new_callable=io.StringIO), self.assertRaises(SystemExit):
+            runner.chunked.main(['a.champsimtrace', 'a.champsimtrace.xz'])
@@ -0,0 +1,103 @@
+import unittest
+import tempfile
+import os
+
+import config.configcache
+import config.parse
+
+class ConfigureCacheTests(unittest.TestCase):
+    def test_missing_key_is_default(self):
+        with tempfile.TemporaryDirectory() as dtemp:
+            cache = config.configcache.ConfigureCache(dtemp)
+            key = cache.key('test', {'a': 1})
+            self.assertNotIn(key, cache)
+            self.assertIsNone(cache.get(key))
+
+    def test_put_then_get(self):
+        with tempfile.TemporaryDirectory() as dtemp:
+            cache = config.configcache.ConfigureCache(dtemp)
+            key = cache.key('test', {'a': 1})
+            cache.put(key, ('value', [1,2,3]))
+            self.assertIn(key, cache)
+            self.assertEqual(cache.get(key), ('value', [1,2,3]))
+
+    def test_entries_persist(self):
+        with tempfile.TemporaryDirectory() as dtemp:
+            first = config.configcache.ConfigureCache(dtemp)
+            first.put(first.key('test', {'a': 1}), 'value')
+            second = config.configcache.ConfigureCache(dtemp)
+            self.assertEqual(second.get(second.key('test', {'a': 1})), 'value')
+
+    def test_key_depends_on_parts(self):
+        with tempfile.TemporaryDirectory() as dtemp:
+            cache = config.configcache.ConfigureCache(dtemp)
+            self.assertEqual(cache.key('test', {'a': 1, 'b': 2}), cache.key('test', {'b': 2, 'a': 1}))
+            self.assertNotEqual(cache.key('test', {'a': 1}), cache.key('test', {'a': 2}))
+            self.assertNotEqual(cache.key('test', {'a': 1}), cache.key('other', {'a': 1}))
+
+    def test_new_module_invalidates(self):
+        with tempfile.TemporaryDirectory() as dtemp, tempfile.TemporaryDirectory() as modtemp:
+            before = config.configcache.ConfigureCache(dtemp, search_paths=[modtemp])
+            os.mkdir(os.path.join(modtemp, 'new_module'))
+            after = config.configcache.ConfigureCache(dtemp, search_paths=[modtemp])
+            self.assertNotEqual(before.key('test', {}), after.key('test', {}))
+
+    def test_legacy_marker_invalidates(self):
+        with tempfile.TemporaryDirectory() as dtemp, tempfile.TemporaryDirectory() as modtemp:
+            os.mkdir(os.path.join(modtemp, 'new_module'))
+            before = config.configcache.ConfigureCache(dtemp, search_paths=[modtemp])
+            open(os.path.join(modtemp, 'new_module', '__legacy__'), 'w').close()
+            after = config.configcache.ConfigureCache(dtemp, search_paths=[modtemp])
+            self.assertNotEqual(before.key('test', {}), after.key('test', {}))
+
+    def test_new_header_invalidates(self):
+        with tempfile.TemporaryDirectory() as dtemp, tempfile.TemporaryDirectory() as modtemp:
+            os.mkdir(os.path.join(modtemp, 'new_module'))
+            before = config.configcache.ConfigureCache(dtemp, search_paths=[modtemp])
+            open(os.path.join(modtemp, 'new_module', 'helper.h'), 'w').close()
+            after = config.configcache.ConfigureCache(dtemp, search_paths=[modtemp])
+            self.assertNotEqual(before.key('test', {}), after.key('test', {}))
+
+    def test_module_sources_do_not_invalidate(self):
+        with tempfile.TemporaryDirectory() as dtemp, tempfile.TemporaryDirectory() as modtemp:
+            os.mkdir(os.path.join(modtemp, 'new_module'))
+            before = config.configcache.ConfigureCache(dtemp, search_paths=[modtemp])
+            open(os.path.join(modtemp, 'new_module', 'legacy_bridge.cc'), 'w').close()
+            after = config.configcache.ConfigureCache(dtemp, search_paths=[modtemp])
+            self.assertEqual(before.key('test', {}), after.key('test', {}))
+
+class ParseConfigsCacheTests(unittest.TestCase):
+    def test_cached_matches_uncached(self):
+        configs = [({'executable_name': f'exe{i}', 'rob_size': 32+i},) for i in range(3)]
+        with tempfile.TemporaryDirectory() as dtemp:
+            cache = config.configcache.ConfigureCache(dtemp)
+            first = list(config.parse.parse_configs(configs, cache=cache))
+            second = list(config.parse.parse_configs(configs, cache=cache))
+            self.assertEqual(first, second)
+
+    def test_hits_are_not_parsed(self):
+        configs = [({'executable_name': 'exe'},)]
+        with tempfile.TemporaryDirectory() as dtemp:
+            cache = config.configcache.ConfigureCache(dtemp)
+            cache.put(cache.key('parse', configs[0], {}), 'sentinel')
+            self.assertEqual(list(config.parse.parse_configs(configs, cache=cache)), ['sentinel'])
+
+    def test_hits_and_misses_keep_order(self):
+        configs = [({'executable_name': f'exe{i}'},) for i in range(6)]
+        with tempfile.TemporaryDirectory() as dtemp:
+            cache = config.configcache.ConfigureCache(dtemp)
+            list(config.parse.parse_configs(configs[::2], cache=cache))
+            names = [c[0] for c in config.parse.parse_configs(configs, jobs=2, chunksize=1, cache=cache)]
+            self.assertEqual(names, [f'exe{i}' for i in range(6)])
+
+    def test_truncated_entry_is_parsed_again(self):
+        configs = [({'executable_name': 'exe'},)]
+        with tempfile.TemporaryDirectory() as dtemp:
+            cache = config.configcache.ConfigureCache(dtemp)
+            key = cache.key('parse', configs[0], {})
+            cache.put(key, 'sentinel')
+            with open(cache.path(key), 'wb'):
+                pass
+            parsed = list(config.parse.parse_configs(configs, cache=cache))
+            self.assertEqual(parsed[0][0], 'exe')
+            self.assertEqual(cache.get(key), parsed[0])
@@ -2,7 +2,9 @@ import unittest
 import os
 import tempfile
 import subprocess
+import unittest.mock
 
+import config.configcache
 import config.cxx
 
 class CheckCompilesTests(unittest.TestCase):
@@ -15,6 +17,44 @@ class CheckCompilesTests(unittest.TestCase):
     def test_instantiate_int_with_chararray(self):
         self.assertFalse(config.cxx.check_compiles(('int test{"Hi, Mom!"};',)))
 
+class CheckCompilesCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = config.configcache.ConfigureCache(self.tempdir.name)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_cached_result_does_not_compile(self):
+        first = config.cxx.check_compiles(('int test{0};',), cache=self.cache)
+        with unittest.mock.patch('subprocess.run') as run:
+            second = config.cxx.check_compiles(('int test{0};',), cache=self.cache)
+            run.assert_not_called()
+        self.assertTrue(first)
+        self.assertTrue(second)
+
+    def test_cached_failure_keeps_output(self):
+        first = config.cxx.check_compiles(('int test{"Hi, Mom!"};',), cache=self.cache)
+        second = config.cxx.check_compiles(('int test{"Hi, Mom!"};',), cache=self.cache)
+        self.assertFalse(second)
+        self.assertEqual(first.stderr, second.stderr)
+
+    def test_arguments_are_part_of_key(self):
+        self.assertTrue(config.cxx.check_compiles(('int test{VALUE};',), '-DVALUE=0', cache=self.cache))
+        self.assertFalse(config.cxx.check_compiles(('int test{VALUE};',), cache=self.cache))
+
+    def test_compiler_is_part_of_key(self):
+        config.cxx.check_compiles(('int test{0};',), cache=self.cache)
+        self.assertFalse(config.cxx.check_compiles(('int test{0};',), cxx='false', cache=self.cache))
+
+class CheckAllCompileTests(unittest.TestCase):
+    def test_results_in_order(self):
+        bodies = [('int test{0};',), ('int test{"Hi, Mom!"};',), tuple()]
+        self.assertEqual(list(map(bool, config.cxx.check_all_compile(bodies, max_workers=2))), [True, False, True])
+
+    def test_empty(self):
+        self.assertEqual(config.cxx.check_all_compile([]), [])
+
 class FunctionTests(unittest.TestCase):
     def do_build(self, function):
         with tempfile.TemporaryDirectory() as dtemp:
@@ -253,3 +253,12 @@ class JoiningDTLBPathDefaultsTests(unittest.TestCase):
             'l1_1': 'champsim::defaults::default_dtlb'
         }
         self.assertDictEqual(defs, expected)
+
+class RoundRobinTests(unittest.TestCase):
+
+    def test_uneven_lengths(self):
+        self.assertEqual(list(config.defaults.roundrobin('ABC', 'D', 'EF')), list('ADEBFC'))
+
+    def test_empty(self):
+        self.assertEqual(list(config.defaults.roundrobin()), [])
+        self.assertEqual(list(config.defaults.roundrobin('', 'AB')), list('AB'))
@@ -1,7 +1,11 @@
 import unittest
+import unittest.mock
 import operator
+import os
+import tempfile
 
 import config.filewrite
+import config.parse
 
 class FilesAreDifferentTests(unittest.TestCase):
     def test_identical(self):
@@ -42,6 +46,58 @@ class FilesAreDifferentTests(unittest.TestCase):
 
         self.assertTrue(config.filewrite.files_are_different(a.splitlines(),b.splitlines()))
 
+class WriteIfDifferentTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tempdir.name, 'sub', 'file.inc')
+        self.digest_fname = os.path.join(self.tempdir.name, 'digests', 'file.json')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def read(self):
+        with open(self.fname, 'rt') as rfp:
+            return rfp.read()
+
+    def test_creates_file(self):
+        config.filewrite.write_if_different(self.fname, 'a\nb')
+        self.assertEqual(self.read(), 'a\nb')
+
+    def test_rewrites_different_file(self):
+        config.filewrite.write_if_different(self.fname, 'a\nb')
+        config.filewrite.write_if_different(self.fname, 'a\nc')
+        self.assertEqual(self.read(), 'a\nc')
+
+    def test_does_not_rewrite_whitespace_change(self):
+        config.filewrite.write_if_different(self.fname, 'a\nb')
+        config.filewrite.write_if_different(self.fname, '  a\nb  ')
+        self.assertEqual(self.read(), 'a\nb')
+
+    def test_leaves_no_temporary_files(self):
+        config.filewrite.write_if_different(self.fname, 'a\nb')
+        config.filewrite.write_if_different(self.fname, 'a\nc')
+        self.assertEqual(os.listdir(os.path.dirname(self.fname)), ['file.inc'])
+
+    def test_writes_to_given_file(self):
+        os.makedirs(os.path.dirname(self.fname))
+        with open(self.fname, 'wt') as wfp:
+            config.filewrite.write_if_different(self.fname, 'a\nb', file=wfp)
+        self.assertEqual(self.read(), 'a\nb')
+
+    def test_stored_digest_avoids_reading(self):
+        config.filewrite.write_if_different(self.fname, 'a\nb', digest_fname=self.digest_fname)
+        self.assertTrue(os.path.exists(self.digest_fname))
+        with unittest.mock.patch('config.filewrite.lines_digest', wraps=config.filewrite.lines_digest) as digest:
+            config.filewrite.write_if_different(self.fname, 'a\nb', digest_fname=self.digest_fname)
+            digest.assert_called_once()
+
+    def test_stored_digest_ignored_after_edit(self):
+        config.filewrite.write_if_different(self.fname, 'a\nb', digest_fname=self.digest_fname)
+        with open(self.fname, 'wt') as wfp:
+            wfp.write('edited by hand')
+        config.filewrite.write_if_different(self.fname, 'a\nb', digest_fname=self.digest_fname)
+        self.assertEqual(self.read(), 'a\nb')
+
 class FragmentTests(unittest.TestCase):
     def test_empty_fragment_is_empty(self):
         self.assertEqual(list(iter(config.filewrite.Fragment())), [])
@@ -76,3 +132,152 @@ class FragmentTests(unittest.TestCase):
         a_frag = config.filewrite.Fragment(a_parts)
         b_frag = config.filewrite.Fragment(b_parts)
         self.assertEqual(list(iter(config.filewrite.Fragment.join(a_frag, b_frag))), expected)
+
+    def test_fragments_write_all_files(self):
+        with tempfile.TemporaryDirectory() as dtemp:
+            parts = [(os.path.join(dtemp, f'{i}.inc'), (f'line {i}',)) for i in range(16)]
+            config.filewrite.Fragment(parts).write(digest_dir=os.path.join(dtemp, 'digests'))
+            for fname, lines in parts:
+                with open(fname, 'rt') as rfp:
+                    self.assertEqual(rfp.read(), lines[0])
+            self.assertEqual(len(os.listdir(os.path.join(dtemp, 'digests'))), 16)
+
+class BuildFingerprintTests(unittest.TestCase):
+    parsed_config = config.parse.parse_config({'executable_name': 'test_exe'})
+
+    def with_module_info(self, **kwargs):
+        executable, elements, modules_to_compile, module_info, config_file = self.parsed_config
+        return executable, elements, modules_to_compile, {**module_info, **kwargs}, config_file
+
+    def test_fingerprint_is_stable(self):
+        self.assertEqual(config.filewrite.build_fingerprint(self.parsed_config), config.filewrite.build_fingerprint(config.parse.parse_config({'executable_name': 'test_exe'})))
+
+    def test_fingerprint_depends_on_elements(self):
+        other = config.parse.parse_config({'executable_name': 'test_exe', 'num_cores': 2})
+        self.assertNotEqual(config.filewrite.build_fingerprint(self.parsed_config), config.filewrite.build_fingerprint(other))
+
+    def test_fingerprint_depends_on_executable(self):
+        other = config.parse.parse_config({'executable_name': 'other_exe'})
+        self.assertNotEqual(config.filewrite.build_fingerprint(self.parsed_config), config.filewrite.build_fingerprint(other))
+
+    def test_fingerprint_ignores_unused_modules(self):
+        unused = {'prefetcherDunused': {'name': 'prefetcherDunused', 'path': 'prefetcher/unused', 'legacy': False, 'class': 'unused'}}
+        changed = self.with_module_info(pref={**self.parsed_config[3]['pref'], **unused})
+        self.assertEqual(config.filewrite.build_fingerprint(self.parsed_config), config.filewrite.build_fingerprint(changed))
+
+    def test_fingerprint_depends_on_compiled_modules(self):
+        moved = {k: {**v, 'path': 'elsewhere'} for k,v in self.parsed_config[3]['pref'].items()}
+        changed = self.with_module_info(pref=moved)
+        self.assertNotEqual(config.filewrite.build_fingerprint(self.parsed_config), config.filewrite.build_fingerprint(changed))
+
+    def test_fingerprint_ignores_module_order(self):
+        executable, elements, modules_to_compile, module_info, config_file = self.parsed_config
+        reordered = (executable, elements, list(reversed(modules_to_compile)), module_info, config_file)
+        self.assertEqual(config.filewrite.build_fingerprint(self.parsed_config), config.filewrite.build_fingerprint(reordered))
+
+class FragmentFromConfigTests(unittest.TestCase):
+    parsed_config = config.parse.parse_config({'executable_name': 'test_exe'})
+
+    def test_unsharded_writes_one_makefile(self):
+        frag = config.filewrite.Fragment.from_config(self.parsed_config, bindir_name='bin', objdir_name='obj', makedir_name='make')
+        fnames = [f for f,_ in frag if f.endswith('.mk')]
+        self.assertEqual(fnames, [os.path.join('make', '_configuration.mk')])
+
+    def test_sharded_writes_index_and_shard(self):
+        frag = config.filewrite.Fragment.from_config(self.parsed_config, bindir_name='bin', objdir_name='obj', makedir_name='make', sharded=True)
+        makefiles = {f:c for f,c in frag if f.endswith('.mk')}
+        self.assertEqual(len(makefiles), 2)
+
+        index = makefiles.pop(os.path.join('make', '_configuration.mk'))
+        (shard_fname, shard), = makefiles.items()
+        self.assertEqual(os.path.dirname(shard_fname), os.path.abspath(os.path.join('make', '_configuration')))
+        self.assertTrue(any(shard_fname in l for l in index))
+        self.assertTrue(any(l.startswith('executable_name') for l in index))
+        self.assertFalse(any(l.startswith('executable_name') for l in shard))
+        self.assertTrue(any('build_id' in l for l in shard))
+
+    def test_sharded_index_lists_legacy_modules(self):
+        with tempfile.TemporaryDirectory() as dtemp:
+            executable, elements, modules_to_compile, module_info, config_file = self.parsed_config
+            legacy = {'prefetcherDold': {'name': 'prefetcherDold', 'path': dtemp, 'legacy': True, 'class': 'old'}}
+            parsed_config = (executable, elements, [*modules_to_compile, 'prefetcherDold'], {**module_info, 'pref': {**module_info['pref'], **legacy}}, config_file)
+            frag = config.filewrite.Fragment.from_config(parsed_config, bindir_name='bin', objdir_name='obj', makedir_name='make', sharded=True)
+            makefiles = {f:c for f,c in frag if f.endswith('.mk')}
+
+        index = makefiles.pop(os.path.join('make', '_configuration.mk'))
+        (_, shard), = makefiles.items()
+        self.assertTrue(any('prereq_for_generated' in l for l in index))
+        self.assertFalse(any('prereq_for_generated' in l for l in shard))
+
+class StreamedOutputTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tempdir.name, 'a.mk')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def read(self):
+        with open(self.fname, 'rt') as rfp:
+            return rfp.read()
+
+    def test_matches_joined_fragments(self):
+        parts = [(self.fname, (*config.filewrite.make_generated_warning(), f'part {i}  ')) for i in range(3)]
+        output = config.filewrite.StreamedOutput()
+        for fname, lines in parts:
+            output.append(fname, lines)
+        output.commit()
+
+        (_, expected), = config.filewrite.Fragment.join(*(config.filewrite.Fragment([p]) for p in parts))
+        self.assertEqual(self.read(), '\n'.join(l.rstrip() for l in expected))
+
+    def test_nothing_written_before_commit(self):
+        output = config.filewrite.StreamedOutput()
+        output.append(self.fname, ('aaa',))
+        self.assertFalse(os.path.exists(self.fname))
+        output.commit()
+        self.assertEqual(self.read(), 'aaa')
+
+    def test_discard_removes_temporary_files(self):
+        output = config.filewrite.StreamedOutput()
+        output.append(self.fname, ('aaa',))
+        output.discard()
+        self.assertEqual(os.listdir(self.tempdir.name), [])
+
+    def test_many_files_with_few_handles(self):
+        fnames = [os.path.join(self.tempdir.name, f'{i}.txt') for i in range(8)]
+        output = config.filewrite.StreamedOutput(max_open_files=2)
+        for i in range(3):
+            for fname in fnames:
+                output.append(fname, (f'line {i}',))
+        output.commit()
+        for fname in fnames:
+            with open(fname, 'rt') as rfp:
+                self.assertEqual(rfp.read(), 'line 0\nline 1\nline 2')
+
+class FileWriterStreamingTests(unittest.TestCase):
+    parsed_configs = [config.parse.parse_config({'executable_name': f'test_exe{i}', 'num_cores': i}) for i in (1,2)]
+
+    def write(self, dirname, sharded, streaming):
+        with config.filewrite.FileWriter(bindir_name='bin', objdir_name=os.path.join(dirname, 'obj'), makedir_name=dirname, sharded=sharded, streaming=streaming) as wr:
+            for parsed_config in self.parsed_configs:
+                wr.write_files(parsed_config)
+        result = {}
+        for base, _, fnames in os.walk(dirname):
+            for fname in fnames:
+                with open(os.path.join(base, fname), 'rt') as rfp:
+                    result[os.path.relpath(os.path.join(base, fname), dirname)] = rfp.read().replace(dirname, '')
+        return result
+
+    def test_streaming_matches_buffered(self):
+        for sharded in (False, True):
+            with self.subTest(sharded=sharded), tempfile.TemporaryDirectory() as buffered, tempfile.TemporaryDirectory() as streamed:
+                self.assertEqual(self.write(buffered, sharded, False), self.write(streamed, sharded, True))
+
+    def test_exception_writes_nothing(self):
+        with tempfile.TemporaryDirectory() as dtemp:
+            with self.assertRaises(RuntimeError):
+                with config.filewrite.FileWriter(bindir_name='bin', objdir_name=os.path.join(dtemp, 'obj'), makedir_name=dtemp, streaming=True) as wr:
+                    wr.write_files(self.parsed_configs[0])
+                    raise RuntimeError()
+            self.assertEqual([f for _,_,fnames in os.walk(dtemp) for f in fnames], [])
@@ -1,9 +1,11 @@
 import unittest
+import unittest.mock
 import itertools
 import tempfile
 import os
 
 import config.instantiation_file
+import config.modules
 
 class VectorStringTest(unittest.TestCase):
 
@@ -218,6 +220,43 @@ class PageTableWalkerBuilderTests(unittest.TestCase):
     def test_pscl2(self):
         self.get_element_diff(['.add_pscl(2, 1, 2)'], pscl2_set=1, pscl2_way=2)
 
+class TopologyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pairs = [('llc', 'l2c'), ('l2c', 'l1d'), ('l2c', 'l1i'), ('l1d', 'cpu'), ('l1i', 'cpu')]
+        self.topology = config.instantiation_file.Topology(self.pairs, [{ 'name': 'l1i' }, { 'name': 'l1d' }])
+
+    def test_index_matches_list(self):
+        for pair in self.pairs:
+            with self.subTest(pair=pair):
+                self.assertEqual(self.topology.index(pair), self.pairs.index(pair))
+
+    def test_missing_pair(self):
+        self.assertRaises(ValueError, self.topology.index, ('cpu', 'llc'))
+
+    def test_upper_channels(self):
+        self.assertEqual(self.topology.upper_channels('l2c'), [1, 2])
+        self.assertEqual(self.topology.upper_channels('cpu'), [])
+
+    def test_cache_index(self):
+        self.assertEqual(self.topology.cache_index('l1i'), 0)
+        self.assertEqual(self.topology.cache_index('l1d'), 1)
+
+    def test_iterates_pairs(self):
+        self.assertEqual(list(self.topology), self.pairs)
+
+class CacheQueueDefaultsTests(unittest.TestCase):
+
+    def test_queue_factor(self):
+        cache = { '_queue_factor': 16, '_offset_bits': 6, '_queue_check_full_addr': False }
+        result = config.instantiation_file.cache_queue_defaults(cache)
+        self.assertEqual((result['rq_size'], result['wq_size'], result['pq_size']), (16, 16, 16))
+
+    def test_explicit_sizes_without_queue_factor(self):
+        cache = { 'rq_size': 1, 'wq_size': 2, 'pq_size': 3, '_offset_bits': 6, '_queue_check_full_addr': False }
+        result = config.instantiation_file.cache_queue_defaults(cache)
+        self.assertEqual((result['rq_size'], result['wq_size'], result['pq_size']), (1, 2, 3))
+
 class GetUpperLevelsTests(unittest.TestCase):
 
     def test_empty(self):
@@ -304,3 +343,43 @@ class GetQueueInfoTests(unittest.TestCase):
             { 'is_good_boy': False }
         ]
         self.assertEqual(expected, evaluated)
+
+class ModuleIncludeFilesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.tempdir.name, name) for name in ('a', 'b')]
+        for path in self.paths:
+            os.makedirs(os.path.join(path, 'detail'))
+            for fname in ('module.h', os.path.join('detail', 'impl.h'), 'module.cc'):
+                with open(os.path.join(path, fname), 'wt') as wfp:
+                    wfp.write('\n')
+        self.datas = [{'class': os.path.basename(p), 'path': p} for p in self.paths]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_includes_all_headers(self):
+        evaluated = set(config.instantiation_file.module_include_files(self.datas))
+        expected = {f'#include "{os.path.join(p, f)}"' for p in self.paths for f in ('module.h', os.path.join('detail', 'impl.h'))}
+        self.assertEqual(evaluated, expected)
+
+    def test_repeated_modules_are_included_once(self):
+        evaluated = list(config.instantiation_file.module_include_files(self.datas + self.datas))
+        self.assertEqual(len(evaluated), 4)
+
+    def test_unchanged_modules_are_not_walked_again(self):
+        first = list(config.instantiation_file.module_include_files(self.datas))
+        with unittest.mock.patch('os.walk') as walk:
+            second = list(config.instantiation_file.module_include_files(self.datas))
+            walk.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_new_headers_are_found(self):
+        list(config.instantiation_file.module_include_files(self.datas))
+        fname = os.path.join(self.paths[0], 'extra.h')
+        with open(fname, 'wt') as wfp:
+            wfp.write('\n')
+        mtime = os.stat(self.paths[0]).st_mtime_ns + 1000000000
+        os.utime(self.paths[0], ns=(mtime, mtime))
+        self.assertIn(f'#include "{fname}"', list(config.instantiation_file.module_include_files(self.datas)))
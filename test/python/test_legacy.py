@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+
+import config.legacy
+
+class LegacyFilesTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.tempdir.name, kind, 'mod') for kind in ('branch', 'btb', 'prefetcher', 'replacement')]
+        for path in self.paths:
+            os.makedirs(path)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_all_kinds_for_all_modules(self):
+        fnames = [f for f,_ in config.legacy.get_legacy_fileparts(self.paths)]
+        expected = [os.path.join(p, f) for f in ('legacy.options', 'legacy_bridge.inc', 'legacy_bridge.h', 'legacy_bridge.cc') for p in self.paths]
+        self.assertEqual(fnames, expected)
+
+    def test_selected_kinds(self):
+        fnames = [f for f,_ in config.legacy.get_legacy_fileparts(self.paths, kinds=('options',))]
+        self.assertEqual(fnames, [os.path.join(p, 'legacy.options') for p in self.paths])
+
+    def test_no_modules(self):
+        self.assertEqual(config.legacy.get_legacy_fileparts([]), [])
+
+    def test_stamp_is_not_newer_than_files(self):
+        stamp = os.path.join(self.tempdir.name, 'obj', 'legacy.stamp')
+        config.legacy.write_legacy_files(self.paths, stamp=stamp)
+        stamp_mtime = os.stat(stamp).st_mtime_ns
+        for fname, _ in config.legacy.get_legacy_fileparts(self.paths):
+            self.assertGreaterEqual(os.stat(fname).st_mtime_ns, stamp_mtime)
+
+    def test_stamp_is_not_written_if_generation_fails(self):
+        stamp = os.path.join(self.tempdir.name, 'obj', 'legacy.stamp')
+        missing = os.path.join(self.tempdir.name, 'missing', 'mod')
+        with self.assertRaises(OSError):
+            config.legacy.write_legacy_files([*self.paths, missing], stamp=stamp)
+        self.assertFalse(os.path.exists(stamp))
+
+    def test_options_name_module_functions(self):
+        write_path = self.paths[2]
+        config.legacy.write_legacy_files([write_path], kinds=('options',))
+        with open(os.path.join(write_path, 'legacy.options'), 'rt') as rfp:
+            options = rfp.read().splitlines()
+        name = config.legacy.get_legacy_module_info(write_path)['name']
+        self.assertIn(f'-Dprefetcher_initialize=pref_{name}_prefetcher_initialize', options)
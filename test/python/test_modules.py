@@ -0,0 +1,163 @@
+import unittest
+import unittest.mock
+import hashlib
+import json
+import os
+import tempfile
+
+import config.modules
+
+class ModuleIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = self.tempdir.name
+        for name in ('a', 'b'):
+            os.mkdir(os.path.join(self.root, name))
+        self.index = config.modules.ModuleIndex()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def touch_directory(self, path):
+        # Guarantee a new modification time, even on filesystems with coarse timestamps
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+    def test_listing(self):
+        self.assertEqual(self.index.listing(self.root), {'a': True, 'b': True})
+
+    def test_listing_is_reused(self):
+        first = self.index.listing(self.root)
+        self.assertIs(self.index.listing(self.root), first)
+
+    def test_listing_is_invalidated(self):
+        self.index.listing(self.root)
+        os.mkdir(os.path.join(self.root, 'c'))
+        self.touch_directory(self.root)
+        self.assertIn('c', self.index.listing(self.root))
+
+    def test_legacy(self):
+        path = os.path.join(self.root, 'a')
+        self.assertFalse(self.index.is_legacy(path))
+        open(os.path.join(path, '__legacy__'), 'wt').close()
+        self.touch_directory(path)
+        self.assertTrue(self.index.is_legacy(path))
+
+    def test_nested_legacy(self):
+        path = os.path.join(self.root, 'a')
+        nested = os.path.join(path, 'nested')
+        os.mkdir(nested)
+        self.assertFalse(self.index.is_legacy(path))
+        open(os.path.join(nested, '__legacy__'), 'wt').close()
+        self.touch_directory(nested)
+        self.assertTrue(self.index.is_legacy(path))
+
+class ModuleManifestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tempdir.name, 'modules')
+        self.module = os.path.join(self.root, 'a')
+        os.makedirs(self.module)
+        for fname, contents in (('a.h', 'header'), ('a.cc', 'source'), ('legacy_bridge.cc', 'generated')):
+            with open(os.path.join(self.module, fname), 'wt') as wfp:
+                wfp.write(contents)
+        self.manifest = os.path.join(self.tempdir.name, 'manifest.json')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_entry(self):
+        entry = config.modules.ModuleIndex().module(self.module)
+        self.assertEqual(entry['class'], 'a')
+        self.assertFalse(entry['legacy'])
+        self.assertEqual(entry['headers'], [os.path.join(self.module, 'a.h')])
+        self.assertEqual(sorted(entry['sources']), sorted(os.path.join(self.module, f) for f in ('a.h', 'a.cc')))
+
+    def test_source_digests(self):
+        digests = config.modules.ModuleIndex().source_digests(self.module)
+        self.assertEqual(digests[os.path.join(self.module, 'a.cc')], hashlib.sha256(b'source').hexdigest())
+
+    def test_changed_source_is_hashed_again(self):
+        index = config.modules.ModuleIndex()
+        index.source_digests(self.module)
+        fname = os.path.join(self.module, 'a.cc')
+        with open(fname, 'wt') as wfp:
+            wfp.write('changed source')
+        self.assertEqual(index.source_digests(self.module)[fname], hashlib.sha256(b'changed source').hexdigest())
+
+    def test_refresh_does_not_read_sources(self):
+        index = config.modules.ModuleIndex()
+        with unittest.mock.patch('config.modules.file_digest') as file_digest:
+            index.refresh([self.root])
+            file_digest.assert_not_called()
+        self.assertIn(self.module, index.modules)
+
+    def test_requested_digests_are_saved(self):
+        index = config.modules.ModuleIndex()
+        index.refresh([self.root])
+        index.source_digests(self.module)
+        index.save(self.manifest)
+        with open(self.manifest, 'rt') as rfp:
+            sources = json.load(rfp)['modules'][self.module]['sources']
+        self.assertEqual(sources[os.path.join(self.module, 'a.cc')][2], hashlib.sha256(b'source').hexdigest())
+
+    def test_saved_manifest_is_not_walked_again(self):
+        first = config.modules.ModuleIndex()
+        first.refresh([self.root])
+        first.source_digests(self.module)
+        first.save(self.manifest)
+
+        second = config.modules.ModuleIndex()
+        second.load(self.manifest)
+        with unittest.mock.patch('os.walk') as walk, unittest.mock.patch('os.scandir') as scandir:
+            second.refresh([self.root])
+            self.assertEqual(second.source_digests(self.module), first.source_digests(self.module))
+            walk.assert_not_called()
+            scandir.assert_not_called()
+        self.assertFalse(second.dirty)
+
+    def test_missing_manifest_is_ignored(self):
+        index = config.modules.ModuleIndex()
+        index.load(self.manifest)
+        self.assertEqual(index.modules, {})
+
+class ModuleSearchContextTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.tempdir.name, p) for p in ('first', 'second')]
+        for path in self.paths:
+            os.mkdir(path)
+        os.mkdir(os.path.join(self.paths[0], 'a'))
+        os.mkdir(os.path.join(self.paths[1], 'a'))
+        os.mkdir(os.path.join(self.paths[1], 'b'))
+        open(os.path.join(self.paths[1], 'b', '__legacy__'), 'wt').close()
+        self.index = config.modules.ModuleIndex()
+        self.context = config.modules.ModuleSearchContext(self.paths, index=self.index)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_find_prefers_earlier_paths(self):
+        self.assertEqual(self.context.find('a')['path'], os.path.relpath(os.path.join(self.paths[0], 'a')))
+
+    def test_find_falls_through(self):
+        found = self.context.find('b')
+        self.assertEqual(found['path'], os.path.relpath(os.path.join(self.paths[1], 'b')))
+        self.assertTrue(found['legacy'])
+
+    def test_find_path(self):
+        path = os.path.join(self.paths[1], 'b')
+        self.assertEqual(self.context.find(path)['path'], os.path.relpath(path))
+
+    def test_find_all(self):
+        found = sorted(d['path'] for d in self.context.find_all())
+        expected = sorted(os.path.join(p, m) for p,m in ((self.paths[0], 'a'), (self.paths[1], 'a'), (self.paths[1], 'b')))
+        self.assertEqual(found, expected)
+
+    def test_contexts_share_the_process_index(self):
+        lhs = config.modules.ModuleSearchContext(self.paths)
+        rhs = config.modules.ModuleSearchContext(self.paths)
+        self.assertIs(lhs.index, rhs.index)
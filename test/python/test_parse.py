@@ -714,3 +714,15 @@ class PathEndInTests(unittest.TestCase):
                 path = ({'name': x} for x in range(length))
                 result = config.parse.path_end_in(path, 'last')
                 self.assertEqual(result, {'name': length-1, 'lower_level': 'last'})
+
+class ParseConfigsTests(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        configs = [({'executable_name': f'exe{i}', 'rob_size': 32+i},) for i in range(6)]
+        serial = list(config.parse.parse_configs(configs, jobs=1))
+        parallel = list(config.parse.parse_configs(configs, jobs=2, chunksize=1))
+        self.assertEqual(serial, parallel)
+
+    def test_order_is_preserved(self):
+        configs = [({'executable_name': f'exe{i}'},) for i in range(6)]
+        names = [c[0] for c in config.parse.parse_configs(configs, jobs=3, chunksize=1)]
+        self.assertEqual(names, [f'exe{i}' for i in range(6)])
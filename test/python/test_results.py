@@ -0,0 +1,122 @@
+import unittest
+import json
+import math
+import os
+import tempfile
+
+try:
+    import numpy
+    import runner.results
+    import runner.database
+    import runner.jobs
+except ImportError:
+    numpy = None
+
+def cache_stats(hits, misses):
+    return {
+        'prefetch requested': 0, 'prefetch issued': 0, 'useful prefetch': 0, 'useless prefetch': 0, 'miss latency': None,
+        **{t: {'hit': hits, 'miss': misses, 'mshr_merge': [0]*len(hits)} for t in ('LOAD', 'RFO', 'PREFETCH', 'WRITE', 'TRANSLATION')}
+    }
+
+def run_output(instructions, llc_hits):
+    region = {
+        'cores': [{'instructions': instructions, 'cycles': 2*instructions, 'Avg ROB occupancy at mispredict': None, 'mispredict': {'BRANCH_CONDITIONAL': 3}}],
+        'DRAM': [{'RQ ROW_BUFFER_HIT': 1, 'RQ ROW_BUFFER_MISS': 2, 'WQ ROW_BUFFER_HIT': 3, 'WQ ROW_BUFFER_MISS': 4, 'AVG DBUS CONGESTED CYCLE': None, 'REFRESHES ISSUED': 5}],
+        'LLC': cache_stats([llc_hits], [1]),
+        'cpu0_L1D': cache_stats([10], [2])
+    }
+    return [{'name': 'Simulation', 'traces': ['a.xz'], 'roi': region, 'sim': region}]
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class FlattenTests(unittest.TestCase):
+    def test_nested_keys_are_joined(self):
+        self.assertEqual(runner.results.flatten_stats({'a': {'b': 1}, 'c': 2}), {'a.b': 1.0, 'c': 2.0})
+
+    def test_per_core_lists_are_summed(self):
+        self.assertEqual(runner.results.flatten_stats({'LOAD': {'hit': [1, 2, 3]}}), {'LOAD.hit': 6.0})
+
+    def test_null_is_nan(self):
+        self.assertTrue(math.isnan(runner.results.flatten_stats({'miss latency': None})['miss latency']))
+
+    def test_one_row_per_component(self):
+        rows = list(runner.results.flatten_run(run_output(100, 5)))
+        self.assertEqual(len(rows), 8)
+        self.assertEqual({(r[1], r[2], r[3]) for r in rows if r[1] == 'roi'}, {('roi', 'core', 'cpu0'), ('roi', 'dram', 'channel0'), ('roi', 'cache', 'LLC'), ('roi', 'cache', 'cpu0_L1D')})
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class ResultTableTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.fnames = []
+        for i in range(5):
+            fname = os.path.join(self.tempdir.name, f'{i}.json')
+            with open(fname, 'wt') as wfp:
+                json.dump(run_output(100*(i+1), i), wfp)
+            self.fnames.append(fname)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_columns_have_one_row_per_component(self):
+        table = runner.results.load_files(self.fnames)
+        self.assertEqual(len(table), 40)
+        self.assertTrue(all(len(table[name]) == 40 for name in table.metric_names))
+
+    def test_missing_statistics_are_nan(self):
+        table = runner.results.load_files(self.fnames)
+        self.assertTrue(numpy.isnan(table['instructions'][table.where(kind='cache')]).all())
+
+    def test_total_by_run(self):
+        table = runner.results.load_files(self.fnames)
+        totals = table.total('instructions', where=table.where(region='sim'))
+        numpy.testing.assert_array_equal(totals, [100, 200, 300, 400, 500])
+
+    def test_total_by_cpu_skips_components_without_cpu(self):
+        table = runner.results.load_files(self.fnames)
+        totals = table.total('instructions', by='cpu', where=table.where(region='sim'))
+        numpy.testing.assert_array_equal(totals, [1500])
+        numpy.testing.assert_array_equal(table.total('LOAD.hit', by='cpu'), [0])
+
+    def test_where_unknown_value(self):
+        table = runner.results.load_files(self.fnames)
+        self.assertFalse(table.where(component='L2C').any())
+
+    def test_labels(self):
+        table = runner.results.load_files(self.fnames)
+        self.assertEqual(set(table.labels('kind')), {'core', 'dram', 'cache'})
+
+    def test_save_and_load_memory_mapped(self):
+        table = runner.results.load_files(self.fnames)
+        table.save(os.path.join(self.tempdir.name, 'table'))
+        loaded = runner.results.ResultTable.load(os.path.join(self.tempdir.name, 'table'))
+        self.assertIsInstance(loaded['LOAD.hit'], numpy.memmap)
+        self.assertEqual(loaded.runs, table.runs)
+        for name in table.columns:
+            numpy.testing.assert_array_equal(loaded[name], table[name])
+
+    def test_parallel_matches_serial(self):
+        serial = runner.results.load_files(self.fnames)
+        parallel = runner.results.load_files(self.fnames, jobs=2, chunksize=1)
+        self.assertEqual(serial.categories, parallel.categories)
+        for name in serial.columns:
+            numpy.testing.assert_array_equal(serial[name], parallel[name])
+
+    def test_load_database(self):
+        with runner.database.RunDatabase(':memory:') as db:
+            jobs = [runner.jobs.Job('champsim', (f'{i}.xz',)) for i in range(3)]
+            db.add(jobs)
+            for i, job in enumerate(jobs):
+                db.record(job, 'done', returncode=0, result=run_output(100*(i+1), i))
+            table = runner.results.load_database(db)
+        self.assertEqual([r['key'] for r in table.runs], [j.key for j in jobs])
+        numpy.testing.assert_array_equal(table.total('instructions', where=table.where(region='roi')), [100, 200, 300])
+
+    def test_load_database_from_path(self):
+        fname = os.path.join(self.tempdir.name, 'runs.sqlite')
+        job = runner.jobs.Job('champsim', ('0.xz',))
+        with runner.database.RunDatabase(fname) as db:
+            db.add([job])
+            db.record(job, 'done', returncode=0, result=run_output(100, 0))
+        table = runner.results.load_database(fname)
+        self.assertEqual([r['key'] for r in table.runs], [job.key])
+        numpy.testing.assert_array_equal(table.total('instructions', where=table.where(region='roi')), [100])
@@ -0,0 +1,171 @@
+import unittest
+import unittest.mock
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import runner.database
+import runner.jobs
+import runner.pool
+import runner.__main__
+
+fake_binary = '''#!{}
+import json, sys, time
+args = sys.argv[1:]
+traces = [a for a in args if a.endswith('.xz')]
+with open(sys.argv[0] + '.calls', 'at') as wfp:
+    print(' '.join(traces), file=wfp)
+if any('bad' in t for t in traces):
+    sys.exit(3)
+if any('slow' in t for t in traces):
+    time.sleep(10)
+with open(args[args.index('--json')+1], 'wt') as wfp:
+    json.dump([{{'traces': traces, 'args': args}}], wfp)
+'''
+
+class JobTests(unittest.TestCase):
+    def test_command(self):
+        job = runner.jobs.Job('/bin/champsim', ('/a.xz', '/b.xz'), warmup_instructions=10, simulation_instructions=20, args=('--hide-heartbeat',))
+        self.assertEqual(job.command('out.json'), ['/bin/champsim', '--warmup-instructions', '10', '--simulation-instructions', '20', '--json', 'out.json', '--hide-heartbeat', '/a.xz', '/b.xz'])
+
+    def test_command_without_instruction_counts(self):
+        job = runner.jobs.Job('/bin/champsim', ('/a.xz',))
+        self.assertEqual(job.command('out.json'), ['/bin/champsim', '--json', 'out.json', '/a.xz'])
+
+    def test_key_is_stable(self):
+        self.assertEqual(runner.jobs.Job('bin/champsim', ('a.xz',), 1, 2).key, runner.jobs.Job('bin/champsim', ('a.xz',), 1, 2).key)
+        self.assertNotEqual(runner.jobs.Job('bin/champsim', ('a.xz',), 1, 2).key, runner.jobs.Job('bin/champsim', ('a.xz',), 1, 3).key)
+
+    def test_description_roundtrip(self):
+        job = runner.jobs.Job('/bin/champsim', ('/a.xz',), 1, 2, ('--hide-heartbeat',))
+        self.assertEqual(runner.jobs.Job.from_description(job.description()), job)
+
+    def test_make_jobs_is_product(self):
+        jobs = runner.jobs.make_jobs(['/x', '/y'], [('/a.xz',), ('/b.xz',)])
+        self.assertEqual([(j.binary, j.traces) for j in jobs], [('/x', ('/a.xz',)), ('/x', ('/b.xz',)), ('/y', ('/a.xz',)), ('/y', ('/b.xz',))])
+
+    def test_read_trace_list(self):
+        with tempfile.TemporaryDirectory() as dtemp:
+            fname = os.path.join(dtemp, 'traces.txt')
+            with open(fname, 'wt') as wfp:
+                wfp.write('a.xz b.xz # a mix\n\n# comment\n/abs/c.xz\n')
+            self.assertEqual(list(runner.jobs.read_trace_list(fname)), [(os.path.join(dtemp, 'a.xz'), os.path.join(dtemp, 'b.xz')), ('/abs/c.xz',)])
+
+class CpuListTests(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(runner.pool.parse_cpu_list('0-3,8'), [0,1,2,3,8])
+
+    def test_single(self):
+        self.assertEqual(runner.pool.parse_cpu_list('5'), [5])
+
+class RunTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.binary = os.path.join(self.tempdir.name, 'champsim')
+        with open(self.binary, 'wt') as wfp:
+            wfp.write(fake_binary.format(sys.executable))
+        os.chmod(self.binary, 0o755)
+        self.results_dir = os.path.join(self.tempdir.name, 'results')
+        self.traces = [os.path.join(self.tempdir.name, f'{name}.xz') for name in ('a', 'b', 'bad')]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def calls(self):
+        with open(self.binary + '.calls', 'rt') as rfp:
+            return rfp.read().splitlines()
+
+    def test_outcomes_are_recorded(self):
+        jobs = runner.jobs.make_jobs([self.binary], [(t,) for t in self.traces], 10, 20)
+        with runner.database.RunDatabase(':memory:') as db:
+            db.add(jobs)
+            runner.pool.run_all(db.pending(), db, self.results_dir, cpus=[None, None])
+            self.assertEqual(db.counts(), {'done': 2, 'failed': 1})
+            results = list(db.results())
+            self.assertEqual([r['result'][0]['traces'] for r in results], [[self.traces[0]], [self.traces[1]]])
+            self.assertEqual(db.pending(), [])
+            self.assertEqual(db.pending(retry_failed=True), [jobs[2]])
+
+    def test_resume_skips_completed_runs(self):
+        database = os.path.join(self.tempdir.name, 'runs.sqlite')
+        argv = [self.binary, '--trace', self.traces[0], '--trace', self.traces[1], '--results-dir', self.results_dir, '--database', database, '-j', '1']
+        self.assertEqual(runner.__main__.main(argv), 0)
+        self.assertEqual(runner.__main__.main(argv), 0)
+        self.assertEqual(len(self.calls()), 2)
+
+    def test_failed_runs_are_retried_on_request(self):
+        argv = [self.binary, '--trace', self.traces[2], '--results-dir', self.results_dir, '-j', '1']
+        self.assertEqual(runner.__main__.main(argv), 1)
+        self.assertEqual(runner.__main__.main(argv), 1)
+        self.assertEqual(len(self.calls()), 1)
+        self.assertEqual(runner.__main__.main([*argv, '--retry-failed']), 1)
+        self.assertEqual(len(self.calls()), 2)
+
+    def test_timeout_fails_run(self):
+        job = runner.jobs.Job(self.binary, (os.path.join(self.tempdir.name, 'slow.xz'),))
+        outcome = runner.pool.run_job(job, self.results_dir, timeout=0.1)
+        self.assertEqual(outcome['state'], 'failed')
+        self.assertIsNone(outcome['returncode'])
+
+    def test_job_is_pinned(self):
+        if not hasattr(os, 'sched_setaffinity'):
+            self.skipTest('pinning is not supported on this platform')
+        cpu = min(os.sched_getaffinity(0))
+        job = runner.jobs.Job(self.binary, (self.traces[0],))
+        with unittest.mock.patch('os.sched_setaffinity') as setaffinity:
+            outcome = runner.pool.run_job(job, self.results_dir, cpu=cpu)
+        self.assertEqual(outcome['state'], 'done')
+        setaffinity.assert_called_once()
+        self.assertEqual(setaffinity.call_args.args[1], {cpu})
+
+    def test_jobs_are_pinned_to_groups(self):
+        jobs = runner.jobs.make_jobs([self.binary], [(t,) for t in self.traces[:2]], 10, 20)
+        with runner.database.RunDatabase(':memory:') as db:
+            db.add(jobs)
+            with unittest.mock.patch('os.sched_setaffinity', create=True) as setaffinity:
+                runner.pool.run_all(db.pending(), db, self.results_dir, cpus=[4, 5, 6, 7], cpus_per_job=2)
+            self.assertCountEqual([c.args[1] for c in setaffinity.call_args_list], [{4, 5}, {6, 7}])
+            self.assertCountEqual([r['cpu'] for r in db.results()], [4, 6])
+
+    def test_cached_traces_keep_original_names(self):
+        class RenamingCache:
+            def path(self, fname):
+                return os.path.join(os.path.dirname(fname), 'cached-' + os.path.basename(fname))
+
+        job = runner.jobs.Job(self.binary, (self.traces[0],))
+        outcome = runner.pool.run_job(job, self.results_dir, trace_cache=RenamingCache())
+        self.assertEqual(self.calls(), [RenamingCache().path(self.traces[0])])
+        self.assertEqual(outcome['result'][0]['traces'], [self.traces[0]])
+
+    def test_missing_binary_fails_run(self):
+        jobs = runner.jobs.make_jobs([self.binary, os.path.join(self.tempdir.name, 'missing')], [(self.traces[0],)], 10, 20)
+        with runner.database.RunDatabase(':memory:') as db:
+            db.add(jobs)
+            runner.pool.run_all(db.pending(), db, self.results_dir, cpus=[None, None])
+            self.assertEqual(db.counts(), {'done': 1, 'failed': 1})
+        outcome = runner.pool.run_job(jobs[1], self.results_dir)
+        self.assertEqual(outcome['state'], 'failed')
+        with open(outcome['log'], 'rt') as rfp:
+            self.assertIn('Could not start the binary', rfp.read())
+
+    def test_stopping_group_kills_running_job(self):
+        group = runner.pool.ProcessGroup()
+        job = runner.jobs.Job(self.binary, (os.path.join(self.tempdir.name, 'slow.xz'),))
+        timer = threading.Timer(0.5, group.stop)
+        timer.start()
+        start = time.monotonic()
+        outcome = runner.pool.run_job(job, self.results_dir, group=group)
+        timer.join()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(outcome['state'], 'failed')
+        self.assertEqual(group.processes, set())
+
+    def test_stopped_group_starts_nothing(self):
+        group = runner.pool.ProcessGroup()
+        group.stop()
+        job = runner.jobs.Job(self.binary, (self.traces[0],))
+        with self.assertRaises(RuntimeError):
+            runner.pool.run_job(job, self.results_dir, group=group)
+        self.assertFalse(os.path.exists(self.binary + '.calls'))
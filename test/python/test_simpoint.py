@@ -0,0 +1,190 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+try:
+    import numpy
+    import runner.simpoint
+    import runner.traces
+except ImportError:
+    numpy = None
+
+fake_binary = '''#!{}
+import json, sys
+args = sys.argv[1:]
+instructions = int(args[args.index('--simulation-instructions')+1])
+with open(sys.argv[0] + '.calls', 'at') as wfp:
+    print(' '.join(args), file=wfp)
+region = {{'cores': [{{'instructions': instructions, 'cycles': 2*instructions}}], 'DRAM': [], 'LLC': {{'LOAD': {{'miss': [instructions // 10]}}}}}}
+with open(args[args.index('--json')+1], 'wt') as wfp:
+    json.dump([{{'name': 'Simulation', 'traces': args[-1:], 'roi': region, 'sim': region}}], wfp)
+'''
+
+def loop_records(base, count, block_length=8):
+    ''' A loop over four basic blocks of the given length, starting at the given address. '''
+    records = numpy.zeros(count, dtype=runner.traces.input_instr)
+    position = numpy.arange(count) % (4*block_length)
+    records['ip'] = base + 4*position.astype(numpy.uint64)
+    records['is_branch'] = (position % block_length == block_length-1)
+    records['branch_taken'] = records['is_branch']
+    return records
+
+def phased_trace(pattern, interval):
+    ''' A trace with one interval for each member of the pattern, with each distinct member executing a different loop. '''
+    return numpy.concatenate([loop_records(0x10000 * (p+1), interval) for p in pattern])
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class BasicBlockVectorTests(unittest.TestCase):
+    def test_counts_sum_to_interval(self):
+        vectors = runner.simpoint.basic_block_vectors([loop_records(0x1000, 250)], 100)
+        numpy.testing.assert_array_equal(vectors.sum(axis=1), [100, 100, 50])
+
+    def test_blocks_are_counted_by_instructions(self):
+        vectors = runner.simpoint.basic_block_vectors([loop_records(0x1000, 32)], 32)
+        self.assertEqual(sorted(vectors[0][vectors[0] > 0]), [8, 8, 8, 8])
+
+    def test_chunking_does_not_change_vectors(self):
+        records = phased_trace([0, 1, 0, 2], 1000)
+        whole = runner.simpoint.basic_block_vectors([records], 1000)
+        for size in (1, 7, 333, 1000, 4096):
+            with self.subTest(chunk_size=size):
+                chunks = (records[i:i+size] for i in range(0, len(records), size))
+                numpy.testing.assert_array_equal(runner.simpoint.basic_block_vectors(chunks, 1000), whole)
+
+    def test_empty_trace(self):
+        self.assertEqual(runner.simpoint.basic_block_vectors([], 100).shape, (0, 4096))
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class SelectPointsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.trace = os.path.join(self.tmpdir.name, 'phased.champsimtrace.xz')
+        self.pattern = [0, 0, 1, 0, 1, 0, 2, 0]
+        runner.traces.write_trace(self.trace, phased_trace(self.pattern, 1000))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_one_point_per_phase(self):
+        selection = runner.simpoint.select_points(self.trace, 1000, clusters=3)
+        self.assertEqual(selection['instructions'], 8000)
+        points = selection['points']
+        self.assertEqual(len(points), 3)
+        self.assertEqual(sorted(p['weight'] for p in points), [0.125, 0.25, 0.625])
+        self.assertEqual({self.pattern[p['interval']] for p in points}, {0, 1, 2})
+        for point in points:
+            self.assertEqual(point['start'], point['interval'] * 1000)
+            self.assertEqual(point['length'], 1000)
+
+    def test_selection_is_deterministic(self):
+        self.assertEqual(runner.simpoint.select_points(self.trace, 1000, clusters=3), runner.simpoint.select_points(self.trace, 1000, clusters=3))
+
+    def test_clusters_are_limited_by_intervals(self):
+        selection = runner.simpoint.select_points(self.trace, 4000, clusters=10)
+        self.assertEqual(len(selection['points']), 2)
+        self.assertAlmostEqual(sum(p['weight'] for p in selection['points']), 1)
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class RegionTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.records = phased_trace([0, 1, 2], 100)
+        self.trace = os.path.join(self.tmpdir.name, 'a.champsimtrace.gz')
+        runner.traces.write_trace(self.trace, self.records)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_region_name(self):
+        self.assertEqual(runner.simpoint.region_name('/x/a.champsimtrace.xz', 10, 20), 'a.champsimtrace.10-30')
+        self.assertEqual(runner.simpoint.region_name('/x/a.champsimtrace', 10, 20), 'a.champsimtrace.10-30')
+
+    def test_extract_regions(self):
+        regions = [(50, 200, os.path.join(self.tmpdir.name, 'r1')), (0, 10, os.path.join(self.tmpdir.name, 'r2'))]
+        runner.simpoint.extract_regions(self.trace, regions, chunk_size=64)
+        numpy.testing.assert_array_equal(runner.traces.load_trace(regions[0][2]), self.records[50:250])
+        numpy.testing.assert_array_equal(runner.traces.load_trace(regions[1][2]), self.records[:10])
+
+    def test_existing_temporary_file_is_untouched(self):
+        out_fname = os.path.join(self.tmpdir.name, 'r1')
+        with open(out_fname + '.tmp', 'wt') as wfp:
+            wfp.write('another extraction')
+        runner.simpoint.extract_regions(self.trace, [(0, 10, out_fname)])
+        with open(out_fname + '.tmp', 'rt') as rfp:
+            self.assertEqual(rfp.read(), 'another extraction')
+        numpy.testing.assert_array_equal(runner.traces.load_trace(out_fname), self.records[:10])
+
+    def test_failed_extraction_leaves_no_files(self):
+        with self.assertRaises(OSError):
+            runner.simpoint.extract_regions(os.path.join(self.tmpdir.name, 'missing.champsimtrace.gz'), [(0, 10, os.path.join(self.tmpdir.name, 'r1'))])
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['a.champsimtrace.gz'])
+
+    def test_point_jobs_include_warmup(self):
+        selection = {'trace': self.trace, 'cloudsuite': False, 'points': [{'start': 100, 'length': 100}, {'start': 20, 'length': 50}]}
+        planned = runner.simpoint.point_jobs('/bin/champsim', selection, 30, os.path.join(self.tmpdir.name, 'regions'))
+        self.assertEqual([(j.warmup_instructions, j.simulation_instructions) for _,j in planned], [(30, 100), (20, 50)])
+        numpy.testing.assert_array_equal(runner.traces.load_trace(planned[0][1].traces[0]), self.records[70:200])
+        numpy.testing.assert_array_equal(runner.traces.load_trace(planned[1][1].traces[0]), self.records[0:70])
+
+    def test_chunked_trace_is_not_extracted(self):
+        trace = os.path.join(self.tmpdir.name, 'a.ctrace')
+        runner.traces.write_trace(trace, self.records)
+        selection = {'trace': trace, 'cloudsuite': True, 'points': [{'start': 100, 'length': 100}, {'start': 20, 'length': 50}]}
+        regions_dir = os.path.join(self.tmpdir.name, 'regions')
+        planned = runner.simpoint.point_jobs('/bin/champsim', selection, 30, regions_dir, ('--hide-heartbeat',))
+        self.assertEqual([j.traces for _,j in planned], [(trace,), (trace,)])
+        self.assertEqual([(j.warmup_instructions, j.simulation_instructions) for _,j in planned], [(30, 100), (20, 50)])
+        self.assertEqual([j.args for _,j in planned], [
+            ('--start-instruction', '70', '--cloudsuite', '--hide-heartbeat'),
+            ('--start-instruction', '0', '--cloudsuite', '--hide-heartbeat')
+        ])
+        self.assertFalse(os.path.exists(regions_dir))
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class CombineTests(unittest.TestCase):
+    @staticmethod
+    def output(instructions, cycles):
+        region = {'cores': [{'instructions': instructions, 'cycles': cycles}], 'DRAM': [], 'LLC': {'LOAD': {'miss': [instructions // 100]}}}
+        return [{'name': 'Simulation', 'roi': region, 'sim': region}]
+
+    def test_cpi_is_weighted(self):
+        estimate = runner.simpoint.combine([{'weight': 0.75}, {'weight': 0.25}], [self.output(100, 100), self.output(100, 500)])
+        self.assertAlmostEqual(estimate['cpi'], 2.0)
+        self.assertAlmostEqual(estimate['ipc'], 0.5)
+        self.assertAlmostEqual(estimate['per_instruction']['LLC']['LOAD.miss'], 0.01)
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class SimpointMainTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.binary = os.path.join(self.tmpdir.name, 'champsim')
+        with open(self.binary, 'wt') as wfp:
+            wfp.write(fake_binary.format(sys.executable))
+        os.chmod(self.binary, 0o755)
+        self.trace = os.path.join(self.tmpdir.name, 'phased.champsimtrace.xz')
+        runner.traces.write_trace(self.trace, phased_trace([0, 0, 1, 0, 1, 0, 2, 0], 1000))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_select_and_run(self):
+        selection = os.path.join(self.tmpdir.name, 'points.json')
+        summary = os.path.join(self.tmpdir.name, 'summary.json')
+        results_dir = os.path.join(self.tmpdir.name, 'results')
+        self.assertEqual(runner.simpoint.main(['select', self.trace, '--interval', '1000', '--clusters', '3', '-o', selection]), 0)
+        run_args = ['run', self.binary, selection, '-w', '500', '-j', '2', '--results-dir', results_dir, '--json', summary]
+        self.assertEqual(runner.simpoint.main(run_args), 0)
+
+        with open(summary, 'rt') as rfp:
+            result = json.load(rfp)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(len(result[0]['points']), 3)
+        self.assertAlmostEqual(result[0]['estimate']['ipc'], 0.5)
+        self.assertAlmostEqual(result[0]['estimate']['per_instruction']['LLC']['LOAD.miss'], 0.1)
+
+        # Completed points are not simulated again
+        self.assertEqual(runner.simpoint.main(run_args), 0)
+        with open(self.binary + '.calls', 'rt') as rfp:
+            self.assertEqual(len(rfp.read().splitlines()), 3)
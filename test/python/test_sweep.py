@@ -0,0 +1,178 @@
+import unittest
+import unittest.mock
+import itertools
+
+import config.parse
+import config.sweep
+
+class ProductAtTests(unittest.TestCase):
+    def test_matches_itertools_product(self):
+        dimensions = [['a','b'], [1,2,3], ['x','y']]
+        expected = list(itertools.product(*dimensions))
+        self.assertEqual([config.sweep.product_at(dimensions, i) for i in range(len(expected))], expected)
+
+    def test_index_of_is_inverse(self):
+        dimensions = [['a','b'], [1,2,3], ['x','y']]
+        for i in range(config.sweep.product_size(dimensions)):
+            with self.subTest(index=i):
+                coordinates = [d.index(v) for d,v in zip(dimensions, config.sweep.product_at(dimensions, i))]
+                self.assertEqual(config.sweep.index_of(dimensions, coordinates), i)
+
+class SelectTests(unittest.TestCase):
+    dimensions = [[{'rob_size': x} for x in range(10)], [{'lq_size': x} for x in range(10)], [{}]]
+
+    def test_no_count_selects_all(self):
+        self.assertEqual(list(config.sweep.select(self.dimensions)), list(itertools.product(*self.dimensions)))
+
+    def test_strategies_select_at_most_count(self):
+        for strategy in config.sweep.sample_strategies:
+            with self.subTest(strategy=strategy):
+                result = list(config.sweep.select(self.dimensions, count=12, strategy=strategy))
+                self.assertLessEqual(len(result), 12)
+                self.assertGreater(len(result), 0)
+                self.assertEqual(len(set(map(repr, result))), len(result))
+
+    def test_no_predicates_does_not_merge(self):
+        for count in (None, 12):
+            with self.subTest(count=count), unittest.mock.patch('config.util.chain') as chain:
+                list(config.sweep.select(self.dimensions, count=count))
+                chain.assert_not_called()
+
+    def test_random_selects_exactly_count(self):
+        self.assertEqual(len(list(config.sweep.select(self.dimensions, count=12, strategy='random'))), 12)
+
+    def test_selection_is_in_product_order(self):
+        order = list(map(repr, itertools.product(*self.dimensions)))
+        for strategy in config.sweep.sample_strategies:
+            with self.subTest(strategy=strategy):
+                positions = [order.index(repr(c)) for c in config.sweep.select(self.dimensions, count=12, strategy=strategy)]
+                self.assertEqual(positions, sorted(positions))
+
+    def test_same_seed_same_selection(self):
+        for strategy in config.sweep.sample_strategies:
+            with self.subTest(strategy=strategy):
+                a = list(config.sweep.select(self.dimensions, count=12, strategy=strategy, seed=5))
+                b = list(config.sweep.select(self.dimensions, count=12, strategy=strategy, seed=5))
+                self.assertEqual(a, b)
+
+    def test_count_larger_than_space(self):
+        self.assertEqual(len(list(config.sweep.select(self.dimensions, count=1000))), 100)
+
+    def test_latin_hypercube_covers_each_dimension(self):
+        result = list(config.sweep.select(self.dimensions, count=10, strategy='latin-hypercube'))
+        self.assertEqual(sorted(c[0]['rob_size'] for c in result), list(range(10)))
+        self.assertEqual(sorted(c[1]['lq_size'] for c in result), list(range(10)))
+
+    def test_stratified_covers_first_dimension(self):
+        result = list(config.sweep.select(self.dimensions, count=20, strategy='stratified'))
+        self.assertEqual(sorted(c[0]['rob_size'] for c in result), sorted(list(range(10))*2))
+
+    def test_stratified_remainder_is_not_biased(self):
+        strata = {c[0]['rob_size'] for seed in range(20) for c in config.sweep.select(self.dimensions, count=3, strategy='stratified', seed=seed)}
+        self.assertGreater(max(strata), 2)
+
+    def test_predicates_prune(self):
+        predicate = lambda c: c['lq_size'] < c['rob_size']
+        result = list(config.sweep.select(self.dimensions, predicates=[predicate]))
+        self.assertEqual(len(result), 45)
+        self.assertTrue(all(c[1]['lq_size'] < c[0]['rob_size'] for c in result))
+
+    def test_random_replaces_pruned_samples(self):
+        predicate = lambda c: c['lq_size'] < c['rob_size']
+        result = list(config.sweep.select(self.dimensions, count=30, predicates=[predicate]))
+        self.assertEqual(len(result), 30)
+        self.assertTrue(all(c[1]['lq_size'] < c[0]['rob_size'] for c in result))
+
+    def test_earlier_dimensions_have_priority_in_predicates(self):
+        dimensions = [[{'rob_size': 1}], [{'rob_size': 2}]]
+        self.assertEqual(len(list(config.sweep.select(dimensions, predicates=[lambda c: c['rob_size'] == 1]))), 1)
+
+class ExpressionPredicateTests(unittest.TestCase):
+    def test_expression(self):
+        pred = config.sweep.expression_predicate('config["rob_size"] > 4')
+        self.assertTrue(pred({'rob_size': 5}))
+        self.assertFalse(pred({'rob_size': 4}))
+
+    def test_expression_sizes(self):
+        pred = config.sweep.expression_predicate('size(config["L2C"]["size"]) >= size(config["L1D"]["size"])')
+        self.assertTrue(pred({'L1D': {'size': '48kB'}, 'L2C': {'size': '512kB'}}))
+        self.assertFalse(pred({'L1D': {'size': '48kB'}, 'L2C': {'size': '16kB'}}))
+
+class SweepValuesTests(unittest.TestCase):
+    def test_sweep_list(self):
+        self.assertEqual(list(config.sweep.sweep_values({'sweep': [1, 'a', {'b': 2}]})), [1, 'a', {'b': 2}])
+
+    def test_range_list(self):
+        self.assertEqual(list(config.sweep.sweep_values({'range': [0, 10, 4]})), [0, 4, 8])
+
+    def test_range_object(self):
+        self.assertEqual(list(config.sweep.sweep_values({'range': {'start': 2, 'stop': 5}})), [2, 3, 4])
+
+    def test_range_factor(self):
+        self.assertEqual(list(config.sweep.sweep_values({'range': {'start': 64, 'stop': 1024, 'factor': 2}})), [64, 128, 256, 512])
+
+    def test_bad_factor(self):
+        with self.assertRaises(ValueError):
+            config.sweep.sweep_values({'range': {'start': 64, 'stop': 1024, 'factor': 1}})
+
+class SweepSpaceTests(unittest.TestCase):
+    def test_no_sweeps_is_identity(self):
+        base = {'rob_size': 4, 'L1D': {'sets': 64}}
+        self.assertEqual(list(config.sweep.SweepSpace(base)), [base])
+
+    def test_objects_with_other_keys_are_not_sweeps(self):
+        base = {'L1D': {'sweep': [1,2], 'sets': 64}}
+        self.assertEqual(len(config.sweep.SweepSpace(base)), 1)
+
+    def test_length_is_product(self):
+        base = {'rob_size': {'sweep': [1,2,3]}, 'L2C': {'size': {'range': [0,4]}}}
+        self.assertEqual(len(config.sweep.SweepSpace(base)), 12)
+
+    def test_members_are_concrete(self):
+        base = {'rob_size': {'sweep': [1,2]}, 'L2C': {'size': {'sweep': ['1kB', '2kB']}, 'ways': 4}}
+        members = list(config.sweep.SweepSpace(base))
+        self.assertEqual([(m['rob_size'], m['L2C']['size']) for m in members], [(1,'1kB'), (1,'2kB'), (2,'1kB'), (2,'2kB')])
+        self.assertTrue(all(m['L2C']['ways'] == 4 for m in members))
+        self.assertFalse(any(list(config.sweep.find_sweeps(m)) for m in members))
+
+    def test_sweeps_in_lists(self):
+        base = {'ooo_cpu': [{'rob_size': 4}, {'rob_size': {'sweep': [8, 16]}}]}
+        members = list(config.sweep.SweepSpace(base))
+        self.assertEqual([m['ooo_cpu'] for m in members], [[{'rob_size': 4}, {'rob_size': 8}], [{'rob_size': 4}, {'rob_size': 16}]])
+
+    def test_base_is_unmodified(self):
+        base = {'rob_size': {'sweep': [1,2]}, 'L1D': {'sets': 64}}
+        members = list(config.sweep.SweepSpace(base))
+        self.assertEqual(base['rob_size'], {'sweep': [1,2]})
+        self.assertIs(members[0]['L1D'], base['L1D'])
+
+    def test_joined_members_have_distinct_names(self):
+        named = {'executable_name': 'x'}
+        for named_first in (True, False):
+            with self.subTest(named_first=named_first):
+                members = config.sweep.SweepSpace({'rob_size': {'sweep': [1,2]}})
+                names = [config.parse.executable_name(*((named, m) if named_first else (m, named))) for m in members]
+                self.assertEqual(names, ['x_robsize1', 'x_robsize2'])
+
+    def test_members_have_distinct_names(self):
+        for base in ({'rob_size': {'sweep': [1,2]}}, {'name': 'x', 'rob_size': {'sweep': [1,2]}}, {'executable_name': 'x', 'rob_size': {'sweep': [1,2]}}):
+            with self.subTest(base=base):
+                names = [config.parse.executable_name(m) for m in config.sweep.SweepSpace(base)]
+                self.assertEqual(len(set(names)), len(names))
+
+    def test_index_out_of_range(self):
+        space = config.sweep.SweepSpace({'rob_size': {'sweep': [1,2]}})
+        self.assertEqual(space[-1], space[1])
+        with self.assertRaises(IndexError):
+            space[2]
+
+class ExpandTests(unittest.TestCase):
+    def test_expand_concatenates(self):
+        result = config.sweep.expand([{'rob_size': {'sweep': [1,2]}}, {'rob_size': 3}, {'rob_size': {'range': [4,7]}}])
+        self.assertEqual(len(result), 6)
+        self.assertEqual([m['rob_size'] for m in result], [1,2,3,4,5,6])
+
+    def test_select_over_expanded(self):
+        dimensions = [config.sweep.expand([{'rob_size': {'range': [0, 1000]}, 'lq_size': {'range': [0, 1000]}}]), [{}]]
+        result = list(config.sweep.select(dimensions, count=5))
+        self.assertEqual(len(result), 5)
@@ -0,0 +1,65 @@
+import unittest
+import os
+import tempfile
+
+import config.filewrite
+import config.parse
+import config.timing
+
+class ProfilerTests(unittest.TestCase):
+    def test_stages_are_recorded(self):
+        with config.timing.Profiler() as profiler:
+            config.parse.parse_config({'executable_name': 'exe'})
+        self.assertIn('parse_config', profiler.record.data)
+        self.assertEqual(profiler.record.data['parse_config']['calls'], 1)
+        self.assertIn('NormalizedConfiguration.apply_defaults_in', profiler.record.data)
+
+    def test_originals_are_restored(self):
+        originals = [getattr(owner, attr) for owner, attr, _ in config.timing.pipeline_stages()]
+        with config.timing.Profiler():
+            pass
+        self.assertEqual([getattr(owner, attr) for owner, attr, _ in config.timing.pipeline_stages()], originals)
+
+    def test_nothing_recorded_when_inactive(self):
+        profiler = config.timing.Profiler()
+        config.parse.parse_config({'executable_name': 'exe'})
+        self.assertEqual(profiler.record.data, {})
+
+    def test_collect_is_not_merged(self):
+        with config.timing.Profiler() as profiler:
+            _, data = config.timing.collect(config.parse.parse_config, {'executable_name': 'exe'})
+        self.assertNotIn('parse_config', profiler.record.data)
+        self.assertEqual(data['parse_config']['calls'], 1)
+
+    def test_add_build(self):
+        profiler = config.timing.Profiler()
+        profiler.add_build('a', {'stage': {'calls': 1, 'seconds': 1.0}})
+        profiler.add_build('a', {'stage': {'calls': 2, 'seconds': 0.5}})
+        profiler.add_build('b', {'stage': {'calls': 1, 'seconds': 0.25}})
+        summary = profiler.summary()
+        self.assertEqual(summary['stages'], {'stage': {'calls': 4, 'seconds': 1.75}})
+        self.assertEqual(summary['builds'], [
+            {'name': 'a', 'stages': {'stage': {'calls': 3, 'seconds': 1.5}}},
+            {'name': 'b', 'stages': {'stage': {'calls': 1, 'seconds': 0.25}}}
+        ])
+
+    def test_streamed_writes_are_recorded(self):
+        parsed_config = config.parse.parse_config({'executable_name': 'exe'})
+        with tempfile.TemporaryDirectory() as dtemp:
+            with config.timing.Profiler() as profiler:
+                with config.filewrite.FileWriter(bindir_name='bin', objdir_name=os.path.join(dtemp, 'obj'), makedir_name=dtemp, streaming=True) as wr:
+                    wr.write_files(parsed_config)
+        self.assertIn('StreamedOutput.append', profiler.record.data)
+        self.assertEqual(profiler.record.data['StreamedOutput.commit']['calls'], 1)
+        self.assertIn('replace_if_different', profiler.record.data)
+
+class ParseConfigsProfileTests(unittest.TestCase):
+    def test_builds_are_attributed(self):
+        configs = [({'executable_name': f'exe{i}'},) for i in range(4)]
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                with config.timing.Profiler() as profiler:
+                    list(config.parse.parse_configs(configs, jobs=jobs, chunksize=1, profiler=profiler))
+                summary = profiler.summary()
+                self.assertEqual([b['name'] for b in summary['builds']], [f'exe{i}' for i in range(4)])
+                self.assertEqual(summary['stages']['parse_config']['calls'], 4)
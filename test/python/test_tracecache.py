@@ -0,0 +1,118 @@
+import unittest
+import unittest.mock
+import concurrent.futures
+import lzma
+import os
+import sys
+import tempfile
+
+import runner.compression
+import runner.database
+import runner.tracecache
+import runner.__main__
+
+fake_binary = '''#!{}
+import json, sys
+args = sys.argv[1:]
+with open(args[-1], 'rb') as rfp:
+    contents = rfp.read().decode('utf-8')
+with open(args[args.index('--json')+1], 'wt') as wfp:
+    json.dump([{{'trace': args[-1], 'contents': contents}}], wfp)
+'''
+
+class TraceCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = runner.tracecache.TraceCache(os.path.join(self.tmpdir.name, 'cache'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, contents):
+        fname = os.path.join(self.tmpdir.name, name)
+        with runner.compression.open_trace(fname, 'wb') as wfp:
+            wfp.write(contents)
+        return fname
+
+    def test_uncompressed_trace_is_used_in_place(self):
+        fname = self.write('a.champsimtrace', b'abc')
+        self.assertEqual(self.cache.path(fname), fname)
+        self.assertFalse(os.path.exists(self.cache.directory))
+
+    def test_compressed_traces_are_expanded(self):
+        for suffix in ('gz', 'xz', 'bz2'):
+            with self.subTest(suffix=suffix):
+                path = self.cache.path(self.write('a.champsimtrace.'+suffix, b'contents of a trace'))
+                self.assertTrue(path.startswith(self.cache.directory))
+                with open(path, 'rb') as rfp:
+                    self.assertEqual(rfp.read(), b'contents of a trace')
+
+    def test_trace_is_expanded_once(self):
+        fname = self.write('a.champsimtrace.xz', b'abc')
+        with unittest.mock.patch('runner.compression.open_trace', wraps=runner.compression.open_trace) as opener:
+            first = self.cache.path(fname)
+            second = self.cache.path(fname)
+        self.assertEqual(first, second)
+        self.assertEqual(opener.call_count, 1)
+
+    def test_concurrent_requests_expand_once(self):
+        fname = self.write('a.champsimtrace.xz', b'abc' * 100000)
+        with unittest.mock.patch('runner.compression.open_trace', wraps=runner.compression.open_trace) as opener:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+                paths = set(executor.map(lambda _: self.cache.path(fname), range(8)))
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(opener.call_count, 1)
+
+    def test_copies_share_an_entry(self):
+        first = self.write('a.champsimtrace.xz', b'abc')
+        second = os.path.join(self.tmpdir.name, 'b.champsimtrace.xz')
+        with open(first, 'rb') as rfp, open(second, 'wb') as wfp:
+            wfp.write(rfp.read())
+        self.assertEqual(self.cache.path(first), self.cache.path(second))
+
+    def test_changed_trace_is_expanded_again(self):
+        fname = self.write('a.champsimtrace.xz', b'abc')
+        first = self.cache.path(fname)
+        self.write('a.champsimtrace.xz', b'a different trace')
+        os.utime(fname, ns=(0, 0)) # Ensure the modification time differs, regardless of the resolution of the filesystem
+        second = self.cache.path(fname)
+        self.assertNotEqual(first, second)
+        with open(second, 'rb') as rfp:
+            self.assertEqual(rfp.read(), b'a different trace')
+
+    def test_digest_is_remembered(self):
+        fname = self.write('a.champsimtrace.xz', b'abc')
+        self.cache.digest(fname)
+        with open(self.cache.identity_path(fname), 'wt') as wfp:
+            wfp.write('remembered')
+        self.assertEqual(self.cache.digest(fname), 'remembered')
+
+class TraceCacheMainTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.binary = os.path.join(self.tmpdir.name, 'champsim')
+        with open(self.binary, 'wt') as wfp:
+            wfp.write(fake_binary.format(sys.executable))
+        os.chmod(self.binary, 0o755)
+        self.trace = os.path.join(self.tmpdir.name, 'a.champsimtrace.xz')
+        with lzma.open(self.trace, 'wb') as wfp:
+            wfp.write(b'decompressed')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_runs_read_decompressed_traces(self):
+        cache_dir = os.path.join(self.tmpdir.name, 'cache')
+        results_dir = os.path.join(self.tmpdir.name, 'results')
+        self.assertEqual(runner.__main__.main([self.binary, '--trace', self.trace, '--trace-cache', cache_dir, '--results-dir', results_dir]), 0)
+        with runner.database.RunDatabase(os.path.join(results_dir, 'runs.sqlite')) as db:
+            (result,) = db.results()
+        self.assertEqual(result['traces'], [self.trace])
+        self.assertEqual(result['result'][0]['contents'], 'decompressed')
+        self.assertTrue(result['result'][0]['trace'].startswith(cache_dir))
+
+    def test_corrupt_trace_fails_the_run(self):
+        with open(self.trace, 'wb') as wfp:
+            wfp.write(b'not an xz stream')
+        args = [self.binary, '--trace', self.trace, '--trace-cache', os.path.join(self.tmpdir.name, 'cache'), '--results-dir', os.path.join(self.tmpdir.name, 'results')]
+        self.assertEqual(runner.__main__.main(args), 1)
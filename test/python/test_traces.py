@@ -0,0 +1,131 @@
+import unittest
+import io
+import os
+import tempfile
+
+try:
+    import numpy
+    import runner.chunked
+    import runner.traces
+except ImportError:
+    numpy = None
+
+def make_records(count, cloudsuite=False):
+    records = numpy.zeros(count, dtype=runner.traces.record_dtype(cloudsuite))
+    records['ip'] = 0x1000 + 4*numpy.arange(count, dtype=numpy.uint64)
+    records['is_branch'] = (numpy.arange(count) % 3 == 0)
+    records['branch_taken'] = (numpy.arange(count) % 2 == 0)
+    records['source_memory'][:,0] = numpy.arange(count, dtype=numpy.uint64) * 64
+    return records
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class RecordLayoutTests(unittest.TestCase):
+    def test_input_instr_matches_header(self):
+        dtype = runner.traces.input_instr
+        self.assertEqual(dtype.itemsize, 64)
+        self.assertEqual(dtype.fields['destination_memory'][1], 16)
+        self.assertEqual(dtype.fields['source_memory'][1], 32)
+
+    def test_cloudsuite_instr_matches_header(self):
+        dtype = runner.traces.cloudsuite_instr
+        self.assertEqual(dtype.itemsize, 96)
+        self.assertEqual(dtype.fields['destination_memory'][1], 24)
+        self.assertEqual(dtype.fields['source_memory'][1], 56)
+        self.assertEqual(dtype.fields['asid'][1], 88)
+
+    def test_compression_suffixes(self):
+        self.assertEqual(runner.traces.compression('a.champsimtrace.xz'), 'xz')
+        self.assertEqual(runner.traces.compression('a.champsimtrace.gz'), 'gz')
+        self.assertEqual(runner.traces.compression('a.champsimtrace.bz2'), 'bz2')
+        self.assertIsNone(runner.traces.compression('a.champsimtrace'))
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class ReadTraceTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, records):
+        fname = os.path.join(self.tmpdir.name, name)
+        runner.traces.write_trace(fname, records)
+        return fname
+
+    def test_uncompressed_trace_is_mapped(self):
+        records = make_records(100)
+        result = runner.traces.load_trace(self.write('a.champsimtrace', records))
+        self.assertIsInstance(result, numpy.memmap)
+        numpy.testing.assert_array_equal(result, records)
+
+    def test_compressed_traces_are_read(self):
+        records = make_records(100)
+        for suffix in ('gz', 'xz', 'bz2'):
+            with self.subTest(suffix=suffix):
+                numpy.testing.assert_array_equal(runner.traces.load_trace(self.write('a.champsimtrace.'+suffix, records)), records)
+
+    def test_cloudsuite_records(self):
+        records = make_records(10, cloudsuite=True)
+        records['asid'][:,0] = 7
+        result = runner.traces.load_trace(self.write('a.champsimtrace.xz', records), cloudsuite=True)
+        numpy.testing.assert_array_equal(result, records)
+
+    def test_chunks_cover_trace(self):
+        records = make_records(100)
+        for name in ('a.champsimtrace', 'a.champsimtrace.xz'):
+            with self.subTest(name=name):
+                chunks = list(runner.traces.iter_chunks(self.write(name, records), chunk_size=32))
+                self.assertEqual([len(c) for c in chunks], [32, 32, 32, 4])
+                numpy.testing.assert_array_equal(numpy.concatenate(chunks), records)
+
+    def test_chunks_of_exact_multiple(self):
+        chunks = list(runner.traces.iter_chunks(self.write('a.champsimtrace.gz', make_records(64)), chunk_size=32))
+        self.assertEqual([len(c) for c in chunks], [32, 32])
+
+    def test_partial_record_is_ignored(self):
+        records = make_records(10)
+        for name in ('a.champsimtrace', 'a.champsimtrace.gz'):
+            with self.subTest(name=name):
+                fname = os.path.join(self.tmpdir.name, name)
+                with runner.traces.open_trace(fname, 'wb') as wfp:
+                    wfp.write(records.tobytes() + b'\x01\x02\x03')
+                numpy.testing.assert_array_equal(runner.traces.load_trace(fname), records)
+
+    def test_empty_trace(self):
+        for name in ('a.champsimtrace', 'a.champsimtrace.xz'):
+            with self.subTest(name=name):
+                self.assertEqual(len(runner.traces.load_trace(self.write(name, make_records(0)))), 0)
+
+    def test_map_compressed_trace_fails(self):
+        with self.assertRaises(ValueError):
+            runner.traces.map_trace(self.write('a.champsimtrace.xz', make_records(1)))
+
+    def test_chunked_trace(self):
+        records = make_records(100)
+        fname = self.write('a.ctrace', records)
+        numpy.testing.assert_array_equal(runner.traces.load_trace(fname), records)
+        chunks = list(runner.traces.iter_chunks(fname, chunk_size=32))
+        self.assertEqual([len(c) for c in chunks], [32, 32, 32, 4])
+        with self.assertRaises(ValueError):
+            runner.traces.map_trace(fname)
+
+    def test_chunked_trace_from_start(self):
+        records = make_records(100)
+        fname = os.path.join(self.tmpdir.name, 'a.ctrace')
+        runner.chunked.write(io.BytesIO(records.tobytes()), fname, records.dtype.itemsize, records_per_chunk=16)
+        for start in (0, 15, 16, 99, 100):
+            with self.subTest(start=start):
+                chunks = list(runner.traces.iter_chunked(fname, start=start))
+                numpy.testing.assert_array_equal(numpy.concatenate(chunks or [records[:0]]), records[start:])
+
+    def test_chunked_trace_record_size(self):
+        fname = self.write('a.ctrace', make_records(10))
+        with self.assertRaises(ValueError):
+            runner.traces.load_trace(fname, cloudsuite=True)
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class BranchTargetTests(unittest.TestCase):
+    def test_taken_branches_target_next_ip(self):
+        records = make_records(7)
+        # Records 0 and 6 are taken branches, record 3 is a branch that is not taken
+        numpy.testing.assert_array_equal(runner.traces.branch_targets(records), [0x1004, 0, 0, 0, 0, 0, 0])
@@ -42,6 +42,47 @@ class ChainTests(unittest.TestCase):
         self.assertEqual(a, {'a': 1})
         self.assertEqual(b, {'a': 2})
 
+    def test_chain_key_order(self):
+        a = {'a': 1, 'b': 2}
+        b = {'c': 3, 'a': 4}
+        self.assertEqual(list(config.util.chain(a,b).keys()), ['c', 'a', 'b'])
+
+    def test_chain_skips_mismatched_types(self):
+        a = {'a': [1], 'd': {'x': 1}}
+        b = {'a': 'test', 'd': 'test'}
+        c = {'a': [2], 'd': {'y': 2}}
+        self.assertEqual(config.util.chain(a,b,c), {'a': [1,2], 'd': {'x': 1, 'y': 2}})
+
+class LayeredMappingTests(unittest.TestCase):
+
+    def test_matches_chain(self):
+        layers = (
+            {'a': 1, 'd': {'x': 1, 'l': [1]}},
+            {'a': 2, 'b': 2, 'd': {'y': 2, 'l': [2]}},
+            {'c': [3], 'd': 'ignored'}
+        )
+        self.assertEqual(config.util.LayeredMapping(*layers).to_dict(), config.util.chain(*layers))
+        self.assertEqual(list(config.util.LayeredMapping(*layers).keys()), list(config.util.chain(*layers).keys()))
+
+    def test_nested_dicts_are_layered(self):
+        m = config.util.LayeredMapping({'d': {'x': 1}}, {'d': {'y': 2}})
+        self.assertIsInstance(m['d'], config.util.LayeredMapping)
+        self.assertEqual(m['d']['y'], 2)
+
+    def test_missing_keys(self):
+        m = config.util.LayeredMapping({'a': 1}, {'b': 2})
+        self.assertNotIn('c', m)
+        self.assertIsNone(m.get('c'))
+        self.assertRaises(KeyError, operator.getitem, m, 'c')
+
+    def test_values_are_cached(self):
+        m = config.util.LayeredMapping({'l': [1]}, {'l': [2]})
+        self.assertIs(m['l'], m['l'])
+
+    def test_layers_can_be_layered(self):
+        inner = config.util.LayeredMapping({'a': 1}, {'b': 2})
+        self.assertEqual(config.util.LayeredMapping(inner, {'a': 3, 'c': 3}).to_dict(), {'a': 1, 'b': 2, 'c': 3})
+
 class SubdictTests(unittest.TestCase):
     def test_subdict_removes_keys(self):
         self.assertEqual(config.util.subdict({'a':1, 'b':2, 'c':3}, ('a','b')), {'a':1, 'b':2})